@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify, make_response
 from flask_login import login_required, current_user
 from models import db, Banner, Role
+from utils.http_cache import conditional_get
+from utils.response_cache import cached_response
 import cloudinary.uploader
 from datetime import datetime
 import uuid
@@ -21,6 +23,8 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 @banners.route('/banners', methods=['GET'])
+@conditional_get('banners', max_age=300)
+@cached_response('banners')
 def get_banners():
     """Get all banners"""
     try:
@@ -13,11 +13,11 @@ cart_bp = Blueprint('cart', __name__)
 def get_cart():
     """Get the current user's cart items"""
     try:
-        cart_items = CartItem.query.filter_by(user_id=current_user.user_uuid).all()
+        cart_items = CartItem.query.options(*CartItem.pricing_options()).filter_by(user_id=current_user.user_uuid).all()
         return jsonify({
             'items': [item.to_dict() for item in cart_items],
             'total_items': sum(item.quantity for item in cart_items),
-            'total_price': sum(float(item.selected_option['price']) if item.selected_option and 'price' in item.selected_option else float(item.product.price) * item.quantity for item in cart_items)
+            'total_price': sum(float(item.unit_price()) * item.quantity for item in cart_items)
         })
     except Exception as e:
         current_app.logger.error(f"Error fetching cart: {str(e)}")
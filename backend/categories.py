@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from models import db, Category, CategoryAttribute, Role
+from utils import search_index, category_tree
+from utils.http_cache import conditional_get
+from utils.response_cache import cached_response
 from datetime import datetime
 import cloudinary
 import cloudinary.uploader
@@ -79,6 +82,7 @@ def create_category():
                 db.session.add(attribute)
 
         db.session.commit()
+        category_tree.categories_changed()
         return jsonify({
             "message": "Category created successfully",
             "category_uuid": new_category.category_uuid
@@ -135,6 +139,8 @@ def update_category(category_uuid):
 
         category.updated_at = datetime.utcnow()
         db.session.commit()
+        category_tree.categories_changed()
+        search_index.refresh_category(category.category_uuid)
 
         return jsonify({
             "message": "Category updated successfully",
@@ -174,6 +180,7 @@ def delete_category(category_uuid):
         # Delete the category
         db.session.delete(category)
         db.session.commit()
+        category_tree.categories_changed()
 
         return jsonify({"message": "Category deleted successfully"}), 200
 
@@ -182,6 +189,8 @@ def delete_category(category_uuid):
         return jsonify({"message": str(e)}), 400
 
 @categories.route('/categories', methods=['GET'])
+@conditional_get('categories', max_age=300)
+@cached_response('categories')
 def get_categories():
     try:
         # Get query parameters
@@ -190,43 +199,36 @@ def get_categories():
         category_type = request.args.get('type')  # 'parent' or 'sub'
         parent_id = request.args.get('parent_id')
 
-        # Base query
-        query = Category.query
+        # Filter the cached category snapshot instead of querying per category
+        tree = category_tree.get_tree()
+        categories = list(tree.nodes.values())
 
         # Apply filters
         if search:
-            search_term = f"%{search.lower()}%"
-            query = query.filter(db.func.lower(Category.name).like(search_term))
+            search_term = search.lower()
+            categories = [cat for cat in categories if search_term in cat.name.lower()]
         
         if is_active is not None:
             is_active_bool = is_active.lower() == 'true'
-            query = query.filter(Category.is_active.is_(is_active_bool))
+            categories = [cat for cat in categories if bool(cat.is_active) == is_active_bool]
 
         if category_type == 'parent':
-            query = query.filter(Category.parent_id == None)
+            categories = [cat for cat in categories if cat.parent_id is None]
         elif category_type == 'sub':
-            query = query.filter(Category.parent_id != None)
+            categories = [cat for cat in categories if cat.parent_id is not None]
 
         if parent_id:
-            query = query.filter(Category.parent_id == parent_id)
-
-        # Get all categories after applying filters
-        categories = query.all()
+            categories = [cat for cat in categories if cat.parent_id == parent_id]
 
         def format_category(category):
-            formatted = {
+            return {
                 'uuid': category.category_uuid,
                 'name': category.name,
                 'description': category.description,
                 'parent_id': category.parent_id,
                 'is_active': category.is_active,
                 'image_url': category.image_url,
-                'subcategories': []
-            }
-            
-            # Format subcategories if they exist
-            if hasattr(category, 'subcategories'):
-                formatted['subcategories'] = [
+                'subcategories': [
                     {
                         'uuid': sub.category_uuid,
                         'name': sub.name,
@@ -234,11 +236,9 @@ def get_categories():
                         'parent_id': sub.parent_id,
                         'is_active': sub.is_active,
                         'image_url': sub.image_url,
-                    } for sub in category.subcategories
+                    } for sub in tree.children(category.category_uuid)
                 ]
-            
-            print(f"Category {category.name} image_url: {category.image_url}")  # Debug log
-            return formatted
+            }
 
         # Format response based on whether we're getting all categories or specific ones
         if category_type == 'sub' or parent_id:
@@ -333,6 +333,7 @@ def bulk_create_categories():
                 })
 
         db.session.commit()
+        category_tree.categories_changed()
         return jsonify({
             "message": "Categories created successfully",
             "categories": created_categories
@@ -343,6 +344,8 @@ def bulk_create_categories():
         return jsonify({"message": str(e)}), 400
 
 @categories.route('/categories/<category_uuid>', methods=['GET'])
+@conditional_get('categories', max_age=300)
+@cached_response('categories')
 def get_category(category_uuid):
     try:
         category = Category.query.filter_by(category_uuid=category_uuid).first()
@@ -361,18 +364,17 @@ def get_category(category_uuid):
             'subcategories': []
         }
         
-        # Add subcategories if they exist
-        if hasattr(category, 'subcategories'):
-            result['subcategories'] = [
-                {
-                    'uuid': sub.category_uuid,
-                    'name': sub.name,
-                    'description': sub.description,
-                    'parent_id': sub.parent_id,
-                    'is_active': sub.is_active,
-                    'image_url': sub.image_url,
-                } for sub in category.subcategories
-            ]
+        # Add subcategories from the cached category snapshot
+        result['subcategories'] = [
+            {
+                'uuid': sub.category_uuid,
+                'name': sub.name,
+                'description': sub.description,
+                'parent_id': sub.parent_id,
+                'is_active': sub.is_active,
+                'image_url': sub.image_url,
+            } for sub in category_tree.get_tree().children(category.category_uuid)
+        ]
 
         return jsonify(result), 200
 
@@ -80,15 +80,15 @@ def process_checkout():
                 'message': 'Invalid payment method'
             }), 400
 
-        # Get cart items
-        cart_items = []
-        for item_data in data['items']:
-            cart_item = CartItem.query.filter_by(
-                user_id=current_user.user_uuid,
-                product_uuid=item_data['product_uuid']
-            ).first()
-            if cart_item:
-                cart_items.append(cart_item)
+        # Get cart items, with their products, variations and options, in one query and two selectin loads
+        product_uuids = [item_data['product_uuid'] for item_data in data['items']]
+        items_by_product = {}
+        for cart_item in CartItem.query.options(*CartItem.pricing_options()).filter(
+            CartItem.user_id == current_user.user_uuid,
+            CartItem.product_uuid.in_(product_uuids)
+        ).all():
+            items_by_product.setdefault(cart_item.product_uuid, cart_item)
+        cart_items = [items_by_product[uuid] for uuid in dict.fromkeys(product_uuids) if uuid in items_by_product]
         
         if not cart_items:
             return jsonify({
@@ -98,7 +98,7 @@ def process_checkout():
         
         # Validate inventory before proceeding
         for cart_item in cart_items:
-            product = Product.query.get(cart_item.product_uuid)
+            product = cart_item.product
             if not product:
                 return jsonify({
                     'status': 'error',
@@ -107,7 +107,7 @@ def process_checkout():
             
             if cart_item.variation_uuid:
                 # Check variation stock
-                variation = ProductVariation.query.get(cart_item.variation_uuid)
+                variation = cart_item.variation
                 if not variation:
                     return jsonify({
                         'status': 'error',
@@ -115,10 +115,8 @@ def process_checkout():
                     }), 400
                 
                 if cart_item.selected_option:
-                    option = ProductVariationOption.query.filter_by(
-                        variation_uuid=variation.variation_uuid,
-                        value=cart_item.selected_option['value']
-                    ).first()
+                    option = next((opt for opt in variation.options
+                                   if opt.value == cart_item.selected_option['value']), None)
                     
                     if not option:
                         return jsonify({
@@ -140,13 +138,9 @@ def process_checkout():
                     }), 400
         
         # Calculate totals
-        subtotal = sum(
-            item.quantity * float(
-                item.selected_option['price'] 
-                if item.selected_option and 'price' in item.selected_option 
-                else item.product.price
-            ) for item in cart_items
-        )
+        # Unit prices are resolved once, at the discount active now, and reused for the order items
+        unit_prices = {item.item_uuid: float(item.unit_price()) for item in cart_items}
+        subtotal = sum(item.quantity * unit_prices[item.item_uuid] for item in cart_items)
         
         shipping_fee = float(data['shipping_fee'])
         total = subtotal + shipping_fee
@@ -168,10 +162,10 @@ def process_checkout():
         
         # Create order items and update inventory
         for cart_item in cart_items:
-            product = Product.query.get(cart_item.product_uuid)
+            product = cart_item.product
             
             # Get the correct price based on variation/option
-            unit_price = float(cart_item.selected_option['price']) if cart_item.selected_option and 'price' in cart_item.selected_option else float(product.price)
+            unit_price = unit_prices[cart_item.item_uuid]
             
             order_item = OrderItem(
                 order_uuid=order.order_uuid,
@@ -187,10 +181,8 @@ def process_checkout():
             # Update inventory
             if cart_item.variation_uuid and cart_item.selected_option:
                 # Update variation option stock
-                option = ProductVariationOption.query.filter_by(
-                    variation_uuid=cart_item.variation_uuid,
-                    value=cart_item.selected_option['value']
-                ).first()
+                option = next((opt for opt in cart_item.variation.options
+                               if opt.value == cart_item.selected_option['value']), None)
                 if option:
                     option.stock -= cart_item.quantity
             else:
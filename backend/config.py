@@ -30,6 +30,19 @@ class Config:
     # Upload settings
     UPLOAD_FOLDER = 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+
+    # Bulk product imports are spooled to disk and read in chunks of BULK_IMPORT_CHUNK_ROWS rows,
+    # each committed on its own, so they may be far larger than other uploads
+    BULK_IMPORT_MAX_CONTENT_LENGTH = int(os.environ.get('BULK_IMPORT_MAX_CONTENT_LENGTH', 512 * 1024 * 1024))
+    BULK_IMPORT_CHUNK_ROWS = int(os.environ.get('BULK_IMPORT_CHUNK_ROWS', 1000))
+
+    # Bulk imports are queued and run by `python manage.py run_import_worker`; uploads are kept in
+    # BULK_IMPORT_FOLDER until imported, so web and import workers must share it. A job whose worker
+    # stops sending heartbeats for IMPORT_JOB_TIMEOUT_SECONDS is resumed by another worker
+    BULK_IMPORT_FOLDER = os.environ.get('BULK_IMPORT_FOLDER', os.path.join('uploads', 'imports'))
+    IMPORT_JOB_TIMEOUT_SECONDS = int(os.environ.get('IMPORT_JOB_TIMEOUT_SECONDS', 120))
+    IMPORT_JOB_MAX_ATTEMPTS = int(os.environ.get('IMPORT_JOB_MAX_ATTEMPTS', 3))
+    IMPORT_WORKER_POLL_SECONDS = float(os.environ.get('IMPORT_WORKER_POLL_SECONDS', 2))
     
     # CORS settings
     CORS_ORIGINS = [
@@ -49,6 +62,63 @@ class Config:
     REMEMBER_COOKIE_SAMESITE = 'Lax'
     REMEMBER_COOKIE_NAME = 'flaskify_remember'
 
+    # Featured products ranking: score weights, number of products served and refresh interval
+    FEATURED_PRODUCTS_LIMIT = int(os.environ.get('FEATURED_PRODUCTS_LIMIT', 10))
+    FEATURED_SCORE_WEIGHTS = {
+        'featured': float(os.environ.get('FEATURED_WEIGHT_FEATURED', 100)),
+        'view_count': float(os.environ.get('FEATURED_WEIGHT_VIEWS', 0.5)),
+        'total_sales': float(os.environ.get('FEATURED_WEIGHT_SALES', 1.0)),
+        'discount_percentage': float(os.environ.get('FEATURED_WEIGHT_DISCOUNT', 2.0)),
+    }
+    FEATURED_REFRESH_SECONDS = int(os.environ.get('FEATURED_REFRESH_SECONDS', 300))
+
+    # Periodic jobs run in `manage.py run_jobs`; runners hold a lease this long and renew it every third of it
+    SCHEDULER_LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', 60))
+
+    # Discounted prices are resolved at read time; expired discounts are cleared from products this often
+    DISCOUNT_CLEANUP_SECONDS = int(os.environ.get('DISCOUNT_CLEANUP_SECONDS', 3600))
+
+    # Server-side cache for public catalog responses: 'memory' (per process), 'redis' or 'none'
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+    RESPONSE_CACHE_URL = os.environ.get('RESPONSE_CACHE_URL', 'redis://localhost:6379/0')
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 60))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+
+    # Report query counts per request and log endpoints that exceed their query budget
+    QUERY_BUDGET_CHECKS = os.environ.get('QUERY_BUDGET_CHECKS', '').lower() in ('1', 'true', 'yes')
+
+    # Product views are buffered in memory and written in batches by a flush thread in each worker, once the
+    # oldest buffered view has waited VIEW_FLUSH_SECONDS; a viewer counts once per product within VIEW_DEDUPE_SECONDS
+    VIEW_FLUSH_SECONDS = int(os.environ.get('VIEW_FLUSH_SECONDS', 30))
+    VIEW_DEDUPE_SECONDS = int(os.environ.get('VIEW_DEDUPE_SECONDS', 1800))
+
+    # "Frequently bought together": neighbours kept per product, basket source weights
+    # (wishlists and carts are off unless weighted) and how often new orders are folded in
+    RECOMMENDATIONS_PER_PRODUCT = int(os.environ.get('RECOMMENDATIONS_PER_PRODUCT', 12))
+    RECOMMENDATION_SOURCE_WEIGHTS = {
+        'orders': float(os.environ.get('RECOMMENDATION_WEIGHT_ORDERS', 1.0)),
+        'wishlist': float(os.environ.get('RECOMMENDATION_WEIGHT_WISHLIST', 0)),
+        'cart': float(os.environ.get('RECOMMENDATION_WEIGHT_CART', 0)),
+    }
+    RECOMMENDATION_REFRESH_SECONDS = int(os.environ.get('RECOMMENDATION_REFRESH_SECONDS', 3600))
+
+    # Content-based similar items: neighbours kept per product and how often edits are folded in
+    # (everything is rescored daily)
+    SIMILAR_PRODUCTS_PER_PRODUCT = int(os.environ.get('SIMILAR_PRODUCTS_PER_PRODUCT', 12))
+    SIMILAR_PRODUCTS_REFRESH_SECONDS = int(os.environ.get('SIMILAR_PRODUCTS_REFRESH_SECONDS', 300))
+
+    # Per-worker in-memory copy of the listing columns that answers listing filters and sorts without SQL.
+    # It re-reads written products from the change log at least every CATALOG_SNAPSHOT_REFRESH_SECONDS,
+    # and listings fall back to SQL when it would take more than CATALOG_SNAPSHOT_MAX_MB
+    CATALOG_SNAPSHOT_ENABLED = os.environ.get('CATALOG_SNAPSHOT_ENABLED', '').lower() in ('1', 'true', 'yes')
+    CATALOG_SNAPSHOT_REFRESH_SECONDS = int(os.environ.get('CATALOG_SNAPSHOT_REFRESH_SECONDS', 5))
+    CATALOG_SNAPSHOT_MAX_MB = int(os.environ.get('CATALOG_SNAPSHOT_MAX_MB', 64))
+
+    # Upper bounds of the price facet's buckets; the last bucket is open-ended
+    FACET_PRICE_BUCKETS = [
+        float(bound) for bound in os.environ.get('FACET_PRICE_BUCKETS', '500,1000,5000,10000').split(',')
+    ]
+
     # Cloudinary configuration
     config(
         cloud_name=os.getenv('CLOUDINARY_CLOUD_NAME'),
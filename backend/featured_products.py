@@ -1,72 +1,101 @@
-from flask import Blueprint, jsonify
-from models import Product
-from sqlalchemy import and_
+from flask import Blueprint, jsonify, request, current_app
+from models import db, Product
+from sqlalchemy import and_, case, func
+from utils.serializers import parse_fieldset, product_load_options
+from utils.http_cache import conditional_get, bump_catalog_versions
+from utils.response_cache import cached_response
+from utils.catalog_snapshot import get_snapshot, load_products, log_product_changes, snapshot_validator
 
 featured_products = Blueprint('featured_products', __name__)
 
-def get_featured_products():
+# What the featured carousel renders; override with ?fields= and ?include=
+FEATURED_FIELDS = {
+    'product_uuid', 'name', 'price', 'compare_at_price', 'main_image',
+    'total_sales', 'shipping_fee', 'discount_name', 'discount_percentage', 'rating'
+}
+FEATURED_INCLUDE = {'shipping_provider', 'shipping_rate'}
+
+def featured_score_expression(weights):
+    """SQL expression for the weighted featured score of a product"""
+    return (
+        case((Product.featured == True, weights['featured']), else_=0)
+        + func.coalesce(Product.view_count, 0) * weights['view_count']
+        + func.coalesce(Product.total_sales, 0) * weights['total_sales']
+        + func.coalesce(Product.discount_percentage, 0) * weights['discount_percentage']
+    )
+
+def refresh_featured_scores(product_uuids=None):
     """
-    Get featured products ranked by a dynamic weighting algorithm.
-    
-    Weights:
+    Recompute the stored featured score in a single UPDATE.
+
+    Weights come from FEATURED_SCORE_WEIGHTS (defaults shown):
     - Manual Feature (featured=True): +100 points
     - View Count: +0.5 points per view
     - Total Sales: +1.0 points per sale
     - Discount Percentage: +2.0 points per percentage
-    
-    Returns:
-        List of top 10 products sorted by score
+
+    Only the given products are considered when product_uuids is passed, otherwise the whole
+    catalog. Returns the number of products whose score changed.
+    """
+    weights = current_app.config['FEATURED_SCORE_WEIGHTS']
+    query = Product.query
+    if product_uuids is not None:
+        product_uuids = [uuid for uuid in product_uuids if uuid]
+        if not product_uuids:
+            return 0
+        query = query.filter(Product.product_uuid.in_(product_uuids))
+    score = featured_score_expression(weights)
+    changed = query.filter(Product.featured_score != score)
+    log_product_changes(changed.with_entities(Product.product_uuid).statement)
+    count = changed.update({
+        Product.featured_score: score,
+        # A score refresh isn't an edit; keep updated_at's onupdate from firing
+        Product.updated_at: Product.updated_at
+    }, synchronize_session=False)
+    if count:
+        bump_catalog_versions('products')
+    db.session.commit()
+    return count
+
+def get_featured_products(options=(), limit=None):
+    """
+    Get the top featured products from the stored ranking.
+
+    Reads the first `limit` (default FEATURED_PRODUCTS_LIMIT) active, visible products off
+    the featured score index, applying the caller's loader options.
     """
     try:
-        # Query active and visible products
-        products = Product.query.filter(
+        limit = limit or current_app.config['FEATURED_PRODUCTS_LIMIT']
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            product_uuids, _ = snapshot.select('featured', limit=limit)
+            return load_products(product_uuids, options)
+        return Product.query.options(*options).filter(
             and_(
                 Product.status == 'active',
                 Product.visibility == True
             )
-        ).all()
-        
-        # Calculate scores for each product
-        product_scores = []
-        for product in products:
-            score = 0
-            
-            # Manual feature weight
-            if product.featured:
-                score += 100
-            
-            # View count weight
-            score += product.view_count * 0.5
-            
-            # Total sales weight
-            score += product.total_sales * 1.0
-            
-            # Discount percentage weight
-            if product.discount_percentage:
-                score += product.discount_percentage * 2.0
-            
-            product_scores.append({
-                'product': product,
-                'score': score
-            })
-        
-        # Sort products by score in descending order
-        sorted_products = sorted(product_scores, key=lambda x: x['score'], reverse=True)
-        
-        # Return top 10 products
-        top_products = [item['product'] for item in sorted_products[:10]]
-        return top_products
+        ).order_by(
+            Product.featured_score.desc(),
+            Product.product_uuid.desc()
+        ).limit(limit).all()
         
     except Exception as e:
         print(f"Error getting featured products: {str(e)}")
         return []
 
 @featured_products.route('/featured', methods=['GET'])
+@conditional_get('products', 'shipping', 'reviews', max_age=60, validator=snapshot_validator)
+@cached_response('products', 'shipping', 'reviews', validator=snapshot_validator)
 def get_featured_products_endpoint():
     """API endpoint to get featured products"""
     try:
-        featured_products = get_featured_products()
-        return jsonify([product.to_dict() for product in featured_products]), 200
+        fields = parse_fieldset(request.args.get('fields')) or FEATURED_FIELDS
+        include = parse_fieldset(request.args.get('include'))
+        include = FEATURED_INCLUDE if include is None else include
+
+        featured_products = get_featured_products(product_load_options(fields, include))
+        return jsonify([product.to_dict(fields, include) for product in featured_products]), 200
     except Exception as e:
         return jsonify({
             'error': f'Error fetching featured products: {str(e)}'
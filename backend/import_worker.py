@@ -0,0 +1,62 @@
+import os
+import time
+import socket
+import uuid
+import logging
+from models import db, ImportJob
+from products import refresh_product_indexes
+from utils.import_jobs import claim_import_job, run_import_job, requeue_import_job, ImportJobLost
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_import_worker(app):
+    """
+    Run queued bulk product imports one at a time; blocks until interrupted.
+
+    Jobs are claimed from the import_jobs table, so any number of workers can run
+    side by side without a broker. A job whose worker dies is resumed by another
+    worker once its heartbeat is IMPORT_JOB_TIMEOUT_SECONDS old.
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    timeout = app.config.get('IMPORT_JOB_TIMEOUT_SECONDS', 120)
+    poll_seconds = app.config.get('IMPORT_WORKER_POLL_SECONDS', 2)
+    logger.info(f"Import worker {worker} started, polling every {poll_seconds} seconds")
+
+    job_uuid = None
+    try:
+        while True:
+            with app.app_context():
+                try:
+                    job = claim_import_job(worker, timeout)
+                    if job:
+                        job_uuid = job.job_uuid
+                        logger.info(f"Importing {job.filename} for shop {job.shop_uuid} (job {job_uuid}, "
+                                    f"attempt {job.attempts}, from row {job.rows_processed})")
+                        run_import_job(
+                            job, worker,
+                            chunk_rows=app.config.get('BULK_IMPORT_CHUNK_ROWS', 1000),
+                            max_attempts=app.config.get('IMPORT_JOB_MAX_ATTEMPTS', 3),
+                            on_chunk=lambda product_uuids, _: refresh_product_indexes(*product_uuids)
+                        )
+                        logger.info(f"Import job {job_uuid} finished: {db.session.get(ImportJob, job_uuid).message}")
+                        job_uuid = None
+                except ImportJobLost as e:
+                    logger.warning(str(e))
+                    job_uuid = None
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Error running import job {job_uuid}: {str(e)}")
+                    # Left running; it is retried once its heartbeat goes stale
+                    job_uuid = None
+                    job = None
+            if not job:
+                time.sleep(poll_seconds)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        if job_uuid:
+            with app.app_context():
+                requeue_import_job(job_uuid, worker)
+                logger.info(f"Requeued import job {job_uuid}")
@@ -1,3 +1,4 @@
+import click
 from flask.cli import FlaskGroup
 from wsgi import app, db
 
@@ -9,5 +10,92 @@ def create_db():
     db.create_all()
     db.session.commit()
 
+@cli.command("run_jobs")
+def run_jobs():
+    """Run the periodic background jobs; with several runners, only the one holding the lease runs them"""
+    from scheduler import run_scheduler
+    run_scheduler(app)
+
+@cli.command("run_import_worker")
+def run_import_worker():
+    """Run queued bulk product imports; start as many workers as needed"""
+    from import_worker import run_import_worker as run_worker
+    run_worker(app)
+
+@cli.command("rebuild_search_index")
+def rebuild_search_index():
+    from utils.search_index import rebuild_search_index as rebuild
+    from utils.trigram_index import rebuild_trigram_index
+    count = rebuild()
+    print(f"Indexed {count} products")
+    count = rebuild_trigram_index()
+    print(f"Indexed {count} products, categories and shops for fuzzy search")
+
+@cli.command("backfill_ratings")
+def backfill_ratings():
+    from models import Product
+    count = Product.rebuild_rating_aggregates()
+    print(f"Rebuilt rating aggregates for {count} reviewed products")
+
+@cli.command("build_recommendations")
+@click.option("--full", is_flag=True, help="Rebuild from all orders instead of only new ones")
+def build_recommendations(full):
+    from utils.recommendations import rebuild_recommendations, update_recommendations
+    count = rebuild_recommendations() if full else update_recommendations()
+    print(f"Updated recommendations for {count} products")
+
+@cli.command("build_similar_products")
+@click.option("--full", is_flag=True, help="Rebuild every product instead of only edited ones")
+def build_similar_products(full):
+    from utils.similar_products import rebuild_similar_products, update_similar_products
+    count = rebuild_similar_products() if full else update_similar_products()
+    print(f"Updated similar items for {count} products")
+
+@cli.command("benchmark_discounts")
+@click.option("--products", "count", default=100000, help="Number of synthetic products")
+def benchmark_discounts(count):
+    """Time creating a discount, resolving its prices and clearing it on a scratch in-memory SQLite database"""
+    import time
+    import uuid
+    from datetime import datetime, timedelta, timezone
+    from flask import Flask
+    from sqlalchemy import insert
+    from config import Config
+    from models import Product
+    from utils.discount_updates import apply_discount, expire_discounts
+    from utils.pricing import ActiveDiscounts, active_discounts, effective_price
+
+    scratch = Flask(__name__)
+    scratch.config.from_object(Config)
+    scratch.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(scratch)
+
+    def timed(label, fn):
+        started = time.perf_counter()
+        result = fn()
+        db.session.commit()
+        print(f"{label}: {time.perf_counter() - started:.2f}s {result}")
+
+    with scratch.app_context():
+        print(f"Seeding {count} products")
+        db.drop_all()
+        db.create_all()
+        rows = [{
+            'product_uuid': str(uuid.uuid4()), 'shop_uuid': 'shop', 'seller_id': 'seller', 'category_uuid': 'category',
+            'name': f'Product {i}', 'description': '', 'price': 100 + i % 900
+        } for i in range(count)]
+        for start_row in range(0, len(rows), 10000):
+            db.session.execute(insert(Product), rows[start_row:start_row + 10000])
+        db.session.commit()
+
+        product_uuids = [row['product_uuid'] for row in rows]
+        start = datetime.now(timezone.utc) - timedelta(hours=1)
+        timed("Create discount", lambda: apply_discount(product_uuids, 'Benchmark', 15.0, start, start + timedelta(days=1)))
+        timed("Load active discount set", lambda: len(ActiveDiscounts.load(None).discounts))
+        products = Product.query.limit(1000).all()
+        active_discounts()
+        timed("Resolve 1000 prices", lambda: sum(effective_price(product) for product in products))
+        timed("Clear expired discounts", lambda: expire_discounts(start + timedelta(days=2))[1])
+
 if __name__ == "__main__":
     cli()
@@ -45,6 +45,23 @@ target_db = current_app.extensions['migrate'].db
 # ... etc.
 
 
+# Tables and indexes the migrations create that the models don't describe (the search
+# indexes, SQLite's FTS5 shadow tables and the pg_trgm indexes); autogenerate would
+# otherwise drop them
+UNMODELED_TABLE_PREFIXES = ('product_search', 'search_trigram')
+UNMODELED_INDEX_SUFFIX = '_trgm'
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if not reflected or compare_to is not None:
+        return True
+    if type_ == 'table' and name.startswith(UNMODELED_TABLE_PREFIXES):
+        return False
+    if type_ == 'index' and name.endswith(UNMODELED_INDEX_SUFFIX):
+        return False
+    return True
+
+
 def get_metadata():
     if hasattr(target_db, 'metadatas'):
         return target_db.metadatas[None]
@@ -65,7 +82,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -93,6 +111,7 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
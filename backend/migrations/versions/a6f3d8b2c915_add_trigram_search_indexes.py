@@ -0,0 +1,77 @@
+"""Add trigram search indexes
+
+Revision ID: a6f3d8b2c915
+Revises: e8a2f5c3d719
+Create Date: 2026-10-18 16:22:47.104385
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6f3d8b2c915'
+down_revision = 'e8a2f5c3d719'
+branch_labels = None
+depends_on = None
+
+# pg_trgm indexes on the text fuzzy search compares against, by name: (table, expression)
+TRGM_INDEXES = {
+    'ix_products_name_trgm': ('products', "lower(name) gin_trgm_ops"),
+    'ix_products_brand_trgm': ('products', "lower(coalesce(brand, '')) gin_trgm_ops"),
+    'ix_categories_name_trgm': ('categories', "lower(name) gin_trgm_ops"),
+    'ix_shops_business_name_trgm': ('shops', "lower(business_name) gin_trgm_ops"),
+}
+
+
+def upgrade():
+    # Workers created these themselves before this revision; skip the ones already there
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if bind.dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        existing = {index['name'] for table in ('products', 'categories', 'shops')
+                    for index in inspector.get_indexes(table)}
+        # Build concurrently so the tables stay writable; not allowed inside a transaction
+        with op.get_context().autocommit_block():
+            for name, (table, expression) in TRGM_INDEXES.items():
+                if name not in existing:
+                    op.create_index(name, table, [sa.text(expression)], unique=False,
+                                    postgresql_using='gin', postgresql_concurrently=True)
+        return
+
+    # Other databases fall back to trigram tables the app maintains itself
+    existing = inspector.get_table_names()
+    if 'search_trigram_terms' not in existing:
+        op.create_table('search_trigram_terms',
+        sa.Column('term_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=16), nullable=False),
+        sa.Column('ref_uuid', sa.String(length=50), nullable=False),
+        sa.Column('term', sa.String(length=255), nullable=False),
+        sa.Column('trigram_count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('term_id'),
+        sqlite_autoincrement=True
+        )
+        op.create_index('ix_search_trigram_terms_ref', 'search_trigram_terms', ['kind', 'ref_uuid'], unique=False)
+    if 'search_trigrams' not in existing:
+        op.create_table('search_trigrams',
+        sa.Column('kind', sa.String(length=16), nullable=False),
+        sa.Column('trigram', sa.String(length=3), nullable=False),
+        sa.Column('term_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('kind', 'trigram', 'term_id')
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        # The pg_trgm extension stays; other objects may depend on it
+        with op.get_context().autocommit_block():
+            for name, (table, expression) in TRGM_INDEXES.items():
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        return
+
+    op.drop_table('search_trigrams')
+    op.drop_index('ix_search_trigram_terms_ref', table_name='search_trigram_terms')
+    op.drop_table('search_trigram_terms')
@@ -0,0 +1,62 @@
+"""Add product search index
+
+Revision ID: e8a2f5c3d719
+Revises: d9c4a1e7f352
+Create Date: 2026-10-18 14:05:31.662190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8a2f5c3d719'
+down_revision = 'd9c4a1e7f352'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Workers created these tables themselves before this revision; skip the ones already there
+    bind = op.get_bind()
+    existing = sa.inspect(bind).get_table_names()
+
+    if bind.dialect.name == 'sqlite':
+        if 'product_search_docs' not in existing:
+            op.create_table('product_search_docs',
+            sa.Column('docid', sa.Integer(), nullable=False),
+            sa.Column('product_uuid', sa.String(length=36), nullable=False),
+            sa.PrimaryKeyConstraint('docid'),
+            sa.UniqueConstraint('product_uuid'),
+            sqlite_autoincrement=True
+            )
+        # Alembic has no operation for FTS5 virtual tables
+        op.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5(
+                name, brand, tags, category, description,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+            """
+        )
+    elif bind.dialect.name == 'postgresql':
+        if 'product_search' not in existing:
+            op.create_table('product_search',
+            sa.Column('product_uuid', sa.String(length=36), nullable=False),
+            sa.Column('document', postgresql.TSVECTOR(), nullable=False),
+            sa.PrimaryKeyConstraint('product_uuid')
+            )
+            op.create_index('ix_product_search_document', 'product_search', ['document'], unique=False,
+                            postgresql_using='gin')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS product_search")
+        op.drop_table('product_search_docs')
+    elif bind.dialect.name == 'postgresql':
+        op.drop_index('ix_product_search_document', table_name='product_search', postgresql_using='gin')
+        op.drop_table('product_search')
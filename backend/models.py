@@ -14,7 +14,7 @@ import secrets
 import string
 from sqlalchemy.dialects.postgresql import UUID
 import json
-from sqlalchemy import and_, Text
+from sqlalchemy import case, func, Text
 from sqlalchemy.dialects.postgresql import JSONB
 
 
@@ -309,6 +309,11 @@ class Shop(db.Model):
     # Shop Metrics
     total_products = db.Column(db.Integer, default=0)
     shop_sales = db.Column(db.Numeric(10, 2), default=0.00)
+
+    # Review rollup across all of the shop's products, maintained by Product.record_rating
+    rating = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Timestamp fields
     date_created = db.Column(db.DateTime, default=datetime.now)
@@ -408,6 +413,7 @@ class Product(db.Model):
     status = db.Column(db.String(20), default='active')  # active, archived
     visibility = db.Column(db.Boolean, default=True)  # Whether product is visible to customers
     featured = db.Column(db.Boolean, default=False)  # Whether product should be featured
+    featured_score = db.Column(db.Float, nullable=False, default=0, server_default='0')  # Stored ranking for /featured
     
     # SEO
     meta_title = db.Column(db.String(255), nullable=True)
@@ -423,10 +429,22 @@ class Product(db.Model):
     total_sales = db.Column(db.Integer, default=0)
     total_revenue = db.Column(db.Numeric(10, 2), default=0.00)
     view_count = db.Column(db.Integer, default=0)
+
+    # Review aggregates, maintained by record_rating; rating is the average
+    rating = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_1 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_2 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_3 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_4 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_5 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Timestamps
     created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime(timezone=True), onupdate=lambda: datetime.now(timezone.utc))
+    # Bumped with every write to the product, its variations or their options; the detail page's validator
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Verification codes
     archive_code = db.Column(db.String(10))
@@ -457,37 +475,29 @@ class Product(db.Model):
         lazy='joined'
     )
 
+    # Listing indexes; product_uuid is the keyset tie-breaker for cursor pagination
+    __table_args__ = (
+        db.Index('idx_products_listing_sales', 'status', 'visibility', 'total_sales', 'view_count', 'product_uuid'),
+        db.Index('idx_products_listing_price', 'status', 'visibility', 'price', 'product_uuid'),
+        db.Index('idx_products_listing_created', 'status', 'visibility', 'created_at', 'product_uuid'),
+        db.Index('idx_products_shop_created', 'shop_uuid', 'created_at', 'product_uuid'),
+        db.Index('idx_products_listing_rating', 'status', 'visibility', 'rating', 'rating_count', 'product_uuid'),
+        db.Index('idx_products_featured_score', 'status', 'visibility', 'featured_score', 'product_uuid'),
+        # Discount boundaries, for the active discount set and its next start or end
+        db.Index('idx_products_discount_start', 'discount_start_date'),
+        db.Index('idx_products_discount_end', 'discount_end_date'),
+    )
+
     def __repr__(self):
         return f'<Product {self.name}>'
 
     @classmethod
     def get_shipping_details(cls, provider_name, rate_name):
-        """Get shipping provider and rate UUIDs from names"""
+        """Get shipping provider and rate UUIDs from UUIDs or names, resolved in memory"""
+        from utils.shipping_resolver import shipping_resolver
         try:
-            # First try to find provider by UUID
-            provider = ShippingProvider.query.get(provider_name)
-            
-            # If not found by UUID, try to find by name
-            if not provider:
-                provider = ShippingProvider.query.filter(
-                    ShippingProvider.name.ilike(f"%{provider_name}%")
-                ).first()
-            
-            if provider:
-                # First try to find rate by UUID
-                rate = ShippingRate.query.get(rate_name)
-                
-                # If not found by UUID, try to find by name for this provider
-                if not rate:
-                    rate = ShippingRate.query.filter(
-                        and_(
-                            ShippingRate.provider_uuid == provider.provider_uuid,
-                            ShippingRate.name.ilike(f"%{rate_name}%")
-                        )
-                    ).first()
-                
-                return provider.provider_uuid, rate.rate_uuid if rate else None
-            return None, None
+            provider_uuid, rate = shipping_resolver().resolve(provider_name, rate_name)
+            return provider_uuid, rate.rate_uuid if rate else None
         except Exception as e:
             print(f"Error getting shipping details: {str(e)}")
             return None, None
@@ -559,23 +569,73 @@ class Product(db.Model):
             print(f"Error creating product from bulk data: {str(e)}")
             raise
 
-    def to_dict(self):
-        # Calculate shipping fee if not already set
-        if self.shipping_fee is None and self.shipping_rate and self.shipping_weight:
-            self.shipping_fee = self.calculate_shipping_fee()
-            if self.shipping_fee is not None:
-                db.session.add(self)
-                db.session.commit()
-        
-        # Calculate total stock based on variations
-        variation_stock = sum(
-            sum(option.stock for option in variation.options)
-            for variation in self.variations
-        ) if self.variations else 0
-        
-        total_stock = variation_stock if variation_stock > 0 else self.quantity
-        
-        # Ensure specifications is a proper JSON object
+    @property
+    def rating_breakdown(self):
+        """Number of reviews per star rating"""
+        return {star: getattr(self, f'rating_{star}') or 0 for star in (5, 4, 3, 2, 1)}
+
+    @classmethod
+    def record_rating(cls, product_uuid, rating, delta=1):
+        """
+        Add (delta=1) or remove (delta=-1) one review's rating from the product and shop aggregates.
+
+        Runs as single-row UPDATEs computed from the stored counters, so it costs the same
+        however many reviews the product has and concurrent reviews don't overwrite each other.
+        """
+        star = getattr(cls, f'rating_{rating}')
+        new_sum = cls.rating_sum + rating * delta
+        new_count = cls.rating_count + delta
+        cls.query.filter(cls.product_uuid == product_uuid).update({
+            cls.rating_sum: new_sum,
+            cls.rating_count: new_count,
+            star: star + delta,
+            cls.rating: case((new_count > 0, new_sum * 1.0 / new_count), else_=0)
+        }, synchronize_session=False)
+
+        shop_uuid = db.session.query(cls.shop_uuid).filter(cls.product_uuid == product_uuid).scalar()
+        shop_sum = Shop.rating_sum + rating * delta
+        shop_count = Shop.rating_count + delta
+        Shop.query.filter(Shop.shop_uuid == shop_uuid).update({
+            Shop.rating_sum: shop_sum,
+            Shop.rating_count: shop_count,
+            Shop.rating: case((shop_count > 0, shop_sum * 1.0 / shop_count), else_=0)
+        }, synchronize_session=False)
+
+    @classmethod
+    def rebuild_rating_aggregates(cls):
+        """Recompute every product and shop rating aggregate from the reviews table"""
+        stats = db.session.query(
+            Review.product_uuid,
+            func.count(Review.review_uuid),
+            func.sum(Review.rating),
+            *[func.sum(case((Review.rating == star, 1), else_=0)) for star in range(1, 6)]
+        ).group_by(Review.product_uuid).all()
+
+        zero = {'rating': 0, 'rating_sum': 0, 'rating_count': 0, **{f'rating_{star}': 0 for star in range(1, 6)}}
+        cls.query.update(zero, synchronize_session=False)
+        db.session.bulk_update_mappings(cls, [{
+            'product_uuid': product_uuid,
+            'rating': total / count,
+            'rating_sum': total,
+            'rating_count': count,
+            **{f'rating_{star}': stars[star - 1] for star in range(1, 6)}
+        } for product_uuid, count, total, *stars in stats])
+
+        shop_stats = db.session.query(
+            cls.shop_uuid, func.sum(cls.rating_sum), func.sum(cls.rating_count)
+        ).filter(cls.rating_count > 0).group_by(cls.shop_uuid).all()
+        Shop.query.update({'rating': 0, 'rating_sum': 0, 'rating_count': 0}, synchronize_session=False)
+        db.session.bulk_update_mappings(Shop, [{
+            'shop_uuid': shop_uuid,
+            'rating': total / count,
+            'rating_sum': total,
+            'rating_count': count
+        } for shop_uuid, total, count in shop_stats])
+        db.session.commit()
+        return len(stats)
+
+    def parsed_specifications(self):
+        """Specifications as a dict, accepting JSON or pipe-delimited strings from older rows"""
         specs = self.specifications
         if isinstance(specs, str):
             try:
@@ -589,64 +649,113 @@ class Product(db.Model):
             except Exception as e:
                 print(f"Error parsing specifications: {str(e)}")
                 specs = {}
-        
-        # Add shop information
-        shop = Shop.query.get(self.shop_uuid)
+        return specs
+
+    def total_stock(self):
+        """Stock summed across variation options, falling back to the product quantity"""
+        variation_stock = sum(
+            sum(option.stock for option in variation.options)
+            for variation in self.variations
+        ) if self.variations else 0
+        return variation_stock if variation_stock > 0 else self.quantity
+
+    def prices_for(self, price, compare_at_price):
+        """(price, compare_at_price) to show for stored prices of this product, its variations or options, at the discount active now"""
+        from utils.pricing import shown_prices
+        return shown_prices(self, price, compare_at_price)
+
+    def shown_prices(self):
+        """The product's own (price, compare_at_price) as shown, as floats"""
+        price, compare_at_price = self.prices_for(self.price, self.compare_at_price)
+        return float(price) if price else None, float(compare_at_price) if compare_at_price else None
+
+    def effective_shipping_fee(self):
+        """Stored shipping fee, or one computed from the shipping rate when it was never stored"""
+        if self.shipping_fee is None and self.shipping_rate_uuid and self.shipping_weight:
+            return self.calculate_shipping_fee()
+        return self.shipping_fee
+
+    # Top-level keys emitted by to_dict; each is only computed when requested
+    DICT_FIELDS = {
+        'product_uuid': lambda p: p.product_uuid,
+        'shop_uuid': lambda p: p.shop_uuid,
+        'seller_id': lambda p: p.seller_id,
+        'category_uuid': lambda p: p.category_uuid,
+        'category_name': lambda p: p.category.name if p.category else None,
+        'name': lambda p: p.name,
+        'description': lambda p: p.description,
+        'price': lambda p: p.shown_prices()[0],
+        'compare_at_price': lambda p: p.shown_prices()[1],
+        'main_image': lambda p: p.main_image,
+        'additional_images': lambda p: p.additional_images,
+        'sku': lambda p: p.sku,
+        'barcode': lambda p: p.barcode,
+        'quantity': lambda p: p.total_stock(),
+        'low_stock_alert': lambda p: p.low_stock_alert,
+        'brand': lambda p: p.brand,
+        'specifications': lambda p: p.parsed_specifications(),
+        'shipping_height': lambda p: p.shipping_height,
+        'shipping_width': lambda p: p.shipping_width,
+        'shipping_length': lambda p: p.shipping_length,
+        'shipping_weight': lambda p: p.shipping_weight,
+        'shipping_provider_uuid': lambda p: p.shipping_provider_uuid,
+        'shipping_rate_uuid': lambda p: p.shipping_rate_uuid,
+        'shipping_fee': lambda p: p.effective_shipping_fee(),
+        'status': lambda p: p.status,
+        'visibility': lambda p: p.visibility,
+        'featured': lambda p: p.featured,
+        'meta_title': lambda p: p.meta_title,
+        'meta_description': lambda p: p.meta_description,
+        'weight': lambda p: p.weight,
+        'width': lambda p: p.width,
+        'height': lambda p: p.height,
+        'length': lambda p: p.length,
+        'total_sales': lambda p: p.total_sales,
+        'total_revenue': lambda p: float(p.total_revenue) if p.total_revenue else 0.00,
+        'view_count': lambda p: p.view_count,
+        'rating': lambda p: round(p.rating or 0, 1),
+        'rating_count': lambda p: p.rating_count or 0,
+        'created_at': lambda p: p.created_at.isoformat() if p.created_at else None,
+        'updated_at': lambda p: p.updated_at.isoformat() if p.updated_at else None,
+        'discount_name': lambda p: p.discount_name,
+        'discount_percentage': lambda p: p.discount_percentage,
+        'discount_start_date': lambda p: p.discount_start_date.isoformat() if p.discount_start_date else None,
+        'discount_end_date': lambda p: p.discount_end_date.isoformat() if p.discount_end_date else None,
+    }
+
+    # Relationships to_dict can embed
+    DICT_INCLUDES = ('shop', 'variations', 'shipping_provider', 'shipping_rate')
+
+    def to_dict(self, fields=None, include=None):
+        """
+        Serialize the product without writing to the session.
+
+        fields limits the top-level keys and include the embedded relationships
+        (see DICT_INCLUDES); None means all of them. Pair with
+        utils.serializers.product_load_options so only what is emitted gets loaded.
+        """
+        fields = self.DICT_FIELDS if fields is None else fields
+        include = self.DICT_INCLUDES if include is None else include
+
         product_dict = {
-            'product_uuid': self.product_uuid,
-            'shop_uuid': self.shop_uuid,
-            'seller_id': self.seller_id,
-            'category_uuid': self.category_uuid,
-            'category_name': self.category.name if self.category else None,
-            'name': self.name,
-            'description': self.description,
-            'price': float(self.price) if self.price else None,
-            'compare_at_price': float(self.compare_at_price) if self.compare_at_price else None,
-            'main_image': self.main_image,
-            'additional_images': self.additional_images,
-            'sku': self.sku,
-            'barcode': self.barcode,
-            'quantity': total_stock,
-            'low_stock_alert': self.low_stock_alert,
-            'brand': self.brand,
-            'specifications': specs,
-            'shipping_height': self.shipping_height,
-            'shipping_width': self.shipping_width,
-            'shipping_length': self.shipping_length,
-            'shipping_weight': self.shipping_weight,
-            'shipping_provider_uuid': self.shipping_provider_uuid,
-            'shipping_rate_uuid': self.shipping_rate_uuid,
-            'shipping_fee': self.shipping_fee,
-            'status': self.status,
-            'visibility': self.visibility,
-            'featured': self.featured,
-            'meta_title': self.meta_title,
-            'meta_description': self.meta_description,
-            'weight': self.weight,
-            'width': self.width,
-            'height': self.height,
-            'length': self.length,
-            'total_sales': self.total_sales,
-            'total_revenue': float(self.total_revenue) if self.total_revenue else 0.00,
-            'view_count': self.view_count,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'variations': [variation.to_dict() for variation in self.variations] if self.variations else [],
-            'discount_name': self.discount_name,
-            'discount_percentage': self.discount_percentage,
-            'discount_start_date': self.discount_start_date.isoformat() if self.discount_start_date else None,
-            'discount_end_date': self.discount_end_date.isoformat() if self.discount_end_date else None,
-            'shop': {
+            key: getter(self) for key, getter in self.DICT_FIELDS.items() if key in fields
+        }
+
+        if 'variations' in include:
+            product_dict['variations'] = [variation.to_dict() for variation in self.variations] if self.variations else []
+
+        if 'shop' in include:
+            shop = self.shop
+            product_dict['shop'] = {
                 'shop_uuid': shop.shop_uuid,
                 'business_name': shop.business_name,
                 'business_city': shop.business_city,
                 'business_province': shop.business_province,
                 'shop_logo': shop.shop_logo
             } if shop else None
-        }
 
         # Add shipping provider details if available
-        if self.shipping_provider:
+        if 'shipping_provider' in include and self.shipping_provider:
             try:
                 product_dict['shipping_provider_details'] = {
                     'provider_uuid': self.shipping_provider.provider_uuid,
@@ -661,7 +770,7 @@ class Product(db.Model):
                 product_dict['shipping_provider_details'] = None
 
         # Add shipping rate details if available
-        if self.shipping_rate:
+        if 'shipping_rate' in include and self.shipping_rate:
             try:
                 product_dict['shipping_rate_details'] = {
                     'rate_uuid': self.shipping_rate.rate_uuid,
@@ -676,17 +785,12 @@ class Product(db.Model):
             except Exception as e:
                 print(f"Error serializing shipping rate: {str(e)}")
                 product_dict['shipping_rate_details'] = None
-        
+
         return product_dict
 
     def get_category_path(self, category):
         """Get the category path"""
-        path = [category.name]
-        current = category
-        while current.parent:
-            current = current.parent
-            path.insert(0, current.name)
-        return ' > '.join(path)
+        return category.get_path()
 
     def generate_verification_codes(self):
         """Generate new verification codes for archive/unarchive actions"""
@@ -755,6 +859,26 @@ class CartItem(db.Model):
     product = db.relationship('Product', backref=db.backref('cart_items', lazy=True))
     variation = db.relationship('ProductVariation', backref=db.backref('cart_items', lazy=True))
 
+    @staticmethod
+    def pricing_options():
+        """Loader options for pricing a list of cart items without a query per item"""
+        return (
+            db.joinedload(CartItem.product),
+            db.selectinload(CartItem.variation).selectinload(ProductVariation.options)
+        )
+
+    def unit_price(self):
+        """Price of one unit right now: the selected option's stored price, else the product's, at the discount active now"""
+        option = None
+        if self.selected_option and self.selected_option.get('option_uuid'):
+            option_uuid = self.selected_option['option_uuid']
+            if self.variation is not None:
+                option = next((opt for opt in self.variation.options if opt.option_uuid == option_uuid), None)
+            if option is None:
+                option = db.session.get(ProductVariationOption, option_uuid)
+        price = option.price if option is not None and option.price is not None else self.product.price
+        return self.product.prices_for(price, None)[0]
+
     def to_dict(self):
         item_dict = {
             'item_uuid': self.item_uuid,
@@ -769,7 +893,7 @@ class CartItem(db.Model):
                 'product_uuid': self.product.product_uuid,
                 'name': self.product.name,
                 'main_image': self.product.main_image,
-                'price': float(self.selected_option['price']) if self.selected_option and 'price' in self.selected_option else float(self.product.price) if self.product.price else None,
+                'price': float(self.unit_price()) if self.product.price else None,
                 'quantity': self.selected_option['stock'] if self.selected_option and 'stock' in self.selected_option else self.product.quantity,
                 'sku': self.selected_option['sku'] if self.selected_option and 'sku' in self.selected_option else self.product.sku,
                 'shipping_fee': float(self.product.shipping_fee) if self.product.shipping_fee else 0.00
@@ -828,12 +952,16 @@ class Category(db.Model):
 
     def get_path(self):
         """Get the full category path from root to this category"""
-        path = []
-        current = self
-        while current:
-            path.insert(0, current.name)
-            current = current.parent
-        return ' > '.join(path)
+        from utils.category_tree import get_tree
+        names = get_tree().path(self.category_uuid)
+        if names is None:
+            # Not in the cached snapshot yet, walk the parents
+            names = []
+            current = self
+            while current:
+                names.insert(0, current.name)
+                current = current.parent
+        return ' > '.join(names)
 
     def __repr__(self):
         return f'<Category {self.name}>'
@@ -870,12 +998,13 @@ class ProductVariation(db.Model):
     def to_dict(self):
         # Get the first option's data since we're using it for the variation display
         first_option = self.options[0] if self.options else None
+        price, compare_at_price = self.product.prices_for(self.price, self.compare_at_price)
         
         return {
             'variation_uuid': str(self.variation_uuid),
             'product_uuid': str(self.product_uuid),
-            'price': float(self.price),
-            'compare_at_price': float(self.compare_at_price) if self.compare_at_price else None,
+            'price': float(price),
+            'compare_at_price': float(compare_at_price) if compare_at_price else None,
             'quantity': self.quantity,
             'has_individual_stock': self.has_individual_stock,
             'stock': first_option.stock if first_option else 0,
@@ -902,13 +1031,14 @@ class ProductVariationOption(db.Model):
     sku = db.Column(db.String(50), nullable=True)
 
     def to_dict(self):
+        price, compare_at_price = self.variation.product.prices_for(self.price, self.compare_at_price)
         return {
             'option_uuid': str(self.option_uuid),
             'variation_uuid': str(self.variation_uuid),
             'name': self.name,
             'value': self.value,
-            'price': float(self.price) if self.price is not None else None,
-            'compare_at_price': float(self.compare_at_price) if self.compare_at_price else None,
+            'price': float(price) if price is not None else None,
+            'compare_at_price': float(compare_at_price) if compare_at_price else None,
             'stock': self.stock,
             'low_stock_alert': self.low_stock_alert,
             'sku': self.sku
@@ -1020,6 +1150,11 @@ class Review(db.Model):
     # Relationships
     product = db.relationship('Product', backref=db.backref('reviews', lazy=True))
     user = db.relationship('Users', backref=db.backref('reviews', lazy=True))
+
+    # Newest-first review pages per product; review_uuid is the keyset tie-breaker
+    __table_args__ = (
+        db.Index('idx_reviews_product_created', 'product_uuid', 'created_at', 'review_uuid'),
+    )
     
     def __repr__(self):
         return f'<Review {self.review_uuid}>'
@@ -1097,13 +1232,13 @@ class Wishlist(db.Model):
     user = db.relationship('Users', backref=db.backref('wishlists', lazy=True))
     product = db.relationship('Product', backref=db.backref('wishlists', lazy=True))
 
-    def to_dict(self):
+    def to_dict(self, product_fields=None, product_include=None):
         return {
             'id': self.id,
             'user_uuid': self.user_uuid,
             'product_uuid': self.product_uuid,
             'created_at': self.created_at.isoformat(),
-            'product': self.product.to_dict() if self.product else None
+            'product': self.product.to_dict(product_fields, product_include) if self.product else None
         }
 
 class Newsletter(db.Model):
@@ -1139,6 +1274,83 @@ class Contact(db.Model):
             'updated_at': self.updated_at.isoformat()
         }
 
+class CatalogVersion(db.Model):
+    """Counter bumped whenever anything in a catalog scope (products, shops, ...) is written"""
+    __tablename__ = 'catalog_versions'
+
+    scope = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class JobLease(db.Model):
+    """Named lease held by one process at a time, e.g. the job runner allowed to run the periodic jobs"""
+    __tablename__ = 'job_leases'
+
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+class ImportJob(db.Model):
+    """A bulk product upload queued for the import worker, with its progress"""
+    __tablename__ = 'import_jobs'
+
+    job_uuid = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    seller_id = db.Column(db.String(36), db.ForeignKey('seller_info.seller_id'), nullable=False)
+    shop_uuid = db.Column(db.String(36), db.ForeignKey('shops.shop_uuid'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+    message = db.Column(db.Text, nullable=True)
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    products_created = db.Column(db.Integer, nullable=False, default=0)
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.JSON, nullable=True)
+    # Worker running the job; it renews heartbeat_at with every chunk and the job is
+    # picked up again by another worker when the heartbeat goes stale
+    worker = db.Column(db.String(100), nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Where the current attempt started, for its throughput
+    started_at = db.Column(db.DateTime, nullable=True)
+    started_row = db.Column(db.Integer, nullable=False, default=0)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_import_jobs_status', 'status', 'created_at'),
+        db.Index('idx_import_jobs_shop', 'shop_uuid', 'created_at'),
+    )
+
+    def progress(self):
+        """Counts so far in the shape of ProductImport.report(), to resume the import from"""
+        return {
+            'rows_processed': self.rows_processed,
+            'products_created': self.products_created,
+            'error_count': self.error_count,
+            'errors': self.errors or []
+        }
+
+    def rows_per_second(self):
+        if not self.started_at:
+            return None
+        elapsed = ((self.finished_at or datetime.utcnow()) - self.started_at).total_seconds()
+        return round((self.rows_processed - self.started_row) / elapsed, 1) if elapsed > 0 else None
+
+    def to_dict(self):
+        return {
+            'job_uuid': self.job_uuid,
+            'shop_uuid': self.shop_uuid,
+            'filename': self.filename,
+            'status': self.status,
+            'message': self.message,
+            **self.progress(),
+            'rows_per_second': self.rows_per_second(),
+            'attempts': self.attempts,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
 class Banner(db.Model):
     __tablename__ = 'banners'
 
@@ -1225,6 +1437,11 @@ class Order(db.Model):
     user = db.relationship('Users', backref=db.backref('orders', lazy=True))
     items = db.relationship('OrderItem', backref='order', lazy=True)
 
+    # Lets batch jobs read orders placed since their last run
+    __table_args__ = (
+        db.Index('idx_orders_created', 'created_at'),
+    )
+
     def to_dict(self):
         return {
             'order_uuid': self.order_uuid,
@@ -1270,6 +1487,10 @@ class OrderItem(db.Model):
     product = db.relationship('Product', backref=db.backref('order_items', lazy=True))
     variation = db.relationship('ProductVariation', backref=db.backref('order_items', lazy=True))
 
+    __table_args__ = (
+        db.Index('idx_order_items_order', 'order_uuid'),
+    )
+
     def to_dict(self):
         # Get variation details if they exist
         variation_details = None
@@ -1299,6 +1520,62 @@ class OrderItem(db.Model):
             }
         }
 
+
+class ProductCoOccurrence(db.Model):
+    """Weighted count of baskets holding both products; rows with other_uuid == product_uuid hold the item's own count"""
+    __tablename__ = 'product_co_occurrences'
+
+    product_uuid = db.Column(db.String(36), db.ForeignKey('products.product_uuid', ondelete='CASCADE'), primary_key=True)
+    other_uuid = db.Column(db.String(36), db.ForeignKey('products.product_uuid', ondelete='CASCADE'), primary_key=True)
+    weight = db.Column(db.Float, nullable=False, default=0)
+
+
+class ProductRecommendation(db.Model):
+    """Top-K "frequently bought together" neighbours per product, rebuilt by utils.recommendations"""
+    __tablename__ = 'product_recommendations'
+
+    product_uuid = db.Column(db.String(36), db.ForeignKey('products.product_uuid', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    recommended_uuid = db.Column(db.String(36), db.ForeignKey('products.product_uuid', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+
+class ProductSimilarity(db.Model):
+    """Top-K content-similar products per product, rebuilt by utils.similar_products"""
+    __tablename__ = 'product_similarities'
+
+    product_uuid = db.Column(db.String(36), db.ForeignKey('products.product_uuid', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    similar_uuid = db.Column(db.String(36), db.ForeignKey('products.product_uuid', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_product_similarities_similar', 'similar_uuid'),
+    )
+
+
+class JobWatermark(db.Model):
+    """How far an incremental batch job has processed its input"""
+    __tablename__ = 'job_watermarks'
+
+    name = db.Column(db.String(64), primary_key=True)
+    watermark = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ProductChange(db.Model):
+    """Append-only log of written products, read by in-process catalog snapshots to refresh incrementally"""
+    __tablename__ = 'product_changes'
+
+    change_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    # NULL means every product may have changed
+    product_uuid = db.Column(db.String(36), nullable=True)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_product_changes_changed_at', 'changed_at'),
+    )
+
 class SellerTransaction(db.Model):
     __tablename__ = 'seller_transactions'
     
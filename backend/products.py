@@ -1,22 +1,39 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, request, jsonify, send_file, current_app, url_for, stream_with_context, g
 from flask_login import login_required, current_user
 from datetime import datetime, timedelta, timezone
-from models import db, Product, Shop, SellerInfo, Role, ProductVariation, ProductVariationOption, Category, ShippingProvider, ShippingRate, Review, ChatRoom, Users, Wishlist
+from models import db, Product, Shop, SellerInfo, Role, ProductVariation, ProductVariationOption, Category, ShippingProvider, ShippingRate, Review, ChatRoom, Users, Wishlist, ImportJob
 from sqlalchemy import or_, and_
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
 import uuid
 import json
+import time
 import re
 from decimal import Decimal
 import secrets
 import string
-import pandas as pd
 import io
 from werkzeug.utils import secure_filename
 import requests
 from utils.auth_utils import role_required
+from utils import search_index, prefix_index, category_tree, trigram_index
+from featured_products import refresh_featured_scores
+from utils.serializers import serialize_product_cards, serialize_category_refs, count_active_products, parse_fieldset, product_load_options
+from utils.http_cache import conditional_get, bump_catalog_versions
+from utils.response_cache import cached_response
+from utils.query_budget import query_budget
+from utils.view_counter import track_view, view_counter
+from utils.recommendations import get_recommendations
+from utils.similar_products import get_similar_products
+from utils.facets import parse_facets, facet_filters, apply_facet_filters, compute_facets
+from utils.catalog_snapshot import get_snapshot, load_products, snapshot_validator
+from utils.discount_updates import expire_discounts, apply_discount
+from utils.product_import import InvalidImportFile
+from utils.import_jobs import enqueue_import
+from utils.product_export import export_chunks, gzip_chunks, EXPORT_FORMATS
+from utils.pricing import pricing_epoch, discounted_price, price_key, effective_price_expression, list_price_expression, discounted_expression
+from utils.pagination import InvalidCursor, column_key, expression_key, keyset_paginate, order_by_keys, count_total
 
 products = Blueprint('products', __name__)
 
@@ -30,115 +47,39 @@ def generate_verification_code():
     characters = string.ascii_uppercase + string.digits
     return ''.join(secrets.choice(characters) for _ in range(6))
 
-def apply_discount_to_product(product, discount_percentage):
-    """Helper function to apply discount to a product and its variations"""
-    if product.compare_at_price:
-        product.price = round(float(product.compare_at_price) * (1 - discount_percentage / 100), 2)
-        
-        # Apply to variations
-        for variation in product.variations:
-            if variation.compare_at_price:
-                variation.price = round(float(variation.compare_at_price) * (1 - discount_percentage / 100), 2)
-                
-                # Apply to options
-                for option in variation.options:
-                    if option.price is not None and option.compare_at_price:
-                        option.price = round(float(option.compare_at_price) * (1 - discount_percentage / 100), 2)
-
-def remove_discount_from_product(product):
-    """Helper function to remove discount from a product and its variations"""
-    if product.compare_at_price:
-        product.price = product.compare_at_price
-        product.compare_at_price = None
-        product.discount_name = None
-        product.discount_percentage = None
-        product.discount_start_date = None
-        product.discount_end_date = None
-        
-        # Remove from variations
-        for variation in product.variations:
-            if variation.compare_at_price:
-                variation.price = variation.compare_at_price
-                variation.compare_at_price = None
-                
-                # Remove from options
-                for option in variation.options:
-                    if option.compare_at_price:
-                        option.price = option.compare_at_price
-                        option.compare_at_price = None
-
-@products.route('/cron/update-discounts', methods=['POST'])
-def update_discounts():
+def refresh_product_indexes(*product_uuids):
+    """Patch the search, fuzzy and suggestion indexes and featured scores after products were created, updated, archived or deleted"""
     try:
-        # Get current time in UTC
-        now = datetime.now(timezone.utc)
-        print(f"Running discount updates at {now}")
-
-        # Find products with pending discounts that should be active
-        pending_products = Product.query.filter(
-            Product.discount_name.isnot(None),
-            Product.discount_start_date <= now,
-            Product.discount_end_date >= now,
-            Product.price == Product.compare_at_price  # Price hasn't been discounted yet
-        ).all()
+        search_index.refresh_products(product_uuids)
+        trigram_index.refresh('product', product_uuids)
+        prefix_index.refresh_products(product_uuids)
+        refresh_featured_scores(product_uuids)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error refreshing product indexes: {str(e)}")
 
-        # Find products with expired discounts
-        expired_products = Product.query.filter(
-            Product.discount_name.isnot(None),
-            Product.discount_end_date < now
-        ).all()
+def clear_expired_discounts():
+    """
+    Clear discounts whose end date has passed, in one set-based UPDATE.
 
-        # Apply pending discounts
-        activated_count = 0
-        for product in pending_products:
-            print(f"Activating discount for product {product.name}")
-            if product.compare_at_price:
-                product.price = round(float(product.compare_at_price) * (1 - product.discount_percentage / 100), 2)
-                
-                # Apply to variations
-                for variation in product.variations:
-                    if variation.compare_at_price:
-                        variation.price = round(float(variation.compare_at_price) * (1 - product.discount_percentage / 100), 2)
-                        
-                        # Apply to options
-                        for option in variation.options:
-                            if option.price is not None and option.compare_at_price:
-                                option.price = round(float(option.compare_at_price) * (1 - product.discount_percentage / 100), 2)
-            activated_count += 1
-
-        # Remove expired discounts
-        expired_count = 0
-        for product in expired_products:
-            print(f"Removing expired discount from product {product.name}")
-            if product.compare_at_price:
-                product.price = product.compare_at_price
-                product.compare_at_price = None
-                
-                # Remove from variations
-                for variation in product.variations:
-                    if variation.compare_at_price:
-                        variation.price = variation.compare_at_price
-                        variation.compare_at_price = None
-                        
-                        # Remove from options
-                        for option in variation.options:
-                            if option.compare_at_price:
-                                option.price = option.compare_at_price
-                                option.compare_at_price = None
-            
-            # Clear discount info
-            product.discount_name = None
-            product.discount_percentage = None
-            product.discount_start_date = None
-            product.discount_end_date = None
-            expired_count += 1
+    Prices are resolved from the discount windows at read time, so nothing has to
+    happen at a discount's start or end; this only keeps the discount lists tidy.
+    Returns the number of products cleared.
+    """
+    expired, _ = expire_discounts(datetime.now(timezone.utc))
+    db.session.commit()
+    refresh_product_indexes(*expired)
+    return len(expired)
 
-        db.session.commit()
+@products.route('/cron/update-discounts', methods=['POST'])
+def update_discounts():
+    try:
+        print(f"Running discount updates at {datetime.now(timezone.utc)}")
+        count = clear_expired_discounts()
 
         return jsonify({
             "message": "Discount updates completed",
-            "discounts_activated": activated_count,
-            "discounts_expired": expired_count
+            "discounts_expired": count
         }), 200
 
     except Exception as e:
@@ -275,6 +216,7 @@ def create_product(seller_id, shop_uuid):
 
         db.session.add(product)
         db.session.commit()
+        refresh_product_indexes(product.product_uuid)
 
         return jsonify({
             "message": "Product created successfully",
@@ -474,6 +416,7 @@ def update_product(seller_id, shop_uuid, product_uuid):
 
         product.updated_at = datetime.utcnow()
         db.session.commit()
+        refresh_product_indexes(product_uuid)
 
         return jsonify({
             "message": "Product updated successfully",
@@ -508,6 +451,7 @@ def publish_product(seller_id, shop_uuid, product_uuid):
 
         try:
             db.session.commit()
+            refresh_product_indexes(product_uuid)
             return jsonify({
                 "message": "Product published successfully",
                 "status": product.status
@@ -553,6 +497,7 @@ def update_product_status(seller_id, shop_uuid, product_uuid):
 
         try:
             db.session.commit()
+            refresh_product_indexes(product_uuid)
             return jsonify({
                 "message": "Product status updated successfully",
                 "status": product.status
@@ -594,6 +539,7 @@ def archive_product(seller_id, shop_uuid, product_uuid):
         product.status = 'archived'
         product.visibility = False
         db.session.commit()
+        refresh_product_indexes(product_uuid)
 
         product_data = product.to_dict()
         product_data.update({
@@ -644,6 +590,7 @@ def unarchive_product(seller_id, shop_uuid, product_uuid):
         product.status = 'draft'
         product.visibility = True
         db.session.commit()
+        refresh_product_indexes(product_uuid)
 
         product_data = product.to_dict()
         product_data.update({
@@ -721,9 +668,11 @@ def get_products(seller_id, shop_uuid):
         status = request.args.get('status')
         sort_by = request.args.get('sort_by', 'created_at')
         sort_order = request.args.get('sort_order', 'desc')
+        fields = parse_fieldset(request.args.get('fields'))
+        include = parse_fieldset(request.args.get('include'))
 
-        # Base query
-        query = Product.query.filter_by(shop_uuid=shop_uuid)
+        # Base query, loading only what the requested fieldset emits
+        query = Product.query.filter_by(shop_uuid=shop_uuid).options(*product_load_options(fields, include))
 
         # Apply filters
         if search:
@@ -740,22 +689,41 @@ def get_products(seller_id, shop_uuid):
         if status:
             query = query.filter_by(status=status)
 
-        # Apply sorting
-        if sort_order == 'desc':
-            query = query.order_by(getattr(Product, sort_by).desc())
-        else:
-            query = query.order_by(getattr(Product, sort_by).asc())
+        # Apply sorting; product_uuid breaks ties so pages never overlap
+        descending = sort_order == 'desc'
+        sort_keys = [
+            column_key(getattr(Product, sort_by), descending),
+            column_key(Product.product_uuid, descending)
+        ]
 
-        # Paginate results
-        products = query.paginate(page=page, per_page=per_page)
+        # Paginate results, by cursor when the client asks for it
+        cursor = request.args.get('cursor')
+        if cursor is not None:
+            # Columns that can be compared in a cursor, with the value used for NULLs
+            cursor_sorts = {'created_at': None, 'name': None, 'price': None, 'quantity': 0, 'total_sales': 0, 'view_count': 0}
+            if sort_by not in cursor_sorts:
+                return jsonify({"message": f"Cursor pagination is not supported when sorting by {sort_by}"}), 400
+            sort_keys[0] = column_key(getattr(Product, sort_by), descending, cursor_sorts[sort_by])
+            items, next_cursor = keyset_paginate(query, sort_keys, f'{sort_by}:{sort_order}', cursor, per_page)
+
+            return jsonify({
+                "products": [p.to_dict(fields, include) for p in items],
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None,
+                "total": count_total(query) if request.args.get('include_total') == 'true' else None
+            }), 200
+
+        products = order_by_keys(query, sort_keys).paginate(page=page, per_page=per_page)
 
         return jsonify({
-            "products": [p.to_dict() for p in products.items],
+            "products": [p.to_dict(fields, include) for p in products.items],
             "total": products.total,
             "pages": products.pages,
             "current_page": products.page
         }), 200
 
+    except InvalidCursor as e:
+        return jsonify({"message": str(e)}), 400
     except Exception as e:
         print(f"Error fetching products: {str(e)}")
         return jsonify({"message": "Failed to fetch products", "error": str(e)}), 500
@@ -825,6 +793,7 @@ def delete_product(seller_id, shop_uuid, product_uuid):
         # Delete product from database
         db.session.delete(product)
         db.session.commit()
+        refresh_product_indexes(product_uuid)
 
         return jsonify({"message": "Product deleted successfully"}), 200
 
@@ -1201,9 +1170,12 @@ def manage_inventory_put(seller_id, shop_uuid, product_uuid):
 
 # Category endpoints
 @products.route('/categories', methods=['GET'])
+@conditional_get('categories', max_age=300)
+@cached_response('categories')
 def get_categories():
     try:
-        categories = Category.query.all()
+        # Served from the cached category snapshot
+        tree = category_tree.get_tree()
         return jsonify([{
             'uuid': category.category_uuid,
             'name': category.name,
@@ -1217,8 +1189,8 @@ def get_categories():
                 'description': sub.description,
                 'is_active': sub.is_active,
                 'image_url': sub.image_url
-            } for sub in category.subcategories if sub.is_active]
-        } for category in categories]), 200
+            } for sub in tree.children(category.category_uuid) if sub.is_active]
+        } for category in tree.nodes.values()]), 200
     except Exception as e:
         print(f"Error fetching categories: {str(e)}")  # Add logging
         return jsonify({'message': 'Failed to fetch categories', 'error': str(e)}), 500
@@ -1240,6 +1212,7 @@ def create_category():
         )
         db.session.add(category)
         db.session.commit()
+        category_tree.categories_changed()
         
         return jsonify({
             'id': category.category_uuid,
@@ -1275,6 +1248,8 @@ def update_category(category_id):
         category.updated_at = datetime.utcnow()
         
         db.session.commit()
+        category_tree.categories_changed()
+        search_index.refresh_category(category.category_uuid)
         
         return jsonify({
             'id': category.category_uuid,
@@ -1313,6 +1288,7 @@ def delete_category(category_id):
             
         db.session.delete(category)
         db.session.commit()
+        category_tree.categories_changed()
         
         return jsonify({'message': 'Category deleted successfully'}), 200
     except Exception as e:
@@ -1554,7 +1530,19 @@ def get_all_shipping_rates():
         print(f"Error fetching shipping rates: {str(e)}")
         return jsonify({'message': 'Failed to fetch shipping rates'}), 500
 
+# Catalog snapshot order for each /products sort_by
+LISTING_SNAPSHOT_SORTS = {
+    'latest': 'latest',
+    'topSales': 'sales',
+    'priceAsc': 'price_asc',
+    'priceDesc': 'price_desc',
+    'rating': 'rating',
+    'popular': 'popular',
+}
+
 @products.route('/products', methods=['GET'])
+@conditional_get('products', 'shops', 'categories', 'reviews', max_age=30, validator=snapshot_validator)
+@cached_response('products', 'shops', 'categories', 'reviews', validator=snapshot_validator)
 def get_products_by_category():
     try:
         # Get query parameters
@@ -1572,145 +1560,138 @@ def get_products_by_category():
             Product.visibility == True
         )
 
-        # Apply category filter with parent category handling
+        # Apply category filter, including active subcategories at any depth
+        category_ids = None
         if category_uuid:
-            # Check if it's a parent category
-            if category_uuid.startswith('main-cat-'):
-                # Get all subcategories of this parent category
-                subcategories = Category.query.filter(
-                    Category.parent_id == category_uuid,
-                    Category.is_active == True
-                ).all()
-                
-                # Get subcategory IDs including the parent category
-                category_ids = [category_uuid]
-                category_ids.extend([sub.category_uuid for sub in subcategories])
-                
-                # Filter products by all these categories
-                query = query.filter(Product.category_uuid.in_(category_ids))
-            else:
-                # For subcategories, just filter by the specific category
-                query = query.filter(Product.category_uuid == category_uuid)
+            category_ids = category_tree.get_tree().descendant_ids(category_uuid) or {category_uuid}
+            query = query.filter(Product.category_uuid.in_(category_ids))
 
         # Apply price filter
         if min_price is not None:
-            query = query.filter(Product.price >= min_price)
+            query = query.filter(effective_price_expression() >= min_price)
         if max_price is not None:
-            query = query.filter(Product.price <= max_price)
+            query = query.filter(effective_price_expression() <= max_price)
+
+        # Apply rating filter
+        if rating is not None:
+            query = query.filter(Product.rating >= rating)
+
+        # Apply brand and discount filters picked from the facets
+        query = apply_facet_filters(query, request.args)
 
-        # Apply sorting
+        # Facet counts come from one grouped query, whose row counts also give the total
+        facets = parse_facets(request.args.get('facets'))
+        if facets is not None:
+            total, facet_counts = compute_facets(query, facets, current_app.config['FACET_PRICE_BUCKETS'])
+
+        # Apply sorting; product_uuid breaks ties so pages never overlap
         if sort_by == 'latest':
-            query = query.order_by(Product.created_at.desc())
+            sort_keys = [column_key(Product.created_at, True)]
         elif sort_by == 'topSales':
-            query = query.order_by(Product.total_sales.desc())
+            sort_keys = [column_key(Product.total_sales, True)]
         elif sort_by == 'priceAsc':
-            query = query.order_by(Product.price.asc())
+            sort_keys = [price_key()]
         elif sort_by == 'priceDesc':
-            query = query.order_by(Product.price.desc())
+            sort_keys = [price_key(True)]
+        elif sort_by == 'rating':
+            sort_keys = [column_key(Product.rating, True), column_key(Product.rating_count, True)]
         else:  # default 'popular'
-            query = query.order_by(Product.total_sales.desc(), Product.view_count.desc())
+            sort_by = 'popular'
+            sort_keys = [column_key(Product.total_sales, True), column_key(Product.view_count, True)]
+        sort_keys.append(column_key(Product.product_uuid, sort_keys[-1][1]))
+
+        # Paginate results, by cursor when the client asks for it, from this worker's catalog snapshot when it's on
+        cursor = request.args.get('cursor')
+        snapshot = get_snapshot() if cursor is None and facets is None else None
+        if cursor is not None:
+            items, next_cursor = keyset_paginate(query, sort_keys, sort_by, cursor, per_page)
+        elif snapshot is not None:
+            brands, discounted = facet_filters(request.args)
+            product_uuids, total, page, pages = snapshot.paginate(
+                LISTING_SNAPSHOT_SORTS[sort_by], page, per_page,
+                category_uuids=category_ids, min_price=min_price, max_price=max_price,
+                min_rating=rating, brands=brands, discounted=discounted
+            )
+            items = load_products(product_uuids)
+        else:
+            products = order_by_keys(query, sort_keys).paginate(
+                page=page, per_page=per_page, error_out=False, count=facets is None
+            )
+            items = products.items
 
-        # Paginate results
-        products = query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        response = []
-        for product in products.items:
-            # Get shop information
-            shop = Shop.query.get(product.shop_uuid)
-            
-            # Calculate discount percentage if applicable
-            discount_percentage = None
-            if product.compare_at_price and float(product.compare_at_price) > float(product.price):
-                discount_percentage = round(
-                    ((float(product.compare_at_price) - float(product.price)) / float(product.compare_at_price)) * 100,
-                    1
-                )
+        # Shops are loaded in one batched query for the whole page
+        response = serialize_product_cards(items)
 
-            product_dict = {
-                'product_uuid': product.product_uuid,
-                'name': product.name,
-                'price': float(product.price),
-                'compare_at_price': float(product.compare_at_price) if product.compare_at_price else None,
-                'discount_percentage': discount_percentage,
-                'discount_name': product.discount_name,  # Add discount name
-                'main_image': product.main_image,
-                'rating': 4.5,  # TODO: Implement actual rating system
-                'total_sales': product.total_sales,
-                'quantity': product.quantity,
-                'shipping_fee': float(product.shipping_fee) if product.shipping_fee else 0,
-                'created_at': product.created_at.isoformat() if product.created_at else None,
-                'updated_at': product.updated_at.isoformat() if product.updated_at else None,
-                'shop': {
-                    'shop_uuid': shop.shop_uuid,
-                    'business_name': shop.business_name,
-                    'business_city': shop.business_city,
-                    'business_province': shop.business_province
-                } if shop else None
+        if cursor is not None:
+            pagination = {
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+                'total': None
+            }
+            if facets is not None:
+                pagination['total'] = total
+            elif request.args.get('include_total') == 'true':
+                pagination['total'] = count_total(query)
+        elif snapshot is not None:
+            pagination = {
+                'total': total,
+                'pages': pages,
+                'current_page': page
+            }
+        elif facets is not None:
+            pagination = {
+                'total': total,
+                'pages': (total + per_page - 1) // per_page if per_page > 0 else 0,
+                'current_page': products.page
+            }
+        else:
+            pagination = {
+                'total': products.total,
+                'pages': products.pages,
+                'current_page': products.page
             }
-            response.append(product_dict)
 
-        return jsonify({
-            'products': response,
-            'total': products.total,
-            'pages': products.pages,
-            'current_page': products.page
-        })
+        result = {'products': response, **pagination}
+        if facets is not None:
+            result['facets'] = facet_counts
+        return jsonify(result)
 
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         print(f"Error fetching products: {str(e)}")
         return jsonify({'message': str(e)}), 500
 
 @products.route('/products/daily-finds', methods=['GET'])
+@conditional_get('products', 'shops', 'reviews', max_age=60, validator=snapshot_validator)
+@cached_response('products', 'shops', 'reviews', validator=snapshot_validator)
 def get_daily_finds():
     try:
         # Get products that are:
         # 1. Active and visible
-        # 2. Have a compare_at_price (meaning they're discounted)
+        # 2. Sell below the price shown struck through (an open discount or a compare_at_price)
         # 3. Have stock available
         # 4. Sorted by discount percentage and total sales
-        daily_finds = Product.query.filter(
-            Product.status == 'active',
-            Product.visibility == True,
-            Product.compare_at_price.isnot(None),
-            Product.compare_at_price > Product.price,
-            Product.quantity > 0
-        ).order_by(
-            # Order by discount percentage (higher discount first)
-            ((Product.compare_at_price - Product.price) / Product.compare_at_price).desc(),
-            Product.total_sales.desc()
-        ).limit(20).all()
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            product_uuids, _ = snapshot.select('discount', limit=20, discounted=True, in_stock=True)
+            daily_finds = load_products(product_uuids)
+        else:
+            now = datetime.now(timezone.utc)
+            list_price = list_price_expression(now)
+            daily_finds = Product.query.filter(
+                Product.status == 'active',
+                Product.visibility == True,
+                discounted_expression(now),
+                Product.quantity > 0
+            ).order_by(
+                # Order by discount percentage (higher discount first)
+                ((list_price - effective_price_expression(now)) / list_price).desc(),
+                Product.total_sales.desc()
+            ).limit(20).all()
 
         # Convert products to dictionary format
-        products_data = []
-        for product in daily_finds:
-            # Calculate discount percentage
-            original_price = float(product.compare_at_price)
-            current_price = float(product.price)
-            discount_percentage = ((original_price - current_price) / original_price) * 100
-
-            # Get shop information
-            shop = Shop.query.get(product.shop_uuid)
-
-            product_dict = {
-                'product_uuid': product.product_uuid,
-                'name': product.name,
-                'price': current_price,
-                'compare_at_price': original_price,
-                'discount_percentage': round(discount_percentage, 1),
-                'discount_name': product.discount_name,  # Add discount name
-                'main_image': product.main_image,
-                'rating': 4.5,  # TODO: Implement actual rating system
-                'total_sales': product.total_sales,
-                'quantity': product.quantity,
-                'shipping_fee': float(product.shipping_fee) if product.shipping_fee else 0,
-                'shop': {
-                    'shop_uuid': shop.shop_uuid,
-                    'business_name': shop.business_name,
-                    'business_city': shop.business_city,
-                    'business_province': shop.business_province
-                } if shop else None
-            }
-            products_data.append(product_dict)
+        products_data = serialize_product_cards(daily_finds)
 
         return jsonify(products_data), 200
 
@@ -1840,8 +1821,8 @@ def get_active_discounts(seller_id):
                 grouped[discount_key]["products"].append({
                     "product_uuid": product.product_uuid,
                     "name": product.name,
-                    "original_price": float(product.compare_at_price) if product.compare_at_price else float(product.price),
-                    "discounted_price": float(product.price)
+                    "original_price": float(product.price),
+                    "discounted_price": float(discounted_price(product.price, product.discount_percentage))
                 })
             return list(grouped.values())
 
@@ -1890,59 +1871,28 @@ def create_discount(seller_id):
         if not product_ids:
             return jsonify({"message": "No products selected"}), 400
 
-        # Get products and verify ownership
-        products = Product.query.filter(
+        # Verify ownership
+        owned = Product.query.filter(
             Product.product_uuid.in_(product_ids),
             Product.seller_id == seller_id
-        ).all()
+        ).count()
 
-        if len(products) != len(product_ids):
+        if owned != len(set(product_ids)):
             return jsonify({"message": "Some products not found or not owned by seller"}), 400
 
         # Get current time in UTC
         now = datetime.now(timezone.utc)
         is_active = start_date <= now <= end_date
 
-        # Update products with discount info
-        for product in products:
-            # Store original price in compare_at_price if not already set
-            if not product.compare_at_price:
-                product.compare_at_price = product.price
-            
-            # Only apply discount to price if the discount is active now
-            if is_active:
-                product.price = round(float(product.compare_at_price) * (1 - discount_percentage / 100), 2)
-            
-            product.discount_name = data['discount_name']
-            product.discount_start_date = start_date
-            product.discount_end_date = end_date
-            product.discount_percentage = discount_percentage
-
-            # Handle variations
-            for variation in product.variations:
-                # Store original price in compare_at_price if not already set
-                if not variation.compare_at_price:
-                    variation.compare_at_price = variation.price
-                
-                # Only apply discount if active
-                if is_active:
-                    variation.price = round(float(variation.compare_at_price) * (1 - discount_percentage / 100), 2)
-
-                # Handle options
-                for option in variation.options:
-                    if option.price is not None:
-                        # Store original price in compare_at_price if not already set
-                        if not option.compare_at_price:
-                            option.compare_at_price = option.price
-                        # Only apply discount if active
-                        if is_active:
-                            option.price = round(float(option.compare_at_price) * (1 - discount_percentage / 100), 2)
+        # Only the discount window is stored; prices are discounted at read time while it is open
+        count = apply_discount(set(product_ids), data['discount_name'], discount_percentage, start_date, end_date)
 
         db.session.commit()
+        refresh_product_indexes(*product_ids)
 
         return jsonify({
             "message": f"Discount {'activated' if is_active else 'scheduled'} successfully",
-            "products_updated": len(products),
+            "products_updated": count,
             "status": "active" if is_active else "pending"
         }), 201
 
@@ -1968,8 +1918,57 @@ def manage_discount(seller_id, discount_name):
         if 'discount_name' in data and (not data['discount_name'] or len(data['discount_name']) > 50):
             return jsonify({"message": "Invalid discount name"}), 400
 
-        # ... rest of the function code ...
+        products = Product.query.filter(
+            Product.seller_id == seller_id,
+            Product.discount_name == discount_name
+        ).all()
+        if not products:
+            return jsonify({"message": "Discount not found"}), 404
+
+        try:
+            discount_percentage = float(data.get('discount_percentage', products[0].discount_percentage))
+            if not (0 < discount_percentage <= 100):
+                raise ValueError
+        except (ValueError, TypeError):
+            return jsonify({"message": "Invalid discount percentage"}), 400
+
+        # Validate dates
+        try:
+            start_date = datetime.fromisoformat(data['start_date'].replace('Z', '+00:00')) if data.get('start_date') else products[0].discount_start_date
+            end_date = datetime.fromisoformat(data['end_date'].replace('Z', '+00:00')) if data.get('end_date') else products[0].discount_end_date
+            if start_date.tzinfo is None:
+                start_date = start_date.replace(tzinfo=timezone.utc)
+            if end_date.tzinfo is None:
+                end_date = end_date.replace(tzinfo=timezone.utc)
+            if start_date >= end_date:
+                return jsonify({"message": "End date must be after start date"}), 400
+        except (ValueError, TypeError, AttributeError):
+            return jsonify({"message": "Invalid date format"}), 400
+
+        # Get current time in UTC
+        now = datetime.now(timezone.utc)
+        is_active = start_date <= now <= end_date
+
+        for product in products:
+            product.discount_name = data.get('discount_name', discount_name)
+            product.discount_percentage = discount_percentage
+            product.discount_start_date = start_date
+            product.discount_end_date = end_date
+
+        # Prices follow the new window at read time; tell the active discount set it changed
+        bump_catalog_versions('discounts')
+        db.session.commit()
+        refresh_product_indexes(*[p.product_uuid for p in products])
+
+        return jsonify({
+            "message": "Discount updated successfully",
+            "products_updated": len(products),
+            "status": "active" if is_active else "pending"
+        }), 200
+
     except Exception as e:
+        db.session.rollback()
+        print(f"Error updating discount: {str(e)}")
         return jsonify({'message': str(e)}), 500
 
 @products.route('/seller/<string:seller_id>/discounts/cleanup', methods=['POST'])
@@ -1985,46 +1984,14 @@ def cleanup_expired_discounts(seller_id):
         now = datetime.now(timezone.utc)
         print(f"Running manual cleanup at {now}")
 
-        # Find all products with expired discounts
-        expired_products = Product.query.filter(
-            Product.seller_id == seller_id,
-            Product.discount_name.isnot(None),
-            Product.discount_end_date < now
-        ).all()
-
-        cleaned_count = 0
-        for product in expired_products:
-            print(f"Cleaning up expired discount for product {product.name}")
-            
-            # Restore original prices
-            if product.compare_at_price:
-                product.price = product.compare_at_price
-                product.compare_at_price = None
-                
-                # Restore variation prices
-                for variation in product.variations:
-                    if variation.compare_at_price:
-                        variation.price = variation.compare_at_price
-                        variation.compare_at_price = None
-                        
-                        # Restore option prices
-                        for option in variation.options:
-                            if option.compare_at_price:
-                                option.price = option.compare_at_price
-                                option.compare_at_price = None
-            
-            # Clear discount info
-            product.discount_name = None
-            product.discount_percentage = None
-            product.discount_start_date = None
-            product.discount_end_date = None
-            cleaned_count += 1
-
+        # Clear every expired discount of the seller in one set-based UPDATE
+        expired, _ = expire_discounts(now, seller_id=seller_id)
         db.session.commit()
+        refresh_product_indexes(*expired)
 
         return jsonify({
             "message": "Expired discounts cleaned up successfully",
-            "products_cleaned": cleaned_count
+            "products_cleaned": len(expired)
         }), 200
 
     except Exception as e:
@@ -2033,6 +2000,7 @@ def cleanup_expired_discounts(seller_id):
         return jsonify({"message": f"Error cleaning up discounts: {str(e)}"}), 500
 
 @products.route('/products/search', methods=['GET'])
+@cached_response('products', 'shops', 'categories', 'reviews', ttl=30)
 def search_products():
     try:
         # Get query parameters
@@ -2047,9 +2015,13 @@ def search_products():
 
         print(f"Search request - Query: {query}, Page: {page}, Sort: {sort_by}, Price Range: {min_price}-{max_price}, Rating: {rating}")
 
-        # Find related shops
+        # Find related shops, by fuzzy name match when the trigram index is available
         related_shops = []
         if query:
+            shop_scores = dict(trigram_index.fuzzy_matches(query, 'shop', limit=20))
+            name_match = Shop.shop_uuid.in_(shop_scores) if trigram_index.is_available() else Shop.business_name.ilike(f'%{query}%')
+            # Best name matches first, then shops matching on business type only; ranked and limited in SQL
+            name_rank = db.case(shop_scores, value=Shop.shop_uuid, else_=0) if shop_scores else db.case((name_match, 1), else_=0)
             # Join Shop with SellerInfo to search across both tables
             shop_query = db.session.query(Shop, SellerInfo).join(
             SellerInfo, Shop.seller_id == SellerInfo.seller_id
@@ -2058,21 +2030,19 @@ def search_products():
                     SellerInfo.status == 'Approved',
                     Shop.is_archived == False,
                     or_(
-                        Shop.business_name.ilike(f'%{query}%'),
+                        name_match,
                         SellerInfo.business_type.ilike(f'%{query}%')
                     )
                 )
-            ).limit(5).all()
+            ).order_by(name_rank.desc(), Shop.shop_uuid).limit(5).all()
+
+            # Get shop statistics in one grouped query
+            product_counts = count_active_products(shop.shop_uuid for shop, _ in shop_query)
 
             for shop, seller_info in shop_query:
-                # Get shop statistics
-                product_count = Product.query.filter_by(
-                    shop_uuid=shop.shop_uuid,
-                    status='active',
-                    visibility=True
-                ).count()
-
-                rating_avg = 4.5  # TODO: Implement actual rating system
+                product_count = product_counts.get(shop.shop_uuid, 0)
+
+                rating_avg = round(shop.rating or 0, 1)
                 response_rate = 57  # TODO: Implement actual response rate
 
                 related_shops.append({
@@ -2095,8 +2065,20 @@ def search_products():
             Product.visibility == True
         )
 
-        # Search query with improved matching
-        if query:
+        # Ranked full-text matches over name, brand, tags, category and description
+        search_matches = search_index.search_subquery(query) if query else None
+        fuzzy = False
+        if query and (search_matches is None or db.session.query(search_matches.c.product_uuid).first() is None):
+            # Nothing matched as typed; retry with trigram similarity to forgive typos
+            fuzzy_matches = trigram_index.fuzzy_subquery(query)
+            if fuzzy_matches is not None:
+                search_matches, fuzzy = fuzzy_matches, True
+        if search_matches is not None:
+            base_query = base_query.join(
+                search_matches, search_matches.c.product_uuid == Product.product_uuid
+            )
+        elif query:
+            # Full-text index unavailable, fall back to LIKE matching
             # First, try to find matching categories
             matching_categories = Category.query.filter(
                 Category.name.ilike(f'%{query}%')
@@ -2107,7 +2089,7 @@ def search_products():
             search_conditions = [
                 Product.name.ilike(f'%{query}%'),
                 Product.description.ilike(f'%{query}%'),
-                Product.tags.contains([query])
+                Product.tags.ilike(f'%{query}%')
             ]
             
             # Add category-based search
@@ -2125,101 +2107,120 @@ def search_products():
             # Combine all search conditions with OR
             base_query = base_query.filter(or_(*search_conditions))
 
-        # Apply category filter if specifically requested
+        # Apply category filter if specifically requested, including its subcategories
         if category_uuid:
-            base_query = base_query.filter(Product.category_uuid == category_uuid)
+            category_ids = category_tree.get_tree().descendant_ids(category_uuid) or {category_uuid}
+            base_query = base_query.filter(Product.category_uuid.in_(category_ids))
 
         # Apply price filters
         if min_price is not None:
-            base_query = base_query.filter(Product.price >= min_price)
+            base_query = base_query.filter(effective_price_expression() >= min_price)
         if max_price is not None:
-            base_query = base_query.filter(Product.price <= max_price)
+            base_query = base_query.filter(effective_price_expression() <= max_price)
 
-        # Apply rating filter
+        # Apply rating filter on the maintained review average
         if rating is not None:
-            # For now, we'll use a fixed rating since we haven't implemented the rating system
-            # In a real implementation, you would filter based on average ratings from reviews
             base_query = base_query.filter(Product.rating >= rating)
 
-        # Apply sorting
+        # Apply brand and discount filters picked from the facets
+        base_query = apply_facet_filters(base_query, request.args)
+
+        # Facet counts come from one grouped query, whose row counts also give the total
+        facets = parse_facets(request.args.get('facets'))
+        if facets is not None:
+            total, facet_counts = compute_facets(base_query, facets, current_app.config['FACET_PRICE_BUCKETS'])
+
+        # Apply sorting; product_uuid breaks ties so pages never overlap
+        cursor = request.args.get('cursor')
         if sort_by == 'price_asc':
-            base_query = base_query.order_by(Product.price.asc())
+            sort_keys = [price_key()]
         elif sort_by == 'price_desc':
-            base_query = base_query.order_by(Product.price.desc())
+            sort_keys = [price_key(True)]
         elif sort_by == 'newest':
-            base_query = base_query.order_by(Product.created_at.desc())
+            sort_keys = [column_key(Product.created_at, True)]
         elif sort_by == 'bestselling':
-            base_query = base_query.order_by(Product.total_sales.desc())
-        else:  # relevance - sort by match relevance and then by popularity
-            base_query = base_query.order_by(
-                Product.total_sales.desc(),
-                Product.view_count.desc()
+            sort_keys = [column_key(Product.total_sales, True)]
+        elif sort_by == 'rating':
+            sort_keys = [column_key(Product.rating, True), column_key(Product.rating_count, True)]
+        elif search_matches is not None:  # relevance - sort by match rank and then by popularity
+            sort_by = 'relevance'
+            sort_keys = [expression_key(search_matches.c.rank, True), column_key(Product.total_sales, True)]
+            if cursor is not None:
+                # The cursor needs the rank of the last row on the page
+                base_query = base_query.add_columns(search_matches.c.rank)
+        else:  # relevance without an index - sort by popularity
+            sort_by = 'popular'
+            sort_keys = [column_key(Product.total_sales, True), column_key(Product.view_count, True)]
+        sort_keys.append(column_key(Product.product_uuid, sort_keys[-1][1]))
+
+        # Paginate results, by cursor when the client asks for it
+        if cursor is not None:
+            rows, next_cursor = keyset_paginate(base_query, sort_keys, sort_by, cursor, per_page)
+            items = [row[0] if sort_by == 'relevance' else row for row in rows]
+        else:
+            products = order_by_keys(base_query, sort_keys).paginate(
+                page=page, per_page=per_page, error_out=False, count=facets is None
             )
+            items = products.items
 
-        # Paginate results
-        products = base_query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        # Format response
-        response = []
-        for product in products.items:
-            shop = Shop.query.get(product.shop_uuid)
-            category = Category.query.get(product.category_uuid) if product.category_uuid else None
-            
-            # Calculate discount percentage
-            discount_percentage = None
-            if product.compare_at_price and float(product.compare_at_price) > float(product.price):
-                discount_percentage = round(
-                    ((float(product.compare_at_price) - float(product.price)) / float(product.compare_at_price)) * 100,
-                1)
-
-            product_dict = {
-                'product_uuid': product.product_uuid,
-                'name': product.name,
-                'price': float(product.price),
-                'compare_at_price': float(product.compare_at_price) if product.compare_at_price else None,
-                'discount_percentage': discount_percentage,
-                'main_image': product.main_image,
-                'rating': 4.5,  # TODO: Implement actual rating system
-                'total_sales': product.total_sales,
-                'quantity': product.quantity,
-                'shipping_fee': float(product.shipping_fee) if product.shipping_fee else 0,
-                'category': {
-                    'uuid': category.category_uuid,
-                    'name': category.name,
-                    'parent_name': Category.query.get(category.parent_id).name if category and category.parent_id else None
-                } if category else None,
-                'shop': {
-                    'shop_uuid': shop.shop_uuid,
-                    'business_name': shop.business_name,
-                    'business_city': shop.business_city,
-                    'business_province': shop.business_province
-                } if shop else None
-            }
-            response.append(product_dict)
+        # Format response, with shops and categories loaded in batched queries
+        response = serialize_product_cards(items, include_category=True)
 
         print(f"Found {len(response)} products")
         
-        # Get related categories for the search
+        # Get related categories for the search, by fuzzy name match when the trigram index is available
         related_categories = []
-        if query:
+        if query and trigram_index.is_available():
+            category_scores = dict(trigram_index.fuzzy_matches(query, 'category', limit=20))
+            related_categories = sorted(
+                Category.query.filter(
+                    Category.category_uuid.in_(category_scores),
+                    Category.is_active == True
+                ).all(),
+                key=lambda category: -category_scores[category.category_uuid]
+            )[:5]
+        elif query:
             related_categories = Category.query.filter(
                 Category.name.ilike(f'%{query}%')
             ).limit(5).all()
 
-        return jsonify({
+        if cursor is not None:
+            pagination = {
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+                'total': None
+            }
+            if facets is not None:
+                pagination['total'] = total
+            elif request.args.get('include_total') == 'true':
+                pagination['total'] = count_total(base_query)
+        elif facets is not None:
+            pagination = {
+                'total': total,
+                'pages': (total + per_page - 1) // per_page if per_page > 0 else 0,
+                'current_page': products.page
+            }
+        else:
+            pagination = {
+                'total': products.total,
+                'pages': products.pages,
+                'current_page': products.page
+            }
+
+        result = {
             'products': response,
-            'total': products.total,
-            'pages': products.pages,
-            'current_page': products.page,
+            **pagination,
             'query': query,
-            'related_categories': [{
-                'uuid': cat.category_uuid,
-                'name': cat.name,
-                'parent_name': Category.query.get(cat.parent_id).name if cat.parent_id else None
-            } for cat in related_categories],
+            'fuzzy': fuzzy,
+            'related_categories': serialize_category_refs(related_categories),
             'related_shops': related_shops
-        })
+        }
+        if facets is not None:
+            result['facets'] = facet_counts
+        return jsonify(result)
 
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         print(f"Error searching products: {str(e)}")
         return jsonify({'message': str(e)}), 500
@@ -2228,32 +2229,9 @@ def search_products():
 def get_product_suggestions():
     try:
         query = request.args.get('q', '').strip()
-        print(f"Received suggestion request for query: {query}")
-        
-        # Get product name suggestions
-        suggestions = Product.query.filter(
-            and_(
-                Product.status == 'active',
-                Product.visibility == True,
-                or_(
-                    Product.name.ilike(f'%{query}%'),
-                    Product.tags.contains([query])
-                )
-            )
-        ).with_entities(
-            Product.name,
-            Product.product_uuid,
-            Product.main_image,
-            Product.price
-        ).limit(10).all()
-
-        # Format suggestions
-        formatted_suggestions = [{
-            'name': s.name,
-            'product_uuid': s.product_uuid,
-            'main_image': s.main_image,
-            'price': float(s.price)
-        } for s in suggestions]
+
+        # Served from the in-process prefix index, ranked by total sales
+        formatted_suggestions = prefix_index.suggest(query, limit=10)
 
         return jsonify({
             'suggestions': formatted_suggestions
@@ -2287,159 +2265,227 @@ def bulk_upload_products(seller_id, shop_uuid):
         if not file.filename.endswith('.csv'):
             return jsonify({"message": "Invalid file format. Please upload a CSV file"}), 400
 
-        # Read CSV file
-        df = pd.read_csv(file)
-        errors = []
-        products_created = 0
+        # The import runs in an import worker; the client polls the job for progress
+        try:
+            job = enqueue_import(file, seller_id, shop_uuid)
+        except InvalidImportFile as e:
+            return jsonify({"message": f"Invalid CSV file: {str(e)}"}), 400
+        db.session.commit()
 
-        for index, row in df.iterrows():
-            try:
-                # Create product using the new method
-                product = Product.create_from_bulk_data(row.to_dict(), shop_uuid, seller_id)
-                
-                # Handle variations if present
-                if row.get('variation_name') and row.get('variation_values'):
-                    variation_name = row['variation_name']
-                    variation_values = row['variation_values'].split('|')
-                    
-                    for value_str in variation_values:
-                        value_parts = value_str.split(':')
-                        if len(value_parts) >= 3:
-                            value, price, stock = value_parts[:3]
-                            variation = ProductVariation(
-                                variation_uuid=str(uuid.uuid4()),
-                                product_uuid=product.product_uuid,
-                                price=float(price),
-                                quantity=int(stock)
-                            )
-                            db.session.add(variation)
-                            
-                            option = ProductVariationOption(
-                                option_uuid=str(uuid.uuid4()),
-                                variation_uuid=variation.variation_uuid,
-                                name=variation_name,
-                                value=value,
-                                stock=int(stock)
-                            )
-                            db.session.add(option)
+        return jsonify({
+            "message": "Upload queued for import",
+            "job": job.to_dict(),
+            "status_url": url_for('products.bulk_upload_status', seller_id=seller_id, shop_uuid=shop_uuid, job_uuid=job.job_uuid)
+        }), 202
 
-                db.session.add(product)
-                products_created += 1
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in bulk upload: {str(e)}")
+        return jsonify({"message": f"Error processing upload: {str(e)}"}), 500
 
-            except Exception as e:
-                error_msg = f"Error in row {index + 2}: {str(e)}"
-                errors.append(error_msg)
-                print(error_msg)
-                continue
+@products.route('/seller/<string:seller_id>/shops/<string:shop_uuid>/products/bulk-upload/<string:job_uuid>', methods=['GET'])
+@login_required
+def bulk_upload_status(seller_id, shop_uuid, job_uuid):
+    try:
+        seller = SellerInfo.query.get(seller_id)
+        if not seller or (seller.user_id != current_user.user_uuid and not current_user.has_role(Role.ADMIN)):
+            return jsonify({"message": "Seller not found or access denied"}), 404
 
-        if products_created > 0:
-            db.session.commit()
+        job = ImportJob.query.filter_by(job_uuid=job_uuid, seller_id=seller_id, shop_uuid=shop_uuid).first()
+        if not job:
+            return jsonify({"message": "Import job not found"}), 404
 
-        response = {
-            "message": f"Successfully processed {products_created} products",
-            "products_created": products_created
-        }
-        if errors:
-            response["errors"] = errors
+        return jsonify(job.to_dict()), 200
+
+    except Exception as e:
+        print(f"Error getting bulk upload status: {str(e)}")
+        return jsonify({"message": f"Error getting import status: {str(e)}"}), 500
+
+def product_export_response(filters, filename):
+    """Stream the matching products as CSV (the bulk upload format) or NDJSON, gzipped when the client accepts it"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"message": f"Unsupported format, use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    status = request.args.get('status')
+    if status:
+        filters = [*filters, Product.status == status]
+
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    chunks = export_chunks(filters, export_format)
+    headers = {
+        'Content-Disposition': f'attachment; filename={filename}.{extension}',
+        'Vary': 'Accept-Encoding'
+    }
+    if request.accept_encodings['gzip'] > 0:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+@products.route('/seller/<string:seller_id>/shops/<string:shop_uuid>/products/export', methods=['GET'])
+@login_required
+def export_shop_products(seller_id, shop_uuid):
+    try:
+        seller = SellerInfo.query.get(seller_id)
+        if not seller or (seller.user_id != current_user.user_uuid and not current_user.has_role(Role.ADMIN)):
+            return jsonify({"message": "Seller not found or access denied"}), 404
+
+        shop = Shop.query.filter_by(shop_uuid=shop_uuid, seller_id=seller_id).first()
+        if not shop:
+            return jsonify({"message": "Shop not found"}), 404
 
-        return jsonify(response), 200 if products_created > 0 else 400
+        return product_export_response([Product.shop_uuid == shop_uuid], f"products-{shop_uuid}")
 
     except Exception as e:
-        db.session.rollback()
-        print(f"Error in bulk upload: {str(e)}")
-        return jsonify({"message": f"Error processing upload: {str(e)}"}), 500
+        print(f"Error exporting products: {str(e)}")
+        return jsonify({"message": f"Error exporting products: {str(e)}"}), 500
+
+@products.route('/admin/products/export', methods=['GET'])
+@role_required(Role.ADMIN)
+def export_all_products():
+    try:
+        filters = []
+        if request.args.get('seller_id'):
+            filters.append(Product.seller_id == request.args['seller_id'])
+        if request.args.get('shop_uuid'):
+            filters.append(Product.shop_uuid == request.args['shop_uuid'])
+
+        return product_export_response(filters, "products")
+
+    except Exception as e:
+        print(f"Error exporting products: {str(e)}")
+        return jsonify({"message": f"Error exporting products: {str(e)}"}), 500
 
 @products.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "ok"}), 200
+    return jsonify({"status": "ok", "view_counter": view_counter.stats()}), 200
+
+REVIEWS_PER_PAGE = 10
+
+# Seconds the other products' cards on a product page may lag behind writes to those products
+RELATED_CARDS_MAX_AGE = 300
+
+
+def product_validator(product_uuid):
+    """
+    ETag and cache key part of a product page, or None when there is no such product.
+
+    The page changes with the product's own version and the active discounts; the
+    cards of other products on it are refreshed every RELATED_CARDS_MAX_AGE seconds
+    rather than with every write anywhere in the catalog.
+    """
+    versions = g.setdefault('product_versions', {})
+    if product_uuid not in versions:
+        versions[product_uuid] = db.session.execute(
+            db.select(Product.version).where(Product.product_uuid == product_uuid)
+        ).scalar()
+    version = versions[product_uuid]
+    if version is None:
+        return None
+    return f"{version}:{pricing_epoch()}:{int(time.time() // RELATED_CARDS_MAX_AGE)}"
+
+
+def product_reviews_page(product_uuid, cursor=None, per_page=REVIEWS_PER_PAGE):
+    """One page of a product's reviews, newest first, with their authors; returns (reviews, next_cursor)"""
+    query = Review.query.options(db.joinedload(Review.user)).filter(Review.product_uuid == product_uuid)
+    keys = [column_key(Review.created_at, True), column_key(Review.review_uuid, True)]
+    return keyset_paginate(query, keys, 'created_at:desc', cursor=cursor, per_page=per_page)
+
+
+def serialize_review(review):
+    return {
+        'review_uuid': review.review_uuid,
+        'user_uuid': review.user_uuid,
+        'rating': review.rating,
+        'comment': review.comment,
+        'created_at': review.created_at.isoformat() if review.created_at else None,
+        'seller_reply': review.seller_reply,
+        'seller_reply_at': review.seller_reply_at.isoformat() if review.seller_reply_at else None,
+        'user': {
+            'user_uuid': review.user_uuid,
+            'first_name': review.user.first_name,
+            'last_name': review.user.last_name,
+            'profile_image_url': review.user.profile_image_url
+        },
+        'images': review.images or []
+    }
+
 
 @products.route('/products/<string:product_uuid>', methods=['GET'])
+@track_view
+@conditional_get('shops', 'categories', 'reviews', 'shipping', 'recommendations', max_age=30, validator=product_validator)
+@cached_response('shops', 'categories', 'reviews', 'shipping', 'recommendations', validator=product_validator)
+@query_budget(9)
 def get_product_details(product_uuid):
     try:
-        # Get the product with all its relationships
+        # Product, category, shop, seller and shipping in one query; variations and their options in two more
         product = Product.query.options(
             db.joinedload(Product.category),
-            db.joinedload(Product.variations).joinedload(ProductVariation.options)
-        ).get_or_404(product_uuid)
-        
-        # Get the shop details
-        shop = Shop.query.get_or_404(product.shop_uuid)
-        seller = SellerInfo.query.get_or_404(product.seller_id)
-        
-        # Get category path if category exists
+            db.joinedload(Product.shop),
+            db.joinedload(Product.seller),
+            db.selectinload(Product.variations).selectinload(ProductVariation.options)
+        ).filter(Product.product_uuid == product_uuid).first()
+        if not product or not product.shop or not product.seller:
+            return jsonify({'message': 'Product not found'}), 404
+        shop = product.shop
+
+        # Category path comes from the category snapshot
         category_name = None
         category_path = None
         if product.category:
             category_name = product.category.name
             category_path = product.category.get_path()
-        
+
         # Get shop's other products (limit to 12)
-        other_products = Product.query.filter(
+        other_products = Product.query.options(
+            db.lazyload(Product.shipping_provider),
+            db.lazyload(Product.shipping_rate)
+        ).filter(
             Product.shop_uuid == shop.shop_uuid,
             Product.product_uuid != product_uuid,
             Product.status == 'active',
             Product.visibility == True
         ).limit(12).all()
-        
-        # Get variations with their options
-        variations = ProductVariation.query.filter_by(product_uuid=product_uuid).all()
-        
+
+        # Frequently bought together, precomputed by utils.recommendations
+        recommended = get_recommendations(product_uuid, limit=12)
+        cards = serialize_product_cards(other_products + recommended)
+
         # Format variations with their options
         formatted_variations = []
-        for variation in variations:
-            # Get options for this variation
-            options = ProductVariationOption.query.filter_by(variation_uuid=variation.variation_uuid).all()
-            
-            formatted_options = [{
-                'option_uuid': opt.option_uuid,
-                'name': opt.name,
-                'value': opt.value,
-                'price': float(opt.price) if opt.price is not None else float(variation.price),
-                'compare_at_price': float(opt.compare_at_price) if opt.compare_at_price else None,
-                'stock': opt.stock,
-                'sku': opt.sku
-            } for opt in options]
-            
+        # Prices are shown at the discount active now
+        for variation in product.variations:
+            formatted_options = []
+            for opt in variation.options:
+                # Options without a price of their own sell at the variation's
+                stored = (opt.price, opt.compare_at_price) if opt.price is not None else (variation.price, variation.compare_at_price)
+                price, compare_at_price = product.prices_for(*stored)
+                formatted_options.append({
+                    'option_uuid': opt.option_uuid,
+                    'name': opt.name,
+                    'value': opt.value,
+                    'price': float(price),
+                    'compare_at_price': float(compare_at_price) if compare_at_price else None,
+                    'stock': opt.stock,
+                    'sku': opt.sku
+                })
+
+            price, compare_at_price = product.prices_for(variation.price, variation.compare_at_price)
             formatted_variations.append({
                 'variation_uuid': variation.variation_uuid,
-                'price': float(variation.price) if variation.price is not None else None,
-                'compare_at_price': float(variation.compare_at_price) if variation.compare_at_price else None,
+                'price': float(price) if price is not None else None,
+                'compare_at_price': float(compare_at_price) if compare_at_price else None,
                 'quantity': variation.quantity,
                 'has_individual_stock': variation.has_individual_stock,
                 'options': formatted_options
             })
-        
-        # Calculate average rating and get reviews
-        reviews = db.session.query(
-            Review.review_uuid,
-            Review.rating,
-            Review.comment,
-            Review.created_at,
-            Review.images,
-            Review.user_uuid,  # Add user_uuid to query
-            Review.seller_reply,  # Add seller_reply
-            Review.seller_reply_at,  # Add seller_reply_at
-            Users.first_name,
-            Users.last_name,
-            Users.profile_image_url
-        ).join(Users).filter(
-            Review.product_uuid == product_uuid
-        ).order_by(Review.created_at.desc()).all()
-        
-        # Calculate rating breakdown
-        rating_breakdown = {
-            5: 0, 4: 0, 3: 0, 2: 0, 1: 0
-        }
-        total_rating = 0
-        for review in reviews:
-            rating_breakdown[review.rating] += 1
-            total_rating += review.rating
-        
-        avg_rating = total_rating / len(reviews) if reviews else 0
-        
+
+        # First page of reviews; the rest is fetched from the reviews endpoint with the cursor
+        reviews_per_page = min(request.args.get('reviews_per_page', REVIEWS_PER_PAGE, type=int), 50)
+        reviews, reviews_next_cursor = product_reviews_page(product_uuid, per_page=reviews_per_page)
+
         # Format the response
         response = {
-            **product.to_dict(),
+            **product.to_dict(include=('shipping_provider', 'shipping_rate')),
             'category_name': category_name,
             'category_path': category_path,
             'shop': {
@@ -2447,7 +2493,7 @@ def get_product_details(product_uuid):
                 'id': shop.shop_uuid,
                 'name': shop.business_name,
                 'logo': shop.shop_logo,
-                'rating': avg_rating,
+                'rating': round(shop.rating or 0, 1),
                 'products': shop.total_products,
                 'followers': 0,
                 'responseTime': '< 24h',
@@ -2455,35 +2501,36 @@ def get_product_details(product_uuid):
                 'joinDate': shop.date_created.strftime('%B %Y'),
                 'business_city': shop.business_city,
                 'business_province': shop.business_province,
-                'otherProducts': [p.to_dict() for p in other_products]
+                'otherProducts': cards[:len(other_products)]
             },
+            'frequentlyBoughtTogether': cards[len(other_products):],
             'variations': formatted_variations,
-            'rating': round(avg_rating, 1),
-            'totalReviews': len(reviews),
-            'ratingBreakdown': rating_breakdown,
-            'reviews': [{
-                'review_uuid': r.review_uuid,
-                'user_uuid': r.user_uuid,
-                'rating': r.rating,
-                'comment': r.comment,
-                'created_at': r.created_at.isoformat(),
-                'seller_reply': r.seller_reply,  # Add seller_reply
-                'seller_reply_at': r.seller_reply_at.isoformat() if r.seller_reply_at else None,  # Add seller_reply_at
-                'user': {
-                    'user_uuid': r.user_uuid,
-                    'first_name': r.first_name,
-                    'last_name': r.last_name,
-                    'profile_image_url': r.profile_image_url
-                },
-                'images': r.images or []
-            } for r in reviews]
+            # Rating summary comes from the maintained aggregates
+            'rating': round(product.rating or 0, 1),
+            'totalReviews': product.rating_count or 0,
+            'ratingBreakdown': product.rating_breakdown,
+            'reviews': [serialize_review(review) for review in reviews],
+            'reviewsNextCursor': reviews_next_cursor
         }
-        
+
         return jsonify(response), 200
 
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
+@products.route('/products/<string:product_uuid>/similar', methods=['GET'])
+@conditional_get('products', 'shops', 'recommendations', max_age=300)
+@cached_response('products', 'shops', 'recommendations')
+def get_similar_items(product_uuid):
+    """Products with similar names, descriptions, brand, tags and category"""
+    try:
+        limit = min(request.args.get('limit', 12, type=int), 50)
+        similar = get_similar_products(product_uuid, limit=limit)
+        return jsonify({'products': serialize_product_cards(similar)}), 200
+    except Exception as e:
+        print(f"Error fetching similar products: {str(e)}")
+        return jsonify({'message': 'Error fetching similar products', 'error': str(e)}), 500
+
 @products.route('/seller/<string:seller_id>/shops/<string:shop_uuid>/products/<string:product_uuid>/verification-code', methods=['GET'])
 @login_required
 def get_verification_code(seller_id, shop_uuid, product_uuid):
@@ -2512,11 +2559,22 @@ def get_verification_code(seller_id, shop_uuid, product_uuid):
 
 @products.route('/api/products/<product_uuid>/reviews', methods=['GET'])
 def get_product_reviews(product_uuid):
-    """Get all reviews for a product"""
+    """Get all reviews for a product, or one page of them when a cursor is passed"""
     try:
-        reviews = Review.query.filter_by(product_uuid=product_uuid)\
-            .order_by(Review.created_at.desc())\
-            .all()
+        # Cursor mode: ?cursor= (empty for the first page) returns one page and next_cursor
+        cursor_mode = 'cursor' in request.args
+        next_cursor = None
+        if cursor_mode:
+            per_page = min(request.args.get('per_page', REVIEWS_PER_PAGE, type=int), 50)
+            try:
+                reviews, next_cursor = product_reviews_page(product_uuid, request.args.get('cursor'), per_page)
+            except InvalidCursor as e:
+                return jsonify({'status': 'error', 'message': str(e)}), 400
+        else:
+            reviews = Review.query.options(db.joinedload(Review.user))\
+                .filter_by(product_uuid=product_uuid)\
+                .order_by(Review.created_at.desc())\
+                .all()
 
         review_list = []
         for review in reviews:
@@ -2540,10 +2598,14 @@ def get_product_reviews(product_uuid):
 
             review_list.append(review_data)
 
-        return jsonify({
+        response = {
             'status': 'success',
             'reviews': review_list
-        })
+        }
+        if cursor_mode:
+            response['next_cursor'] = next_cursor
+            response['has_more'] = next_cursor is not None
+        return jsonify(response)
 
     except Exception as e:
         print(f"Error fetching reviews: {str(e)}")
@@ -2651,11 +2713,8 @@ def add_review(product_uuid):
 
         db.session.add(new_review)
 
-        # Update product rating
-        all_reviews = Review.query.filter_by(product_uuid=product_uuid).all()
-        total_ratings = sum(review.rating for review in all_reviews) + rating
-        new_rating = total_ratings / (len(all_reviews) + 1)
-        product.rating = round(new_rating, 1)
+        # Update product and shop rating aggregates
+        Product.record_rating(product_uuid, rating)
 
         db.session.commit()
 
@@ -2831,20 +2890,11 @@ def delete_review(review_uuid):
                 except Exception as e:
                     print(f"Error deleting image from Cloudinary: {str(e)}")
 
-        # Get the product to update its rating
-        product = Product.query.get(review.product_uuid)
-        
         # Delete the review
         db.session.delete(review)
         
-        # Update product rating
-        remaining_reviews = Review.query.filter_by(product_uuid=review.product_uuid).all()
-        if remaining_reviews:
-            total_ratings = sum(r.rating for r in remaining_reviews)
-            new_rating = total_ratings / len(remaining_reviews)
-            product.rating = round(new_rating, 1)
-        else:
-            product.rating = 0
+        # Update product and shop rating aggregates
+        Product.record_rating(review.product_uuid, review.rating, delta=-1)
 
         db.session.commit()
 
@@ -5,6 +5,9 @@ import random
 import string
 from flask_login import login_required, current_user
 from utils.auth_utils import role_required
+from utils.pagination import InvalidCursor, column_key, keyset_paginate, order_by_keys, count_total
+from utils.pricing import price_key
+from utils.catalog_snapshot import get_snapshot, load_products
 from werkzeug.security import generate_password_hash
 from datetime import datetime
 
@@ -255,6 +258,14 @@ def get_shop_details(shop_uuid):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Catalog snapshot order for each shop page sort
+SHOP_SNAPSHOT_SORTS = {
+    'popular': 'sales',
+    'price-low': 'price_asc',
+    'price-high': 'price_desc',
+    'newest': 'latest',
+}
+
 @main.route('/api/shops/<shop_uuid>/products', methods=['GET'])
 def get_shop_products(shop_uuid):
     try:
@@ -270,33 +281,57 @@ def get_shop_products(shop_uuid):
             visibility=True
         )
         
-        # Apply sorting
+        # Apply sorting; product_uuid breaks ties so pages never overlap
         if sort_by == 'popular':
-            query = query.order_by(Product.total_sales.desc())
+            sort_keys = [column_key(Product.total_sales, True)]
         elif sort_by == 'price-low':
-            query = query.order_by(Product.price.asc())
+            sort_keys = [price_key()]
         elif sort_by == 'price-high':
-            query = query.order_by(Product.price.desc())
+            sort_keys = [price_key(True)]
         else:  # newest
-            query = query.order_by(Product.created_at.desc())
-            
-        # Paginate results
-        products = query.paginate(page=page, per_page=per_page, error_out=False)
+            sort_by = 'newest'
+            sort_keys = [column_key(Product.created_at, True)]
+        sort_keys.append(column_key(Product.product_uuid, sort_keys[-1][1]))
+
+        # Cursor pagination skips the OFFSET scan and the COUNT(*) on every page
+        cursor = request.args.get('cursor')
+        if cursor is not None:
+            items, next_cursor = keyset_paginate(query, sort_keys, sort_by, cursor, per_page)
+            return jsonify({
+                'products': [product.to_dict() for product in items],
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+                'total': count_total(query) if request.args.get('include_total') == 'true' else None,
+                'per_page': per_page
+            })
+
+        # Paginate results, from this worker's catalog snapshot when it's on
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            product_uuids, total, _, pages = snapshot.paginate(
+                SHOP_SNAPSHOT_SORTS[sort_by], page, per_page, shop_uuid=shop_uuid
+            )
+            items = load_products(product_uuids)
+        else:
+            products = order_by_keys(query, sort_keys).paginate(page=page, per_page=per_page, error_out=False)
+            items, total, pages = products.items, products.total, products.pages
         
         # Convert products to dictionary format
         products_data = []
-        for product in products.items:
+        for product in items:
             product_dict = product.to_dict()
             # Add any additional shop-specific data if needed
             products_data.append(product_dict)
         
         return jsonify({
             'products': products_data,
-            'total': products.total,
-            'pages': products.pages,
+            'total': total,
+            'pages': pages,
             'current_page': page,
             'per_page': per_page
         })
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error in get_shop_products: {str(e)}")  # Add debug logging
         return jsonify({'error': str(e)}), 500
@@ -1,60 +1,188 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-import requests
 from datetime import datetime
 import logging
+import time
+from functools import wraps
 from datetime import timezone
-from sqlalchemy import or_
-from models import Product, db
+from models import db
+from featured_products import refresh_featured_scores
+from products import clear_expired_discounts
+from utils.recommendations import update_recommendations
+from utils.similar_products import update_similar_products, rebuild_similar_products
+from utils.catalog_snapshot import prune_product_changes
+from utils.otp_cleanup import cleanup_expired_otps
+from utils.job_lease import Lease
 from flask import current_app
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def init_scheduler(app):
+def create_scheduler(app, lease):
+    """A paused scheduler with every periodic job; each run is skipped unless this process holds the lease"""
     scheduler = BackgroundScheduler()
-    
-    def update_discounts():
+
+    def leader_only(job):
+        @wraps(job)
+        def wrapper(*args, **kwargs):
+            if lease.held():
+                return job(*args, **kwargs)
+        return wrapper
+
+    def clear_discounts():
+        try:
+            with app.app_context():
+                count = clear_expired_discounts()
+                logger.info(f"Cleared expired discounts from {count} products")
+        except Exception as e:
+            logger.error(f"Error clearing expired discounts: {str(e)}")
+
+    # Prices follow discount windows at read time; expired windows are only cleared from the discount lists
+    scheduler.add_job(
+        leader_only(clear_discounts),
+        trigger=IntervalTrigger(seconds=app.config.get('DISCOUNT_CLEANUP_SECONDS', 3600)),
+        id='clear_expired_discounts',
+        name='Clear expired discounts',
+        replace_existing=True
+    )
+
+    def refresh_featured():
+        try:
+            with app.app_context():
+                count = refresh_featured_scores()
+                logger.info(f"Refreshed featured scores for {count} products")
+        except Exception as e:
+            logger.error(f"Error refreshing featured scores: {str(e)}")
+
+    # Keep the stored featured ranking in step with view counts and other drift
+    scheduler.add_job(
+        leader_only(refresh_featured),
+        trigger=IntervalTrigger(seconds=app.config.get('FEATURED_REFRESH_SECONDS', 300)),
+        id='refresh_featured_scores',
+        name='Refresh featured product scores',
+        next_run_time=datetime.now(timezone.utc),
+        # The first run is due at once; run it when this runner starts leading, however late
+        misfire_grace_time=None,
+        replace_existing=True
+    )
+
+    def refresh_recommendations():
+        try:
+            with app.app_context():
+                count = update_recommendations()
+                logger.info(f"Updated recommendations for {count} products")
+        except Exception as e:
+            logger.error(f"Error updating recommendations: {str(e)}")
+
+    # Fold new orders into the co-purchase recommendations
+    scheduler.add_job(
+        leader_only(refresh_recommendations),
+        trigger=IntervalTrigger(seconds=app.config.get('RECOMMENDATION_REFRESH_SECONDS', 3600)),
+        id='update_recommendations',
+        name='Update co-purchase recommendations',
+        replace_existing=True
+    )
+
+    def refresh_similar_products(full=False):
         try:
             with app.app_context():
-                now = datetime.now(timezone.utc)
-                logger.info(f"Running scheduled discount update at {now} (UTC)")
-                
-                # Check if there are any active or pending discounts
-                has_discounts = Product.query.filter(
-                    Product.discount_name.isnot(None),
-                    or_(
-                        Product.discount_end_date >= now,  # Active or future discounts
-                        Product.discount_start_date >= now  # Pending discounts
-                    )
-                ).first() is not None
-                
-                if not has_discounts:
-                    logger.info("No active or pending discounts found. Stopping scheduler.")
-                    scheduler.shutdown()
-                    return
-                
-                response = requests.post('http://localhost:5555/cron/update-discounts')
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    logger.info(f"Discount update completed: {result}")
-                    if result.get('discounts_expired', 0) > 0:
-                        logger.info(f"Removed {result['discounts_expired']} expired discounts")
-                else:
-                    logger.error(f"Failed to update discounts: {response.text}")
-                    
+                count = rebuild_similar_products() if full else update_similar_products()
+                logger.info(f"Updated similar items for {count} products")
         except Exception as e:
-            logger.error(f"Error in scheduled discount update: {str(e)}")
+            logger.error(f"Error updating similar items: {str(e)}")
+
+    # Pick up created and edited products in the similar items index
+    scheduler.add_job(
+        leader_only(refresh_similar_products),
+        trigger=IntervalTrigger(seconds=app.config.get('SIMILAR_PRODUCTS_REFRESH_SECONDS', 300)),
+        id='update_similar_products',
+        name='Update similar items',
+        replace_existing=True
+    )
 
-    # Run every 30 seconds
+    # Rescore everything once a day so all lists share the current IDF weights
     scheduler.add_job(
-        update_discounts,
-        trigger=IntervalTrigger(seconds=30),
-        id='update_discounts',
-        name='Update product discounts',
+        leader_only(refresh_similar_products),
+        kwargs={'full': True},
+        trigger=IntervalTrigger(hours=24),
+        id='rebuild_similar_products',
+        name='Rebuild similar items',
         replace_existing=True
     )
 
-    scheduler.start()
-    logger.info("Discount scheduler started with 30-second interval") 
\ No newline at end of file
+    def prune_changes():
+        try:
+            with app.app_context():
+                count = prune_product_changes()
+                logger.info(f"Pruned {count} product change log entries")
+        except Exception as e:
+            logger.error(f"Error pruning product change log: {str(e)}")
+
+    # Catalog snapshots only read recent change log entries
+    if app.config.get('CATALOG_SNAPSHOT_ENABLED'):
+        scheduler.add_job(
+            leader_only(prune_changes),
+            trigger=IntervalTrigger(hours=1),
+            id='prune_product_changes',
+            name='Prune product change log',
+            replace_existing=True
+        )
+
+    def cleanup_otps():
+        with app.app_context():
+            cleanup_expired_otps()
+
+    # Expired one-time passwords are never read again
+    scheduler.add_job(
+        leader_only(cleanup_otps),
+        trigger=IntervalTrigger(hours=1),
+        id='cleanup_expired_otps',
+        name='Clean up expired OTPs',
+        replace_existing=True
+    )
+
+    scheduler.start(paused=True)
+    return scheduler
+
+
+def run_scheduler(app):
+    """
+    Run the periodic jobs; blocks until interrupted.
+
+    Start as many runners as wanted: they contend for the 'scheduler' lease and only
+    the holder runs jobs, the others stand by to take over once it expires. Web
+    workers don't start a scheduler at all.
+    """
+    lease = Lease('scheduler', ttl=app.config.get('SCHEDULER_LEASE_SECONDS', 60))
+    scheduler = create_scheduler(app, lease)
+    logger.info(f"Job runner {lease.holder} started: expired discounts every "
+                f"{app.config.get('DISCOUNT_CLEANUP_SECONDS', 3600)} seconds, featured scores every "
+                f"{app.config.get('FEATURED_REFRESH_SECONDS', 300)} seconds, recommendations every "
+                f"{app.config.get('RECOMMENDATION_REFRESH_SECONDS', 3600)} seconds, similar items every "
+                f"{app.config.get('SIMILAR_PRODUCTS_REFRESH_SECONDS', 300)} seconds, expired OTPs hourly")
+
+    leading = False
+    try:
+        while True:
+            with app.app_context():
+                try:
+                    held = lease.acquire()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Error renewing the scheduler lease: {str(e)}")
+                    held = lease.held()
+            if held and not leading:
+                logger.info("Holding the scheduler lease, running jobs")
+                scheduler.resume()
+            elif leading and not held:
+                logger.info("Lost the scheduler lease, standing by")
+                scheduler.pause()
+            leading = held
+            time.sleep(lease.ttl / 3)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        scheduler.shutdown(wait=False)
+        if leading:
+            with app.app_context():
+                lease.release()
@@ -6,6 +6,7 @@ from models import SellerInfo, Shop, db, Users, Role, Order, Product, OrderItem,
 from utils.emails import send_seller_approval_email, send_seller_rejection_email, send_seller_suspension_email, send_order_cancellation_email
 from utils.auth_utils import role_required
 from utils.file_utils import verify_image_file
+from utils import trigram_index
 import cloudinary.uploader
 import os
 
@@ -432,6 +433,7 @@ def create_shop(seller_id):
 
         db.session.add(new_shop)
         db.session.commit()
+        trigram_index.refresh('shop', [new_shop.shop_uuid])
 
         return jsonify({
             "message": "Shop created successfully",
@@ -535,6 +537,7 @@ def update_shop(seller_id, shop_uuid):
         shop.last_updated = datetime.now()
 
         db.session.commit()
+        trigram_index.refresh('shop', [shop.shop_uuid])
 
         return jsonify({
             "message": "Shop updated successfully",
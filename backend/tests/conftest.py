@@ -0,0 +1,31 @@
+import os
+import tempfile
+import pytest
+
+# The app reads its database from the environment when wsgi is imported
+_db_fd, _db_path = tempfile.mkstemp(suffix='.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{_db_path}'
+
+from wsgi import app as flask_app
+from models import db
+
+
+@pytest.fixture(scope='session')
+def app():
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        db.create_all()
+    yield flask_app
+    os.close(_db_fd)
+    os.unlink(_db_path)
+
+
+@pytest.fixture
+def session(app):
+    """The db session inside an app context, with every table emptied afterwards"""
+    with app.app_context():
+        yield db.session
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
@@ -0,0 +1,113 @@
+import inspect
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import event
+from models import (
+    db, Users, Role, SellerInfo, Shop, Category, Product, ProductVariation, ProductVariationOption,
+    Review, ShippingProvider, ShippingRate, ProductRecommendation
+)
+from products import get_product_details
+
+PRODUCT_DETAILS_BUDGET = get_product_details.query_budget
+
+
+def seed_product(session, variations=2, options=3, reviews=3, other_products=4, recommended=3):
+    """A product with variations, reviews, shipping, shop products and recommendations; returns its uuid"""
+    user = Users(first_name='Sam', last_name='Seller', username='seller', email='seller@example.com',
+                 password_hash='x', role=Role.SELLER)
+    buyer = Users(first_name='Bea', last_name='Buyer', username='buyer', email='buyer@example.com',
+                  password_hash='x', role=Role.BUYER)
+    session.add_all([user, buyer])
+    session.flush()
+    seller = SellerInfo(seller_id='seller-1', user_id=user.user_uuid, business_name='Acme', business_owner='Sam',
+                        business_type='Retail', business_email='seller@example.com', business_phone='1',
+                        tax_id='1', status='Approved')
+    shop = Shop(shop_uuid='shop-1', seller_id='seller-1', business_name='Acme Gadgets', business_country='PH',
+                business_province='Laguna', business_city='Calamba', business_address='1 Main St')
+    provider = ShippingProvider(provider_uuid='provider-1', name='J&T Express')
+    rate = ShippingRate(rate_uuid='rate-1', provider_uuid='provider-1', name='Standard', base_rate=50, weight_rate=10)
+    session.add_all([seller, shop, provider, rate,
+                     Category(category_uuid='cat-1', name='Electronics'),
+                     Category(category_uuid='cat-2', name='Phones', parent_id='cat-1')])
+    session.flush()
+
+    created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    products = [
+        Product(product_uuid=f'product-{i}', shop_uuid='shop-1', seller_id='seller-1', category_uuid='cat-2',
+                name=f'Phone {i}', description='A phone', price=100 + i, quantity=10, status='active',
+                visibility=True, shipping_provider_uuid='provider-1', shipping_rate_uuid='rate-1',
+                created_at=created_at + timedelta(days=i))
+        for i in range(1 + other_products + recommended)
+    ]
+    session.add_all(products)
+    session.flush()
+
+    for v in range(variations):
+        variation = ProductVariation(variation_uuid=f'variation-{v}', product_uuid='product-0', price=100)
+        session.add(variation)
+        session.flush()
+        session.add_all([
+            ProductVariationOption(option_uuid=f'option-{v}-{o}', variation_uuid=variation.variation_uuid,
+                                   name='Color', value=f'Color {o}', stock=5)
+            for o in range(options)
+        ])
+    session.add_all([
+        Review(product_uuid='product-0', user_uuid=buyer.user_uuid, rating=5, comment=f'Review {r}',
+               created_at=datetime(2024, 2, 1) + timedelta(days=r))
+        for r in range(reviews)
+    ])
+    session.add_all([
+        ProductRecommendation(product_uuid='product-0', rank=rank, recommended_uuid=product.product_uuid, score=1.0)
+        for rank, product in enumerate(products[1 + other_products:])
+    ])
+    session.commit()
+    return 'product-0'
+
+
+def count_statements(app, product_uuid):
+    """
+    (response, statements) for the product detail view itself, without its caching decorators.
+
+    The view runs once beforehand so the in-process category tree and active
+    discounts are loaded, as they are on a worker that has served any request.
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    view = inspect.unwrap(get_product_details)
+    with app.test_request_context(f'/products/{product_uuid}'):
+        view(product_uuid)
+    with app.test_request_context(f'/products/{product_uuid}'):
+        db.session.expire_all()
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response, status = view(product_uuid)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+    assert status == 200, response.get_json()
+    return response.get_json(), statements
+
+
+def test_product_details_within_query_budget(app, session):
+    product_uuid = seed_product(session)
+
+    details, statements = count_statements(app, product_uuid)
+
+    assert len(statements) <= PRODUCT_DETAILS_BUDGET, '\n'.join(statements)
+    assert len(details['variations']) == 2
+    assert len(details['reviews']) == 3
+    # The recommended products are from the same shop too
+    assert len(details['shop']['otherProducts']) == 7
+    assert len(details['frequentlyBoughtTogether']) == 3
+
+
+@pytest.mark.parametrize('size', [1, 5])
+def test_product_details_queries_do_not_grow_with_related_rows(app, session, size):
+    product_uuid = seed_product(session, variations=size, options=size, reviews=size,
+                                other_products=size, recommended=size)
+
+    _, statements = count_statements(app, product_uuid)
+
+    assert len(statements) <= PRODUCT_DETAILS_BUDGET, '\n'.join(statements)
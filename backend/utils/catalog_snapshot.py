@@ -0,0 +1,354 @@
+import time
+import threading
+from itertools import chain
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from flask import current_app
+from sqlalchemy import event, insert, or_, func
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+from models import db, Product, ProductChange, Review
+from utils.http_cache import catalog_versions, on_catalog_change
+from utils.pricing import END_MARGIN_SECONDS
+
+# Sort orders kept precomputed, as (column, descending) keys; product_uuid breaks ties in the last key's direction
+SORTS = {
+    'popular': (('total_sales', True), ('view_count', True)),
+    'sales': (('total_sales', True),),
+    'latest': (('created_at', True),),
+    'price_asc': (('effective_price', False),),
+    'price_desc': (('effective_price', True),),
+    'rating': (('rating', True), ('rating_count', True)),
+    'featured': (('featured_score', True),),
+    'discount': (('discount_ratio', True), ('total_sales', True)),
+}
+
+# Listing columns stored as float64 arrays (NULL becomes 0, except compare_at_price which becomes NaN)
+NUMERIC_COLUMNS = (
+    'price', 'compare_at_price', 'quantity', 'total_sales', 'view_count',
+    'rating', 'rating_count', 'featured_score', 'created_at',
+    'discount_percentage', 'discount_start_date', 'discount_end_date'
+)
+
+# Listing columns stored as int32 codes into a per-snapshot dictionary
+CODED_COLUMNS = ('category_uuid', 'shop_uuid', 'brand')
+
+# Catalog scopes whose writes reach the snapshot through the change log
+SNAPSHOT_SCOPES = ('products', 'reviews')
+
+# Changes this recent are re-read on every refresh; ids from transactions still open may commit out of order
+SETTLE_SECONDS = 5
+
+# Change log entries are kept this long; a snapshot that hasn't refreshed for longer reloads in full
+RETENTION_SECONDS = 24 * 3600
+
+# Past this many changes since the last refresh, a full reload is cheaper than patching
+FULL_RELOAD_CHANGES = 5000
+
+# Rough per-entry cost of the Python objects behind the arrays (uuid strings, code dictionaries)
+OBJECT_BYTES = 100
+
+_enabled = False
+_snapshot = None
+_dirty = False
+_over_budget = False
+_lock = threading.Lock()
+
+
+def _number(value, missing=0.0):
+    if value is None:
+        return missing
+    if isinstance(value, datetime):
+        # Naive dates are stored in UTC
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+    return float(value)
+
+
+def _listing_rows(product_uuids=None):
+    """Listing columns of active, visible products, optionally only the given ones"""
+    query = db.session.query(
+        Product.product_uuid,
+        *[getattr(Product, name) for name in CODED_COLUMNS + NUMERIC_COLUMNS]
+    ).filter(
+        Product.status == 'active',
+        Product.visibility == True
+    )
+    if product_uuids is None:
+        return query.all()
+    product_uuids = list(product_uuids)
+    rows = []
+    for start in range(0, len(product_uuids), 500):
+        rows.extend(query.filter(Product.product_uuid.in_(product_uuids[start:start + 500])).all())
+    return rows
+
+
+def _to_columns(rows, codes):
+    """Column arrays for listing rows; codes maps each coded column's values to ints and is extended in place"""
+    columns = {'product_uuid': np.array([row.product_uuid for row in rows], dtype=object)}
+    for name in CODED_COLUMNS:
+        lookup = codes[name]
+        columns[name] = np.array([lookup.setdefault(getattr(row, name), len(lookup)) for row in rows], dtype=np.int32)
+    for name in NUMERIC_COLUMNS:
+        missing = np.nan if name == 'compare_at_price' else 0.0
+        columns[name] = np.array([_number(getattr(row, name), missing) for row in rows], dtype=np.float64)
+    return columns
+
+
+class CatalogSnapshot:
+    """
+    Array-backed copy of the listing columns of active, visible products.
+
+    Filters are boolean masks over the columns and every sort order in SORTS is a
+    precomputed permutation, so a listing page is a few vectorized operations. The
+    arrays are never modified; a refresh builds a new snapshot and swaps it in.
+    """
+
+    def __init__(self, columns, codes, last_change_id):
+        self.columns = columns
+        self.codes = codes
+        self.last_change_id = last_change_id
+        # Catalog versions read before the change log, so every write they count is applied
+        self.versions = None
+        self.product_uuids = columns['product_uuid']
+
+        # Prices at the discount windows open now, valid until the next window opens or closes
+        now = time.time()
+        price, compare_at = columns['price'], columns['compare_at_price']
+        percentage, starts, ends = columns['discount_percentage'], columns['discount_start_date'], columns['discount_end_date']
+        window_open = (percentage > 0) & (starts <= now) & (ends >= now)
+        columns['effective_price'] = np.where(window_open, np.floor(price * (100 - percentage) + 0.5) / 100, price)
+        list_price = np.where(window_open, price, compare_at)
+        boundaries = np.concatenate([starts[(percentage > 0) & (starts > now)], ends[window_open] + END_MARGIN_SECONDS])
+        self.prices_valid_until = boundaries.min() if len(boundaries) else float('inf')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.discounted = list_price > columns['effective_price']
+            columns['discount_ratio'] = np.where(
+                self.discounted, (list_price - columns['effective_price']) / list_price, 0.0
+            )
+
+        # Rank of each product_uuid, so the tie-breaker sorts like the database does
+        uuid_rank = np.empty(len(self.product_uuids), dtype=np.int64)
+        uuid_rank[np.argsort(self.product_uuids, kind='stable')] = np.arange(len(self.product_uuids))
+        self.orders = {}
+        for name, keys in SORTS.items():
+            sort_keys = [-columns[column] if descending else columns[column] for column, descending in keys]
+            sort_keys.append(-uuid_rank if keys[-1][1] else uuid_rank)
+            self.orders[name] = np.lexsort(sort_keys[::-1])
+
+        self.refreshed_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.product_uuids)
+
+    @property
+    def nbytes(self):
+        arrays = chain(self.columns.values(), self.orders.values(), (self.discounted,))
+        entries = len(self.product_uuids) + sum(len(lookup) for lookup in self.codes.values())
+        return sum(array.nbytes for array in arrays) + entries * OBJECT_BYTES
+
+    @classmethod
+    def load(cls):
+        """Build from one query over the whole catalog"""
+        last_change_id = db.session.query(func.max(ProductChange.change_id)).scalar() or 0
+        codes = {name: {} for name in CODED_COLUMNS}
+        return cls(_to_columns(_listing_rows(), codes), codes, last_change_id)
+
+    def patched(self, product_uuids, last_change_id):
+        """A new snapshot with the given products re-read; those no longer listed are dropped"""
+        codes = {name: dict(lookup) for name, lookup in self.codes.items()}
+        changed = _to_columns(_listing_rows(product_uuids), codes)
+        keep = ~np.isin(self.product_uuids, list(product_uuids))
+        columns = {
+            name: np.concatenate([self.columns[name][keep], changed[name]])
+            for name in changed
+        }
+        return CatalogSnapshot(columns, codes, last_change_id)
+
+    def _encode(self, name, values):
+        lookup = self.codes[name]
+        return [lookup[value] for value in values if value in lookup]
+
+    def select(self, sort, offset=0, limit=None, category_uuids=None, shop_uuid=None, brands=None,
+               min_price=None, max_price=None, min_rating=None, discounted=False, in_stock=False):
+        """(product_uuids, total) for one page of the matching products in a SORTS order"""
+        columns = self.columns
+        mask = np.ones(len(self), dtype=bool)
+        if category_uuids is not None:
+            mask &= np.isin(columns['category_uuid'], self._encode('category_uuid', category_uuids))
+        if shop_uuid is not None:
+            mask &= np.isin(columns['shop_uuid'], self._encode('shop_uuid', [shop_uuid]))
+        if brands:
+            mask &= np.isin(columns['brand'], self._encode('brand', brands))
+        if min_price is not None:
+            mask &= columns['effective_price'] >= min_price
+        if max_price is not None:
+            mask &= columns['effective_price'] <= max_price
+        if min_rating is not None:
+            mask &= columns['rating'] >= min_rating
+        if discounted:
+            mask &= self.discounted
+        if in_stock:
+            mask &= columns['quantity'] > 0
+
+        order = self.orders[sort]
+        matched = order[mask[order]]
+        end = None if limit is None else offset + limit
+        return self.product_uuids[matched[offset:end]].tolist(), int(len(matched))
+
+    def paginate(self, sort, page, per_page, **filters):
+        """(product_uuids, total, page, pages), clamping page and per_page the way Query.paginate does"""
+        page = page if page and page >= 1 else 1
+        per_page = per_page if per_page and per_page >= 1 else 20
+        product_uuids, total = self.select(sort, offset=(page - 1) * per_page, limit=per_page, **filters)
+        return product_uuids, total, page, (total + per_page - 1) // per_page
+
+
+def _refresh(snapshot):
+    """Apply the change log to the snapshot, or reload in full when patching isn't possible or worth it"""
+    if snapshot is None or time.monotonic() - snapshot.refreshed_at > RETENTION_SECONDS:
+        return CatalogSnapshot.load()
+
+    settled = datetime.utcnow() - timedelta(seconds=SETTLE_SECONDS)
+    changes = db.session.query(ProductChange.change_id, ProductChange.product_uuid).filter(
+        or_(ProductChange.change_id > snapshot.last_change_id, ProductChange.changed_at > settled)
+    ).order_by(ProductChange.change_id).limit(FULL_RELOAD_CHANGES + 1).all()
+    if len(changes) > FULL_RELOAD_CHANGES or any(
+        product_uuid is None for change_id, product_uuid in changes if change_id > snapshot.last_change_id
+    ):
+        return CatalogSnapshot.load()
+
+    last_change_id = max([snapshot.last_change_id] + [change_id for change_id, _ in changes])
+    product_uuids = {product_uuid for _, product_uuid in changes if product_uuid}
+    if not product_uuids and time.time() < snapshot.prices_valid_until:
+        snapshot.refreshed_at = time.monotonic()
+        return snapshot
+    return snapshot.patched(product_uuids, last_change_id)
+
+
+def get_snapshot():
+    """
+    The current snapshot, refreshed from the change log when due.
+
+    A refresh is due on a timer, when the discount prices expire, and as soon as
+    the catalog versions show a write, from this or any other worker.
+
+    None when snapshots are off or the catalog doesn't fit the memory budget;
+    callers then answer from SQL. While one request refreshes, others keep
+    reading the previous snapshot.
+    """
+    global _snapshot, _dirty, _over_budget
+    if not _enabled or _over_budget:
+        return None
+
+    snapshot = _snapshot
+    versions = catalog_versions(SNAPSHOT_SCOPES)
+    refresh_seconds = current_app.config.get('CATALOG_SNAPSHOT_REFRESH_SECONDS', 5)
+    due = snapshot is None or _dirty or snapshot.versions != versions \
+        or time.monotonic() - snapshot.refreshed_at > refresh_seconds or time.time() >= snapshot.prices_valid_until
+    if due and _lock.acquire(blocking=snapshot is None):
+        try:
+            _dirty = False
+            snapshot = _refresh(_snapshot)
+            snapshot.versions = versions
+            budget = current_app.config.get('CATALOG_SNAPSHOT_MAX_MB', 64) * 1024 * 1024
+            if snapshot.nbytes > budget:
+                _over_budget = True
+                snapshot = None
+                print(f"Catalog snapshot exceeds {budget // (1024 * 1024)} MB, serving listings from SQL")
+            _snapshot = snapshot
+        except Exception as e:
+            print(f"Error refreshing catalog snapshot: {str(e)}")
+        finally:
+            _lock.release()
+    return snapshot
+
+
+def snapshot_validator(**view_args):
+    """
+    Validator for responses served from the snapshot; None while it is behind the catalog versions.
+
+    Writes bump the versions before a worker's snapshot catches up; a listing
+    built from the older snapshot then goes out without an ETag and uncached,
+    rather than being stored under versions it doesn't reflect.
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None and snapshot.versions != catalog_versions(SNAPSHOT_SCOPES):
+        return None
+    return ''
+
+
+def load_products(product_uuids, options=()):
+    """Products for the ids, in the given order, from one query; ids no longer listed are skipped"""
+    if not product_uuids:
+        return []
+    products = {
+        product.product_uuid: product
+        for product in Product.query.options(*options).filter(
+            Product.product_uuid.in_(product_uuids),
+            Product.status == 'active',
+            Product.visibility == True
+        ).all()
+    }
+    return [products[uuid] for uuid in product_uuids if uuid in products]
+
+
+def log_product_changes(product_uuids=None, connection=None):
+    """
+    Record products written outside the ORM unit of work, so snapshots re-read them.
+
+    product_uuids is a list, a SELECT of product_uuids, or None when any product may
+    have changed. Does nothing unless snapshots are on.
+    """
+    if not _enabled:
+        return
+    target = connection if connection is not None else db.session
+    if isinstance(product_uuids, Select):
+        target.execute(insert(ProductChange).from_select(['product_uuid'], product_uuids))
+        return
+    rows = [{'product_uuid': None}] if product_uuids is None else [
+        {'product_uuid': product_uuid} for product_uuid in product_uuids
+    ]
+    if rows:
+        target.execute(insert(ProductChange), rows)
+
+
+def _log_flushed_products(session, flush_context):
+    """Log products written by this flush, and products whose rating a new or deleted review changes"""
+    product_uuids = set()
+    for obj in chain(session.new, session.deleted, session.dirty):
+        if isinstance(obj, Product) and (obj not in session.dirty or session.is_modified(obj)):
+            product_uuids.add(obj.product_uuid)
+        elif isinstance(obj, Review) and obj not in session.dirty:
+            product_uuids.add(obj.product_uuid)
+    if product_uuids:
+        log_product_changes(sorted(product_uuids), connection=session.connection())
+
+
+def _mark_dirty(scopes):
+    global _dirty
+    if 'products' in scopes or 'reviews' in scopes:
+        _dirty = True
+
+
+def prune_product_changes():
+    """Drop change log entries past the retention window"""
+    cutoff = datetime.utcnow() - timedelta(seconds=RETENTION_SECONDS)
+    count = ProductChange.query.filter(ProductChange.changed_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def init_catalog_snapshot(app):
+    """Start logging product writes and build this worker's snapshot, when CATALOG_SNAPSHOT_ENABLED is on"""
+    global _enabled
+    _enabled = app.config.get('CATALOG_SNAPSHOT_ENABLED', False)
+    if not _enabled:
+        return
+    if not event.contains(Session, 'after_flush', _log_flushed_products):
+        event.listen(Session, 'after_flush', _log_flushed_products)
+    on_catalog_change(_mark_dirty)
+    try:
+        get_snapshot()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error building catalog snapshot: {str(e)}")
@@ -0,0 +1,123 @@
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+from models import db, Category
+from utils import trigram_index
+from utils.http_cache import catalog_versions
+
+CategoryNode = namedtuple('CategoryNode', [
+    'category_uuid', 'name', 'description', 'parent_id', 'is_active', 'image_url', 'children'
+])
+
+
+class CategoryTree:
+    """
+    Immutable snapshot of the category hierarchy.
+
+    Everything is precomputed when the snapshot is built, so descendant sets,
+    breadcrumb paths and child lists are dictionary lookups. Writers never mutate a
+    snapshot; the 'categories' catalog version it was built for tells readers in
+    every process when to build a fresh one.
+    """
+
+    def __init__(self, categories, version=None):
+        self.version = version
+        children = {}
+        for category in categories:
+            children.setdefault(category.parent_id, []).append(category.category_uuid)
+
+        self.nodes = MappingProxyType({
+            category.category_uuid: CategoryNode(
+                category.category_uuid,
+                category.name,
+                category.description,
+                category.parent_id,
+                category.is_active,
+                category.image_url,
+                tuple(children.get(category.category_uuid, ()))
+            ) for category in categories
+        })
+        self.roots = tuple(uuid for uuid in children.get(None, ()) if uuid in self.nodes)
+
+        paths = {}
+        descendants = {}
+        active_descendants = {}
+        for root in self.roots:
+            self._walk(root, (), paths, descendants, active_descendants)
+        self._paths = MappingProxyType(paths)
+        self._descendants = MappingProxyType(descendants)
+        self._active_descendants = MappingProxyType(active_descendants)
+
+    def _walk(self, uuid, parent_path, paths, descendants, active_descendants):
+        node = self.nodes[uuid]
+        paths[uuid] = parent_path + (node.name,)
+        subtree = {uuid}
+        active_subtree = {uuid}
+        for child in node.children:
+            self._walk(child, paths[uuid], paths, descendants, active_descendants)
+            subtree |= descendants[child]
+            if self.nodes[child].is_active:
+                active_subtree |= active_descendants[child]
+        descendants[uuid] = frozenset(subtree)
+        active_descendants[uuid] = frozenset(active_subtree)
+
+    def get(self, category_uuid):
+        return self.nodes.get(category_uuid)
+
+    def descendant_ids(self, category_uuid, active_only=True):
+        """The category and everything below it, at any depth; inactive branches are skipped by default"""
+        source = self._active_descendants if active_only else self._descendants
+        return source.get(category_uuid, frozenset())
+
+    def path(self, category_uuid):
+        """Names from the root down to the category, or None if the category isn't in the snapshot"""
+        return self._paths.get(category_uuid)
+
+    def children(self, category_uuid):
+        node = self.nodes.get(category_uuid)
+        return [self.nodes[child] for child in node.children] if node else []
+
+
+_tree = None
+_lock = threading.Lock()
+
+
+def get_tree():
+    """
+    Category snapshot for the current 'categories' catalog version.
+
+    Categories written in any process bump that version, so a snapshot is never
+    served under a version newer than its contents and responses cached or
+    validated by the version always match the tree they were built from. One
+    thread rebuilds per version change with a single query; concurrent readers
+    wait for it rather than reading the old tree.
+    """
+    global _tree
+    version = dict(catalog_versions(['categories'])).get('categories')
+    tree = _tree
+    if tree is None or tree.version != version:
+        with _lock:
+            tree = _tree
+            if tree is None or tree.version != version:
+                tree = _tree = CategoryTree(Category.query.all(), version)
+    return tree
+
+
+def init_category_tree(app):
+    """Build the category snapshot at startup"""
+    try:
+        get_tree()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error building category tree: {str(e)}")
+
+
+def categories_changed():
+    """Call after categories are created, moved, renamed or deleted"""
+    global _tree
+    try:
+        trigram_index.refresh('category', [uuid for (uuid,) in db.session.query(Category.category_uuid).all()])
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error refreshing category trigrams: {str(e)}")
+    _tree = None
@@ -0,0 +1,68 @@
+from sqlalchemy import select, update, and_
+from models import db, Product
+from utils.http_cache import bump_catalog_versions
+from utils.catalog_snapshot import log_product_changes
+
+
+def _execute(statement):
+    return db.session.execute(statement.execution_options(synchronize_session=False)).rowcount
+
+
+def _touched(product_uuids):
+    """Tells caches, catalog snapshots and the active discount set about products whose discount was written"""
+    log_product_changes(product_uuids)
+    bump_catalog_versions('products', 'discounts')
+
+
+def expire_discounts(now, seller_id=None):
+    """
+    Clear the discount of products whose discount has ended.
+
+    Prices are resolved at read time, so this is housekeeping for the discount
+    lists only. Optionally only one seller's products. Returns (product_uuids,
+    rows updated); the caller commits.
+    """
+    expired = and_(
+        Product.discount_name.isnot(None),
+        Product.discount_end_date < now
+    )
+    if seller_id is not None:
+        expired = and_(expired, Product.seller_id == seller_id)
+    product_uuids = [uuid for (uuid,) in db.session.execute(select(Product.product_uuid).where(expired))]
+    if not product_uuids:
+        return product_uuids, 0
+
+    _touched(select(Product.product_uuid).where(expired))
+    count = _execute(update(Product).where(expired).values(
+        discount_name=None,
+        discount_percentage=None,
+        discount_start_date=None,
+        discount_end_date=None,
+        version=Product.version + 1,
+        updated_at=Product.updated_at
+    ))
+    return product_uuids, count
+
+
+def apply_discount(product_uuids, name, percentage, start_date, end_date):
+    """
+    Put products on a discount window.
+
+    Only the window is stored; stored prices are left alone and the discounted
+    price is resolved at read time by utils.pricing. Ids are handled 500 per
+    statement. Returns the number of products updated; the caller commits.
+    """
+    count = 0
+    product_uuids = list(product_uuids)
+    for start in range(0, len(product_uuids), 500):
+        count += _execute(update(Product).where(Product.product_uuid.in_(product_uuids[start:start + 500])).values(
+            discount_name=name,
+            discount_percentage=percentage,
+            discount_start_date=start_date,
+            discount_end_date=end_date,
+            version=Product.version + 1
+        ))
+
+    if count:
+        _touched(product_uuids)
+    return count
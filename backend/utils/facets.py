@@ -0,0 +1,111 @@
+from collections import Counter
+from sqlalchemy import case, func
+from models import Product
+from utils.category_tree import get_tree
+from utils.pricing import effective_price_expression, discounted_expression
+
+FACETS = ('category', 'brand', 'price', 'discount')
+
+
+def parse_facets(value):
+    """Facets named in a comma-separated ?facets= argument, in canonical order; None when absent"""
+    if value is None:
+        return None
+    requested = {item.strip() for item in value.split(',')}
+    return [facet for facet in FACETS if facet in requested]
+
+
+def discount_flag_expression():
+    """1 for products selling below the price shown struck through at the discount active now, else 0"""
+    return case((discounted_expression(), 1), else_=0)
+
+
+def price_bucket_expression(bounds):
+    """Index of the effective price's bucket: 0 below bounds[0], len(bounds) at or above the last bound"""
+    price = effective_price_expression()
+    return case(
+        *[(price < bound, index) for index, bound in enumerate(bounds)],
+        else_=len(bounds)
+    )
+
+
+def facet_filters(args):
+    """(brands, discounted) from the filters the facet values map back to: ?brand=a,b and ?discounted=true"""
+    brands = [brand.strip() for brand in args.get('brand', '').split(',') if brand.strip()]
+    return brands, args.get('discounted') == 'true'
+
+
+def apply_facet_filters(query, args):
+    brands, discounted = facet_filters(args)
+    if brands:
+        query = query.filter(Product.brand.in_(brands))
+    if discounted:
+        query = query.filter(discounted_expression())
+    return query
+
+
+def compute_facets(query, facets, price_bounds):
+    """
+    Counts for every requested facet over the query's filtered products, in one grouped query.
+
+    The query is grouped by all requested facet columns at once and each facet is
+    summed from those rows, so the cost doesn't grow with the number of facets.
+    Returns (total, facets); total is the number of matching products.
+    """
+    columns = {
+        'category': Product.category_uuid,
+        'brand': Product.brand,
+        'price': price_bucket_expression(price_bounds),
+        'discount': discount_flag_expression(),
+    }
+    grouped = query.order_by(None).with_entities(
+        *[columns[facet].label(facet) for facet in facets], func.count(Product.product_uuid)
+    )
+    if facets:
+        grouped = grouped.group_by(*[columns[facet] for facet in facets])
+    rows = grouped.all()
+
+    total = 0
+    counts = {facet: Counter() for facet in facets}
+    for row in rows:
+        total += row[-1]
+        for facet, value in zip(facets, row):
+            counts[facet][value] += row[-1]
+
+    result = {}
+    if 'category' in counts:
+        result['category'] = _category_facet(counts['category'])
+    if 'brand' in counts:
+        result['brand'] = [
+            {'value': brand, 'count': count}
+            for brand, count in sorted(counts['brand'].items(), key=lambda item: (-item[1], item[0] or ''))
+            if brand
+        ]
+    if 'price' in counts:
+        edges = [None] + list(price_bounds) + [None]
+        result['price'] = [
+            {'min': edges[index], 'max': edges[index + 1], 'count': counts['price'][index]}
+            for index in range(len(edges) - 1) if counts['price'][index]
+        ]
+    if 'discount' in counts:
+        result['discount'] = {'discounted': counts['discount'][1], 'regular': counts['discount'][0]}
+    return total, result
+
+
+def _category_facet(counts):
+    """Category counts rolled up to every ancestor, so a parent counts its subcategories' products"""
+    tree = get_tree()
+    rolled = Counter()
+    for category_uuid, count in counts.items():
+        node, seen = tree.get(category_uuid), set()
+        while node is not None and node.category_uuid not in seen:
+            rolled[node.category_uuid] += count
+            seen.add(node.category_uuid)
+            node = tree.get(node.parent_id) if node.parent_id else None
+    nodes = sorted((tree.get(uuid) for uuid in rolled), key=lambda node: (-rolled[node.category_uuid], node.name))
+    return [{
+        'uuid': node.category_uuid,
+        'name': node.name,
+        'parent_id': node.parent_id,
+        'count': rolled[node.category_uuid]
+    } for node in nodes]
@@ -0,0 +1,200 @@
+import hashlib
+from functools import wraps
+from itertools import chain
+from datetime import datetime
+from flask import request, make_response, g
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+from models import (
+    db, CatalogVersion, Product, ProductVariation, ProductVariationOption, Shop, SellerInfo,
+    Category, CategoryAttribute, Review, Banner, ShippingProvider, ShippingRate,
+    ProductRecommendation, ProductSimilarity
+)
+
+# Catalog scope whose version is bumped when a row of each model is written
+SCOPE_BY_MODEL = {
+    Product: 'products',
+    ProductVariation: 'products',
+    ProductVariationOption: 'products',
+    Shop: 'shops',
+    SellerInfo: 'shops',
+    Category: 'categories',
+    CategoryAttribute: 'categories',
+    Review: 'reviews',
+    Banner: 'banners',
+    ShippingProvider: 'shipping',
+    ShippingRate: 'shipping',
+    ProductRecommendation: 'recommendations',
+    ProductSimilarity: 'recommendations',
+}
+
+# 'discounts' has no model of its own: discount windows live on products and their writers bump it explicitly
+SCOPES = sorted(set(SCOPE_BY_MODEL.values()) | {'discounts'})
+
+
+# Callbacks run with the set of changed scopes once a transaction that bumped them commits
+_change_listeners = []
+
+# Callables whose value is folded into a scope's version, for state that changes with time rather than writes
+_version_sources = {}
+
+
+def on_catalog_change(callback):
+    """Register callback(scopes) to run after every commit that changed catalog scopes"""
+    if callback not in _change_listeners:
+        _change_listeners.append(callback)
+    return callback
+
+
+def add_version_source(scope, source):
+    """Fold source() into the version of scope, so ETags and cached responses change whenever it does"""
+    _version_sources[scope] = source
+
+
+def bump_catalog_versions(*scopes, session=None):
+    """
+    Invalidate ETags and cached responses for the given scopes once the session's transaction commits.
+
+    ORM writes are picked up by the flush hook; call this after writes that bypass
+    the unit of work. The version rows are bumped after the commit, so writers
+    never queue behind them and a version never runs ahead of the data it covers.
+    """
+    session = session or db.session
+    session.info.setdefault('catalog_scopes', set()).update(scopes)
+
+
+def _record_flushed_scopes(session, flush_context):
+    """Note the scopes of every catalog row written by this flush and bump the versions of the products it touched"""
+    scopes = set()
+    product_uuids = set()
+    variation_uuids = set()
+    for obj in chain(session.new, session.deleted, session.dirty):
+        scope = SCOPE_BY_MODEL.get(type(obj))
+        if not scope or (obj in session.dirty and not session.is_modified(obj)):
+            continue
+        scopes.add(scope)
+        if isinstance(obj, Product) and obj not in session.new and obj not in session.deleted:
+            product_uuids.add(obj.product_uuid)
+        elif isinstance(obj, ProductVariation):
+            product_uuids.add(obj.product_uuid)
+        elif isinstance(obj, ProductVariationOption):
+            variation_uuids.add(obj.variation_uuid)
+    if not scopes:
+        return
+    session.info.setdefault('catalog_scopes', set()).update(scopes)
+
+    # Product detail validators come from the product's own version, so only the
+    # products written here change theirs; their rows are locked by this write already
+    connection = session.connection()
+    if variation_uuids:
+        product_uuids.update(connection.execute(
+            select(ProductVariation.product_uuid).where(ProductVariation.variation_uuid.in_(variation_uuids))
+        ).scalars())
+    product_uuids.discard(None)
+    if product_uuids:
+        connection.execute(update(Product).where(Product.product_uuid.in_(product_uuids)).values(
+            version=Product.version + 1,
+            updated_at=Product.updated_at
+        ))
+
+
+def _apply_committed_scopes(session):
+    """Bump the versions of the scopes the committed transaction wrote, in one short transaction of their own"""
+    scopes = session.info.pop('catalog_scopes', None)
+    if not scopes:
+        return
+    try:
+        with session.get_bind().begin() as connection:
+            connection.execute(update(CatalogVersion).where(CatalogVersion.scope.in_(scopes)).values(
+                version=CatalogVersion.version + 1,
+                updated_at=datetime.utcnow()
+            ))
+    except Exception as e:
+        print(f"Error bumping catalog versions: {str(e)}")
+    for callback in _change_listeners:
+        try:
+            callback(scopes)
+        except Exception as e:
+            print(f"Error in catalog change listener: {str(e)}")
+
+
+def _forget_rolled_back_scopes(session, previous_transaction):
+    session.info.pop('catalog_scopes', None)
+
+
+def init_catalog_versions(app):
+    """Create missing version rows and start tracking catalog writes"""
+    try:
+        existing = {scope for (scope,) in db.session.query(CatalogVersion.scope).all()}
+        for scope in SCOPES:
+            if scope not in existing:
+                db.session.add(CatalogVersion(scope=scope, version=0))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error initializing catalog versions: {str(e)}")
+
+    for name, listener in (('after_flush', _record_flushed_scopes),
+                           ('after_commit', _apply_committed_scopes),
+                           ('after_soft_rollback', _forget_rolled_back_scopes)):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
+
+
+def catalog_versions(scopes):
+    """(scope, version) pairs for the scopes, read once per request, then any version sources of the scopes"""
+    cache = g.setdefault('catalog_versions', {})
+    key = tuple(sorted(set(scopes)))
+    if key not in cache:
+        cache[key] = [tuple(row) for row in db.session.query(CatalogVersion.scope, CatalogVersion.version).filter(
+            CatalogVersion.scope.in_(key)
+        ).order_by(CatalogVersion.scope).all()]
+    return cache[key] + [(f'{scope}:time', _version_sources[scope]()) for scope in key if scope in _version_sources]
+
+
+def catalog_etag(scopes, validator=''):
+    """Strong ETag for the current request from its path, its arguments, the scope versions and any per-entity validator"""
+    versions = catalog_versions(scopes)
+    args = sorted(request.args.items(multi=True))
+    key = f"{request.path}|{args}|{versions}|{validator}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def conditional_get(*scopes, max_age=60, validator=None):
+    """
+    Answer GETs with a strong ETag and Cache-Control, and with 304 when If-None-Match matches.
+
+    scopes are the catalog scopes the response is built from; any write to them changes the ETag.
+    validator(**view_args) returns the per-entity part of the ETag, e.g. a product's own
+    version, for responses about one entity; when it returns None the response goes out without an ETag.
+    """
+    cache_control = f'public, max-age={max_age}'
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return fn(*args, **kwargs)
+
+            try:
+                entity_version = validator(**kwargs) if validator else ''
+                if entity_version is None:
+                    return fn(*args, **kwargs)
+                etag = catalog_etag(scopes, entity_version)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error computing ETag: {str(e)}")
+                return fn(*args, **kwargs)
+
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,147 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+import pandas as pd
+from flask import current_app
+from sqlalchemy import select, update, or_, and_
+from models import db, ImportJob
+from utils.product_import import ProductImport, InvalidImportFile, REQUIRED_COLUMNS
+
+# Errors that make the file itself unimportable; retrying won't help
+FILE_ERRORS = (InvalidImportFile, pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError, FileNotFoundError)
+
+
+class ImportJobLost(Exception):
+    """Raised at a checkpoint when another worker has taken the job over"""
+
+
+def enqueue_import(file, seller_id, shop_uuid):
+    """
+    Save an uploaded CSV where the import workers read it and queue it.
+
+    Only the header is read here; a file without the required columns is
+    rejected with InvalidImportFile before anything is queued. Returns the job;
+    the caller commits.
+    """
+    folder = current_app.config['BULK_IMPORT_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    job_uuid = str(uuid.uuid4())
+    file_path = os.path.join(folder, f"{job_uuid}.csv")
+    file.save(file_path)
+
+    try:
+        columns = pd.read_csv(file_path, nrows=0, dtype=str).columns
+        missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+        if missing:
+            raise InvalidImportFile(f"Missing required columns: {', '.join(missing)}")
+    except FILE_ERRORS as e:
+        os.remove(file_path)
+        raise InvalidImportFile(str(e))
+
+    job = ImportJob(
+        job_uuid=job_uuid,
+        seller_id=seller_id,
+        shop_uuid=shop_uuid,
+        filename=file.filename,
+        file_path=file_path
+    )
+    db.session.add(job)
+    return job
+
+
+def claim_import_job(worker, timeout):
+    """
+    Take the oldest queued job, or a running one whose worker stopped sending heartbeats.
+
+    The claim is a conditional UPDATE, so of several workers racing for a job
+    exactly one gets it. Returns the claimed job or None.
+    """
+    now = datetime.utcnow()
+    claimable = or_(
+        ImportJob.status == 'queued',
+        and_(ImportJob.status == 'running', ImportJob.heartbeat_at < now - timedelta(seconds=timeout))
+    )
+    candidates = db.session.execute(
+        select(ImportJob.job_uuid).where(claimable).order_by(ImportJob.created_at).limit(5)
+    ).scalars().all()
+    for job_uuid in candidates:
+        claimed = db.session.execute(update(ImportJob).where(
+            ImportJob.job_uuid == job_uuid,
+            claimable
+        ).values(
+            status='running',
+            worker=worker,
+            heartbeat_at=now,
+            attempts=ImportJob.attempts + 1,
+            started_at=now,
+            started_row=ImportJob.rows_processed
+        ).execution_options(synchronize_session=False)).rowcount == 1
+        db.session.commit()
+        if claimed:
+            return db.session.get(ImportJob, job_uuid)
+    return None
+
+
+def _finish(job, worker, status, message):
+    db.session.execute(update(ImportJob).where(
+        ImportJob.job_uuid == job.job_uuid,
+        ImportJob.worker == worker
+    ).values(
+        status=status,
+        message=message,
+        finished_at=datetime.utcnow()
+    ).execution_options(synchronize_session=False))
+    db.session.commit()
+    if os.path.exists(job.file_path):
+        os.remove(job.file_path)
+
+
+def run_import_job(job, worker, chunk_rows=1000, max_attempts=3, on_chunk=None):
+    """
+    Import a claimed job's file, resuming after the rows earlier attempts committed.
+
+    Progress and a heartbeat are written in every chunk's transaction, so after a
+    crash the next attempt neither repeats nor skips a row. A job that failed
+    max_attempts times without a verdict on its file is given up.
+    """
+    if job.attempts > max_attempts:
+        _finish(job, worker, 'failed', f"Import stopped after {max_attempts} attempts")
+        return
+
+    def checkpoint(report):
+        renewed = db.session.execute(update(ImportJob).where(
+            ImportJob.job_uuid == job.job_uuid,
+            ImportJob.worker == worker
+        ).values(
+            heartbeat_at=datetime.utcnow(),
+            **report
+        ).execution_options(synchronize_session=False)).rowcount
+        if not renewed:
+            raise ImportJobLost(f"Import job {job.job_uuid} was taken over by another worker")
+
+    importer = ProductImport(job.shop_uuid, job.seller_id, chunk_rows=chunk_rows, progress=job.progress())
+    try:
+        with open(job.file_path, 'rb') as file:
+            report = importer.run(file, on_chunk=on_chunk, checkpoint=checkpoint)
+    except ImportJobLost:
+        db.session.rollback()
+        raise
+    except FILE_ERRORS as e:
+        db.session.rollback()
+        _finish(job, worker, 'failed', f"Invalid CSV file: {str(e)}")
+        return
+
+    _finish(job, worker, 'completed', f"Successfully processed {report['products_created']} products")
+
+
+def requeue_import_job(job_uuid, worker):
+    """Hand a job this worker is running back to the queue, e.g. when the worker shuts down"""
+    db.session.execute(update(ImportJob).where(
+        ImportJob.job_uuid == job_uuid,
+        ImportJob.worker == worker,
+        ImportJob.status == 'running'
+    ).values(
+        status='queued',
+        attempts=ImportJob.attempts - 1
+    ).execution_options(synchronize_session=False))
+    db.session.commit()
@@ -0,0 +1,61 @@
+import os
+import time
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import update, or_
+from sqlalchemy.exc import IntegrityError
+from models import db, JobLease
+
+
+class Lease:
+    """
+    A lease row held by at most one process at a time.
+
+    The holder renews it well before it expires; when the holder dies or loses the
+    database, the row expires and the next process to call acquire() takes it over.
+    held() goes false locally before the row expires, so two holders never overlap
+    as long as clocks roughly agree.
+    """
+
+    def __init__(self, name, ttl=60):
+        self.name = name
+        self.ttl = ttl
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._held_until = None
+
+    def acquire(self):
+        """Take the lease if it is free or expired, or renew it if held; returns whether this process holds it"""
+        started = time.monotonic()
+        now = datetime.now(timezone.utc)
+        values = {'holder': self.holder, 'expires_at': now + timedelta(seconds=self.ttl)}
+        try:
+            taken = db.session.execute(update(JobLease).where(
+                JobLease.name == self.name,
+                or_(JobLease.holder == self.holder, JobLease.expires_at < now)
+            ).values(**values)).rowcount == 1
+            if not taken and db.session.get(JobLease, self.name) is None:
+                db.session.add(JobLease(name=self.name, **values))
+                db.session.flush()
+                taken = True
+            db.session.commit()
+        except IntegrityError:
+            # Another process created the row first
+            db.session.rollback()
+            taken = False
+
+        # Stop trusting the lease a third of the ttl before it expires in the database
+        self._held_until = started + self.ttl * 2 / 3 if taken else None
+        return taken
+
+    def held(self):
+        return self._held_until is not None and time.monotonic() < self._held_until
+
+    def release(self):
+        """Give the lease up so a standby process takes over without waiting for it to expire"""
+        self._held_until = None
+        db.session.execute(update(JobLease).where(
+            JobLease.name == self.name,
+            JobLease.holder == self.holder
+        ).values(expires_at=datetime.now(timezone.utc)))
+        db.session.commit()
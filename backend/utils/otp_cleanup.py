@@ -1,6 +1,5 @@
 from datetime import datetime
-from __init__ import db
-from __init__ import OTP
+from models import db, OTP
 
 def cleanup_expired_otps():
     """
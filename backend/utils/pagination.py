@@ -0,0 +1,123 @@
+import json
+import base64
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import and_, or_, func, tuple_
+from sqlalchemy.engine import Row
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor is malformed or was issued for a different sort order"""
+
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    return value
+
+
+def _load(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'dec' in value:
+            return Decimal(value['dec'])
+    return value
+
+
+def encode_cursor(sort, values):
+    """Pack the sort name and the last row's key values into an opaque URL-safe token"""
+    payload = json.dumps({'s': sort, 'v': [_dump(value) for value in values]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """Unpack a cursor produced by encode_cursor for the same sort order"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = [_load(value) for value in payload['v']]
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+    if payload.get('s') != sort:
+        raise InvalidCursor('Cursor does not match the requested sort order')
+    return values
+
+
+def column_key(column, descending=False, default=None):
+    """
+    Keyset key for a mapped column.
+
+    NULLs are compared as `default` when one is given, so nullable counters like
+    total_sales can take part in the keyset comparison.
+    """
+    expression = func.coalesce(column, default) if default is not None else column
+    name = column.key
+
+    def getter(row):
+        entity = row[0] if isinstance(row, Row) else row
+        value = getattr(entity, name)
+        return default if value is None and default is not None else value
+
+    return expression, descending, getter
+
+
+def expression_key(expression, descending=False, index=1):
+    """Keyset key for an extra selected column, e.g. a search rank, read from the result row"""
+    return expression, descending, lambda row: row[index]
+
+
+def _after(keys, values):
+    """WHERE clause selecting rows strictly after `values` in the keys' order"""
+    directions = {descending for _, descending, _ in keys}
+    expressions = [expression for expression, _, _ in keys]
+    if len(directions) == 1:
+        # Row-value comparison lets the database seek on a composite index
+        if directions.pop():
+            return tuple_(*expressions) < tuple_(*values)
+        return tuple_(*expressions) > tuple_(*values)
+
+    clauses = []
+    for i, (expression, descending, _) in enumerate(keys):
+        equal = [expressions[j] == values[j] for j in range(i)]
+        step = expression < values[i] if descending else expression > values[i]
+        clauses.append(and_(*equal, step))
+    return or_(*clauses)
+
+
+def order_by_keys(query, keys):
+    """Replace the query's ordering with the keys' ordering"""
+    return query.order_by(None).order_by(*[
+        expression.desc() if descending else expression.asc()
+        for expression, descending, _ in keys
+    ])
+
+
+def count_total(query):
+    """Exact row count for a listing query, for callers that explicitly ask for totals"""
+    return query.order_by(None).count()
+
+
+def keyset_paginate(query, keys, sort, cursor=None, per_page=20):
+    """
+    Fetch one page of `query` ordered by `keys`, starting after `cursor`.
+
+    keys is a list of (expression, descending, getter) tuples as built by column_key;
+    the last key must be unique (e.g. the primary key) so pages never overlap.
+    Returns (rows, next_cursor) where next_cursor is None on the last page.
+    """
+    if cursor:
+        values = decode_cursor(cursor, sort)
+        if len(values) != len(keys):
+            raise InvalidCursor('Invalid cursor')
+        query = query.filter(_after(keys, values))
+
+    rows = order_by_keys(query, keys).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(sort, [getter(rows[-1]) for _, _, getter in keys])
+    return rows, next_cursor
@@ -0,0 +1,227 @@
+import re
+import time
+import heapq
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from flask import current_app
+from models import db, Product
+from utils.pricing import active_discount, discounted_price
+
+# Rebuild from the database when the index is older than this, so writes handled
+# by other workers eventually show up in this one
+MAX_AGE_SECONDS = 600
+
+# Number of prefixes whose ranked results are kept between writes
+TOP_CACHE_SIZE = 2048
+
+
+def normalize(value):
+    """Lowercase, strip accents and collapse whitespace so lookups are case/diacritic-insensitive"""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return ' '.join(re.findall(r'\w+', value.lower()))
+
+
+def _terms_for(name, tags):
+    """Every word-suffix of the name ("iphone 15 pro", "15 pro", "pro") plus each tag"""
+    words = normalize(name).split()
+    terms = {' '.join(words[i:]) for i in range(len(words))}
+    for tag in (tags or '').split(','):
+        tag = normalize(tag)
+        if tag:
+            terms.add(tag)
+    return terms
+
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index over active, visible product names and tags.
+
+    Each searchable term is stored once in a sorted list alongside its product, so a
+    prefix lookup is a bisect to the first matching term followed by a scan of the
+    contiguous range. Ranked results per prefix are cached until the next write.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._terms = []
+        self._entries = {}
+        self._top = {}
+        self.built_at = None
+
+    def build(self, rows):
+        """Replace the index contents with the given product rows"""
+        terms = []
+        entries = {}
+        for row in rows:
+            entry = self._entry(row)
+            entries[entry['product_uuid']] = entry
+            terms.extend((term, entry['product_uuid']) for term in entry['terms'])
+        terms.sort()
+        with self._lock:
+            self._terms = terms
+            self._entries = entries
+            self._top = {}
+            self.built_at = time.monotonic()
+
+    def upsert(self, row):
+        """Add or replace a single product"""
+        entry = self._entry(row)
+        with self._lock:
+            self._remove_locked(entry['product_uuid'])
+            self._entries[entry['product_uuid']] = entry
+            for term in entry['terms']:
+                insort(self._terms, (term, entry['product_uuid']))
+            self._top = {}
+
+    def remove(self, product_uuid):
+        """Drop a product that is no longer suggestible"""
+        with self._lock:
+            self._remove_locked(product_uuid)
+            self._top = {}
+
+    def _remove_locked(self, product_uuid):
+        entry = self._entries.pop(product_uuid, None)
+        if not entry:
+            return
+        for term in entry['terms']:
+            position = bisect_left(self._terms, (term, product_uuid))
+            if position < len(self._terms) and self._terms[position] == (term, product_uuid):
+                del self._terms[position]
+
+    @staticmethod
+    def _entry(row):
+        return {
+            'product_uuid': row.product_uuid,
+            'name': row.name,
+            'main_image': row.main_image,
+            'price': float(row.price) if row.price is not None else None,
+            'weight': row.total_sales or 0,
+            'terms': _terms_for(row.name, row.tags)
+        }
+
+    def lookup(self, prefix, limit=10):
+        """Return up to `limit` suggestions whose name words or tags start with prefix, best sellers first"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            ranked = self._top.get((prefix, limit))
+            if ranked is None:
+                start = bisect_left(self._terms, (prefix,))
+                end = bisect_left(self._terms, (prefix + '\U0010ffff',), start)
+                matches = {product_uuid for _, product_uuid in self._terms[start:end]}
+                ranked = heapq.nlargest(
+                    limit, matches,
+                    key=lambda uuid: (self._entries[uuid]['weight'], self._entries[uuid]['name'])
+                )
+                if len(self._top) >= TOP_CACHE_SIZE:
+                    self._top.clear()
+                self._top[(prefix, limit)] = ranked
+            entries = [self._entries[uuid] for uuid in ranked]
+        # Stored prices are indexed; the discount active now is applied on the way out
+        suggestions = []
+        for entry in entries:
+            discount = active_discount(entry['product_uuid'])
+            suggestions.append({
+                'name': entry['name'],
+                'product_uuid': entry['product_uuid'],
+                'main_image': entry['main_image'],
+                'price': float(discounted_price(entry['price'], discount.percentage))
+                if discount and entry['price'] is not None else entry['price']
+            })
+        return suggestions
+
+    def is_stale(self):
+        return self.built_at is None or time.monotonic() - self.built_at > MAX_AGE_SECONDS
+
+
+_index = PrefixIndex()
+
+# Held while the index is rebuilt; requests finding it stale meanwhile serve the old contents
+_rebuild_lock = threading.Lock()
+
+
+def _suggestible_products():
+    return Product.query.filter(
+        Product.status == 'active',
+        Product.visibility == True
+    ).with_entities(
+        Product.product_uuid,
+        Product.name,
+        Product.tags,
+        Product.main_image,
+        Product.price,
+        Product.total_sales
+    )
+
+
+def rebuild_prefix_index():
+    """Load every suggestible product into the in-process index"""
+    rows = _suggestible_products().all()
+    _index.build(rows)
+    return len(rows)
+
+
+def init_prefix_index(app):
+    """Build the suggestion index at startup"""
+    try:
+        count = rebuild_prefix_index()
+        app.logger.info(f"Suggestion index built with {count} products")
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error building suggestion index: {str(e)}")
+
+
+def refresh_products(product_uuids):
+    """Patch the index for products that were created, updated or archived"""
+    product_uuids = [uuid for uuid in product_uuids if uuid]
+    if not product_uuids or _index.built_at is None:
+        return
+    rows = _suggestible_products().filter(Product.product_uuid.in_(product_uuids)).all()
+    found = set()
+    for row in rows:
+        _index.upsert(row)
+        found.add(row.product_uuid)
+    for product_uuid in set(product_uuids) - found:
+        _index.remove(product_uuid)
+
+
+def _rebuild_in_background(app):
+    """Rebuild the index in a thread and release the rebuild lock when done"""
+    def run():
+        try:
+            with app.app_context():
+                try:
+                    rebuild_prefix_index()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error rebuilding suggestion index: {str(e)}")
+        finally:
+            _rebuild_lock.release()
+
+    try:
+        threading.Thread(target=run, name='prefix-index-rebuild', daemon=True).start()
+    except Exception:
+        _rebuild_lock.release()
+        raise
+
+
+def suggest(prefix, limit=10):
+    """
+    Serve suggestions from memory.
+
+    A missing index is built by the first request while the others wait for it;
+    a stale one is rebuilt by a single background thread while requests keep
+    using the current contents.
+    """
+    if not normalize(prefix):
+        return []
+    if _index.built_at is None:
+        with _rebuild_lock:
+            if _index.built_at is None:
+                rebuild_prefix_index()
+    elif _index.is_stale() and _rebuild_lock.acquire(blocking=False):
+        _rebuild_in_background(current_app._get_current_object())
+    return _index.lookup(prefix, limit)
@@ -0,0 +1,198 @@
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import and_, case, cast, func, Numeric
+from sqlalchemy.engine import Row
+from models import db, Product
+from utils.http_cache import catalog_versions, add_version_source, on_catalog_change
+
+# A discount is still active at its end instant; its price holds until just after it
+END_MARGIN_SECONDS = 0.001
+
+CENT = Decimal('0.01')
+
+# Seconds between checks of the 'discounts' version for discounts written by other processes
+VERSION_CHECK_SECONDS = 2
+
+ActiveDiscount = namedtuple('ActiveDiscount', 'name percentage start_date end_date')
+
+
+def _timestamp(value):
+    """Epoch seconds for a stored discount date; naive values are UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def discounted_price(price, percentage):
+    """price less percentage, rounded half up to cents like the SQL expressions below"""
+    price = Decimal(str(price))
+    return (price * (1 - Decimal(str(percentage)) / 100)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class ActiveDiscounts:
+    """
+    Discounts active between two discount boundaries, keyed by product_uuid.
+
+    Valid from the last start or end that has passed until the next one, so a set
+    built at any instant in between is the same set; valid_from doubles as an epoch
+    that changes exactly when effective prices do.
+    """
+
+    def __init__(self, discounts, valid_from, valid_until, version):
+        self.discounts = discounts
+        self.valid_from = valid_from
+        self.valid_until = valid_until
+        self.version = version
+        self.checked_at = time.monotonic()
+
+    @classmethod
+    def load(cls, version):
+        now = datetime.now(timezone.utc)
+        scheduled = db.session.query(Product).filter(Product.discount_percentage.isnot(None))
+        rows = scheduled.filter(_window_open(now)).with_entities(
+            Product.product_uuid,
+            Product.discount_name,
+            Product.discount_percentage,
+            Product.discount_start_date,
+            Product.discount_end_date
+        ).all()
+        next_start = scheduled.filter(Product.discount_start_date > now).with_entities(
+            func.min(Product.discount_start_date)
+        ).scalar()
+        last_start = scheduled.filter(Product.discount_start_date <= now).with_entities(
+            func.max(Product.discount_start_date)
+        ).scalar()
+        last_end = scheduled.filter(Product.discount_end_date < now).with_entities(
+            func.max(Product.discount_end_date)
+        ).scalar()
+
+        discounts = {
+            row.product_uuid: ActiveDiscount(
+                row.discount_name, row.discount_percentage, row.discount_start_date, row.discount_end_date
+            )
+            for row in rows
+        }
+        upcoming = [_timestamp(discount.end_date) + END_MARGIN_SECONDS for discount in discounts.values()]
+        if next_start is not None:
+            upcoming.append(_timestamp(next_start))
+        passed = [0.0]
+        if last_start is not None:
+            passed.append(_timestamp(last_start))
+        if last_end is not None:
+            passed.append(_timestamp(last_end) + END_MARGIN_SECONDS)
+        return cls(discounts, max(passed), min(upcoming, default=float('inf')), version)
+
+
+_active = None
+
+
+def active_discounts():
+    """
+    The cached set of active discounts.
+
+    Reloaded when the next discount boundary has passed, right after a discount
+    is written in this process, and when the 'discounts' catalog version shows
+    one was written in another. That version is read at most every
+    VERSION_CHECK_SECONDS, so hot paths like suggestions don't pay a query per call.
+    """
+    global _active
+    active = _active
+    if active is not None and time.time() < active.valid_until \
+            and time.monotonic() - active.checked_at < VERSION_CHECK_SECONDS:
+        return active
+
+    version = dict(catalog_versions(['discounts'])).get('discounts')
+    if active is None or active.version != version or time.time() >= active.valid_until:
+        active = ActiveDiscounts.load(version)
+        _active = active
+    else:
+        active.checked_at = time.monotonic()
+    return active
+
+
+def _discounts_changed(scopes):
+    global _active
+    if 'discounts' in scopes:
+        _active = None
+
+
+on_catalog_change(_discounts_changed)
+
+
+def pricing_epoch():
+    """Changes whenever effective prices may: at discount boundaries and when this process reloads the active set"""
+    active = active_discounts()
+    return f"{active.valid_from}:{active.version}"
+
+
+# Responses built from products carry prices, so their ETags and cache keys change at every boundary
+add_version_source('products', pricing_epoch)
+
+
+def active_discount(product_uuid):
+    """The discount active on a product right now, or None"""
+    return active_discounts().discounts.get(product_uuid)
+
+
+def shown_prices(product, price, compare_at_price):
+    """
+    (price, compare_at_price) to show for a product, or one of its variations or
+    options given their stored prices, at the discount active right now.
+
+    A discounted price is shown against the stored price it was taken off.
+    """
+    discount = active_discount(product.product_uuid)
+    if discount is None or price is None:
+        return price, compare_at_price
+    return discounted_price(price, discount.percentage), price
+
+
+def effective_price(product, price=None):
+    """What one unit sells for right now; price is a variation's or option's stored price, else the product's"""
+    return shown_prices(product, product.price if price is None else price, None)[0]
+
+
+def _window_open(now):
+    return and_(
+        Product.discount_percentage.isnot(None),
+        Product.discount_start_date <= now,
+        Product.discount_end_date >= now
+    )
+
+
+def effective_price_expression(now=None):
+    """SQL for the price a product sells for at now; cast first since Postgres only rounds numerics"""
+    now = now or datetime.now(timezone.utc)
+    return case(
+        (_window_open(now), func.round(cast(Product.price * (1 - Product.discount_percentage / 100.0), Numeric(12, 4)), 2)),
+        else_=Product.price
+    )
+
+
+def list_price_expression(now=None):
+    """SQL for the price shown struck through at now: the stored price while discounted, else compare_at_price"""
+    now = now or datetime.now(timezone.utc)
+    return case((_window_open(now), Product.price), else_=Product.compare_at_price)
+
+
+def discounted_expression(now=None):
+    """SQL that is true for products selling below the price shown struck through"""
+    now = now or datetime.now(timezone.utc)
+    list_price = list_price_expression(now)
+    return and_(list_price.isnot(None), list_price > effective_price_expression(now))
+
+
+def price_key(descending=False):
+    """Keyset key on the effective price; the cursor value is computed from the row like the SQL is"""
+    now = datetime.now(timezone.utc)
+
+    def getter(row):
+        product = row[0] if isinstance(row, Row) else row
+        if product.discount_percentage is not None and product.discount_start_date and product.discount_end_date \
+                and _timestamp(product.discount_start_date) <= now.timestamp() <= _timestamp(product.discount_end_date):
+            return discounted_price(product.price, product.discount_percentage)
+        return product.price
+
+    return effective_price_expression(now), descending, getter
@@ -0,0 +1,159 @@
+import io
+import csv
+import json
+import zlib
+from sqlalchemy import select
+from models import db, Product, ProductVariation, ProductVariationOption
+from utils.shipping_resolver import shipping_resolver
+
+# Columns of the bulk upload template, so an exported file can be uploaded again
+CSV_COLUMNS = (
+    'name', 'description', 'price', 'quantity', 'category_uuid', 'sku', 'brand', 'tags',
+    'specifications', 'variation_name', 'variation_values', 'main_image', 'additional_images',
+    'shipping_provider', 'shipping_rate', 'shipping_length', 'shipping_width', 'shipping_height',
+    'shipping_weight'
+)
+
+PRODUCT_COLUMNS = (
+    Product.product_uuid, Product.shop_uuid, Product.status, Product.name, Product.description,
+    Product.price, Product.quantity, Product.category_uuid, Product.sku, Product.brand, Product.tags,
+    Product.specifications, Product.main_image, Product._additional_images,
+    Product.shipping_provider_uuid, Product.shipping_rate_uuid, Product.shipping_length,
+    Product.shipping_width, Product.shipping_height, Product.shipping_weight
+)
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson')
+}
+
+
+def _number(value):
+    return str(value) if value is not None else ''
+
+
+def _images(value):
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    return value if isinstance(value, list) else []
+
+
+def _options(product_uuids):
+    """Variation options of a batch of products in one query, as {product_uuid: [(name, value, price, stock)]}"""
+    rows = db.session.execute(
+        select(
+            ProductVariation.product_uuid,
+            ProductVariation.price.label('variation_price'),
+            ProductVariationOption.name,
+            ProductVariationOption.value,
+            ProductVariationOption.price,
+            ProductVariationOption.stock
+        ).join(
+            ProductVariationOption, ProductVariationOption.variation_uuid == ProductVariation.variation_uuid
+        ).where(
+            ProductVariation.product_uuid.in_(product_uuids)
+        ).order_by(ProductVariation.product_uuid, ProductVariation.variation_uuid, ProductVariationOption.option_uuid)
+    )
+    options = {}
+    for row in rows:
+        price = row.price if row.price is not None else row.variation_price
+        options.setdefault(row.product_uuid, []).append((row.name, row.value, price, row.stock))
+    return options
+
+
+def export_records(query_filters, batch_rows=1000):
+    """
+    Yield (product row, options, shipping names) for every product matching the filters.
+
+    Products are read through a server-side cursor batch_rows at a time and each
+    batch's variation options in one more query, so memory stays flat however
+    large the catalog is.
+    """
+    resolver = shipping_resolver()
+    result = db.session.execute(
+        select(*PRODUCT_COLUMNS).where(*query_filters).order_by(Product.created_at, Product.product_uuid)
+        .execution_options(yield_per=batch_rows)
+    )
+    for batch in result.partitions():
+        options = _options([row.product_uuid for row in batch])
+        for row in batch:
+            yield row, options.get(row.product_uuid, []), resolver.names(row.shipping_provider_uuid, row.shipping_rate_uuid)
+
+
+def _csv_row(row, options, shipping):
+    specifications = row.specifications
+    if isinstance(specifications, dict):
+        specifications = '|'.join(f"{key}:{value}" for key, value in specifications.items())
+    return [
+        row.name, row.description, _number(row.price), _number(row.quantity), row.category_uuid,
+        row.sku or '', row.brand or '', row.tags or '', specifications or '',
+        options[0][0] if options else '',
+        '|'.join(f"{value}:{price}:{stock}" for _, value, price, stock in options),
+        row.main_image or '', '|'.join(_images(row._additional_images)),
+        shipping[0] or '', shipping[1] or '',
+        _number(row.shipping_length), _number(row.shipping_width), _number(row.shipping_height),
+        _number(row.shipping_weight)
+    ]
+
+
+def _ndjson_record(row, options, shipping):
+    return {
+        'product_uuid': row.product_uuid,
+        'shop_uuid': row.shop_uuid,
+        'status': row.status,
+        'name': row.name,
+        'description': row.description,
+        'price': float(row.price) if row.price is not None else None,
+        'quantity': row.quantity,
+        'category_uuid': row.category_uuid,
+        'sku': row.sku,
+        'brand': row.brand,
+        'tags': row.tags,
+        'specifications': row.specifications,
+        'variations': [
+            {'name': name, 'value': value, 'price': float(price) if price is not None else None, 'stock': stock}
+            for name, value, price, stock in options
+        ],
+        'main_image': row.main_image,
+        'additional_images': _images(row._additional_images),
+        'shipping_provider': shipping[0],
+        'shipping_rate': shipping[1],
+        'shipping_length': row.shipping_length,
+        'shipping_width': row.shipping_width,
+        'shipping_height': row.shipping_height,
+        'shipping_weight': row.shipping_weight
+    }
+
+
+def export_chunks(query_filters, export_format='csv', batch_rows=1000):
+    """The export as text chunks of about batch_rows products each"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == 'csv':
+        writer.writerow(CSV_COLUMNS)
+
+    count = 0
+    for row, options, shipping in export_records(query_filters, batch_rows):
+        if export_format == 'csv':
+            writer.writerow(_csv_row(row, options, shipping))
+        else:
+            buffer.write(json.dumps(_ndjson_record(row, options, shipping)) + '\n')
+        count += 1
+        if count % batch_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress text chunks into one gzip stream as they are produced"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
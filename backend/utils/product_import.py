@@ -0,0 +1,238 @@
+import uuid
+import pandas as pd
+from models import db, Product, ProductVariation, ProductVariationOption, Category
+from utils.http_cache import bump_catalog_versions
+from utils.catalog_snapshot import log_product_changes
+from utils.shipping_resolver import shipping_resolver
+
+REQUIRED_COLUMNS = ('name', 'description', 'price', 'category_uuid')
+
+SHIPPING_COLUMNS = ('shipping_length', 'shipping_width', 'shipping_height', 'shipping_weight')
+
+# Row errors kept in the report; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+
+class InvalidImportFile(ValueError):
+    """Raised when the file as a whole can't be imported, e.g. a required column is missing"""
+
+
+def _text(chunk, column):
+    if column not in chunk:
+        return pd.Series('', index=chunk.index)
+    return chunk[column].str.strip()
+
+
+def _number(chunk, column, default='0'):
+    """Column as floats, blanks as default; NaN where the value isn't a number"""
+    return pd.to_numeric(_text(chunk, column).replace('', default), errors='coerce')
+
+
+def _pairs(value):
+    """'key:value|key:value' as a dict"""
+    pairs = [pair.split(':') for pair in value.split('|')]
+    return {pair[0]: pair[1] for pair in pairs if len(pair) == 2} or None
+
+
+def _row_errors(chunk, checks):
+    """Messages per row index for every mask in checks that flags it"""
+    errors = {}
+    for mask, message in checks:
+        for index in chunk.index[mask.to_numpy()]:
+            errors.setdefault(index, []).append(message)
+    return errors
+
+
+class ProductImport:
+    """
+    Imports a bulk upload CSV in fixed-size chunks.
+
+    Each chunk is validated column-wise, written with one bulk INSERT per table and
+    committed, so memory stays flat however long the file is and a bad row only
+    costs its own error message. Row numbers in errors are file line numbers.
+
+    progress is the report of an earlier, interrupted run of the same file; the
+    rows it covers are skipped and its counts carried on.
+    """
+
+    def __init__(self, shop_uuid, seller_id, chunk_rows=1000, progress=None):
+        progress = progress or {}
+        self.shop_uuid = shop_uuid
+        self.seller_id = seller_id
+        self.chunk_rows = chunk_rows
+        self.rows_processed = progress.get('rows_processed', 0)
+        self.products_created = progress.get('products_created', 0)
+        self.error_count = progress.get('error_count', 0)
+        self.errors = list(progress.get('errors') or [])
+        self._shipping = None
+
+    def report(self):
+        return {
+            'rows_processed': self.rows_processed,
+            'products_created': self.products_created,
+            'error_count': self.error_count,
+            'errors': self.errors
+        }
+
+    def _error(self, index, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"Error in row {index + 2}: {message}")
+
+    def run(self, file, on_chunk=None, checkpoint=None):
+        """
+        Import every row of the CSV file object not yet processed; returns the report.
+
+        checkpoint(report) is called in each chunk's transaction just before it
+        commits, so progress saved there always matches the rows written.
+        on_chunk(product_uuids, report) is called after each chunk is committed.
+        """
+        skipped = self.rows_processed
+        # Providers and rates are resolved in memory, from one load for the whole import
+        self._shipping = shipping_resolver()
+        chunks = pd.read_csv(file, chunksize=self.chunk_rows, dtype=str, keep_default_na=False)
+        for chunk in chunks:
+            missing = [column for column in REQUIRED_COLUMNS if column not in chunk]
+            if missing:
+                raise InvalidImportFile(f"Missing required columns: {', '.join(missing)}")
+            # Rows are indexed across chunks; parse past the rows an earlier run processed
+            chunk = chunk[chunk.index >= skipped]
+            if chunk.empty:
+                continue
+            rows = self._validate_chunk(chunk)
+            self.rows_processed += len(chunk)
+            product_uuids = self._insert(rows, checkpoint)
+            if on_chunk:
+                on_chunk(product_uuids, self.report())
+        return self.report()
+
+    def _validate_chunk(self, chunk):
+        """Insert mappings for the chunk's valid rows; errors are recorded for the others"""
+        names = _text(chunk, 'name')
+        prices = _number(chunk, 'price', default='')
+        quantities = _number(chunk, 'quantity')
+        category_uuids = _text(chunk, 'category_uuid')
+        skus = _text(chunk, 'sku')
+        shipping = {column: _number(chunk, column) for column in SHIPPING_COLUMNS}
+
+        # Categories and SKUs are checked against the database in one query each
+        known_categories = {uuid for (uuid,) in db.session.query(Category.category_uuid).filter(
+            Category.category_uuid.in_(set(category_uuids))
+        )}
+        taken_skus = {sku for (sku,) in db.session.query(Product.sku).filter(
+            Product.sku.in_(set(skus) - {''})
+        )}
+
+        errors = _row_errors(chunk, [
+            (names == '', 'name is required'),
+            (names.str.len() > 255, 'name is longer than 255 characters'),
+            (_text(chunk, 'description') == '', 'description is required'),
+            (prices.isna() | (prices < 0), 'price must be a non-negative number'),
+            (quantities.isna() | (quantities < 0) | (quantities % 1 != 0), 'quantity must be a whole number'),
+            (~category_uuids.isin(known_categories), 'unknown category_uuid'),
+            ((skus != '') & skus.duplicated(), 'sku appears earlier in the file'),
+            (skus.isin(taken_skus), 'sku already exists'),
+            *[(values.isna() | (values < 0), f'{column} must be a non-negative number')
+              for column, values in shipping.items()]
+        ])
+
+        rows = []
+        for index, row in chunk.iterrows():
+            if index in errors:
+                self._error(index, '; '.join(errors[index]))
+                continue
+            try:
+                rows.append((index, *self._mappings(row, prices[index], quantities[index],
+                                                    {column: values[index] for column, values in shipping.items()})))
+            except (ValueError, IndexError) as e:
+                self._error(index, str(e))
+        return rows
+
+    def _mappings(self, row, price, quantity, shipping):
+        """Insert mappings for one valid row: (product, variations, options)"""
+        product_uuid = str(uuid.uuid4())
+        provider_uuid, rate = self._shipping.resolve(row.get('shipping_provider'), row.get('shipping_rate'))
+        weight = shipping['shipping_weight']
+        product = {
+            'product_uuid': product_uuid,
+            'shop_uuid': self.shop_uuid,
+            'seller_id': self.seller_id,
+            'name': row['name'].strip(),
+            'description': row['description'],
+            'price': price,
+            'quantity': int(quantity),
+            'category_uuid': row['category_uuid'].strip(),
+            'sku': row.get('sku', '').strip() or None,
+            'brand': row.get('brand') or None,
+            'tags': row.get('tags') or None,
+            'specifications': _pairs(row['specifications']) if row.get('specifications') else None,
+            'shipping_provider_uuid': provider_uuid,
+            'shipping_rate_uuid': rate.rate_uuid if rate else None,
+            **shipping,
+            'shipping_fee': rate.calculate_shipping_fee(weight) if rate and weight else None,
+            'main_image': row.get('main_image') or None,
+            '_additional_images': row['additional_images'].split('|') if row.get('additional_images') else []
+        }
+
+        variations, options = [], []
+        if row.get('variation_name') and row.get('variation_values'):
+            for value_str in row['variation_values'].split('|'):
+                value_parts = value_str.split(':')
+                if len(value_parts) >= 3:
+                    value, variation_price, stock = value_parts[:3]
+                    try:
+                        variation_price, stock = float(variation_price), int(stock)
+                    except ValueError:
+                        raise ValueError(f"invalid variation value '{value_str}', expected value:price:stock")
+                    variation_uuid = str(uuid.uuid4())
+                    variations.append({
+                        'variation_uuid': variation_uuid,
+                        'product_uuid': product_uuid,
+                        'price': variation_price,
+                        'quantity': stock
+                    })
+                    options.append({
+                        'option_uuid': str(uuid.uuid4()),
+                        'variation_uuid': variation_uuid,
+                        'name': row['variation_name'],
+                        'value': value,
+                        'stock': stock
+                    })
+        return product, variations, options
+
+    def _write(self, rows):
+        products = [product for _, product, _, _ in rows]
+        variations = [variation for _, _, row_variations, _ in rows for variation in row_variations]
+        options = [option for _, _, _, row_options in rows for option in row_options]
+        # Blank values are written as NULLs rather than left out, so rows with and
+        # without shipping, SKU etc. share one INSERT instead of splitting the batch
+        for model, mappings in ((Product, products), (ProductVariation, variations), (ProductVariationOption, options)):
+            if mappings:
+                db.session.bulk_insert_mappings(model, mappings, render_nulls=True)
+
+    def _insert(self, rows, checkpoint=None):
+        """Write the chunk's rows in one bulk INSERT per table; when that fails, row by row to find the bad ones"""
+        try:
+            self._write(rows)
+        except Exception:
+            db.session.rollback()
+            written = []
+            for row in rows:
+                try:
+                    with db.session.begin_nested():
+                        self._write([row])
+                    written.append(row)
+                except Exception as e:
+                    self._error(row[0], str(getattr(e, 'orig', e)))
+            rows = written
+
+        # Bulk inserts skip the session's flush hooks; tell caches and catalog snapshots directly
+        product_uuids = [row[1]['product_uuid'] for row in rows]
+        if product_uuids:
+            log_product_changes(product_uuids)
+            bump_catalog_versions('products')
+        self.products_created += len(product_uuids)
+        if checkpoint:
+            checkpoint(self.report())
+        db.session.commit()
+        return product_uuids
@@ -0,0 +1,54 @@
+from functools import wraps
+from flask import current_app, request, make_response
+from sqlalchemy import event
+from models import db
+
+
+class QueryCounter:
+    """Count the SQL statements executed on the app's engine inside a with block"""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+    def __enter__(self):
+        self.engine = db.engine
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+        return False
+
+
+def query_budget(limit):
+    """
+    Enforce a ceiling on the number of queries an endpoint may run.
+
+    Only active when QUERY_BUDGET_CHECKS is on: the count is sent back in an
+    X-Query-Count header and going over the budget is logged with the statements,
+    so a regression back to per-row queries shows up in development right away.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get('QUERY_BUDGET_CHECKS'):
+                return fn(*args, **kwargs)
+
+            with QueryCounter() as counter:
+                response = make_response(fn(*args, **kwargs))
+            response.headers['X-Query-Count'] = str(counter.count)
+            if counter.count > limit:
+                current_app.logger.warning(
+                    f"{request.method} {request.path} ran {counter.count} queries (budget {limit}):\n"
+                    + '\n'.join(counter.statements)
+                )
+            return response
+        # Read by the tests; functools.wraps carries it up through the other decorators
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
@@ -0,0 +1,252 @@
+from datetime import datetime, timedelta
+import numpy as np
+from scipy import sparse
+from flask import current_app
+from sqlalchemy import insert
+from models import (
+    db, Order, OrderItem, Wishlist, CartItem, Product,
+    ProductCoOccurrence, ProductRecommendation, JobWatermark
+)
+from utils.http_cache import bump_catalog_versions
+
+WATERMARK = 'co_purchase_recommendations'
+
+# Orders in these states never turned into a purchase
+EXCLUDED_ORDER_STATUSES = ('cancelled',)
+
+# Orders newer than this may still sit in uncommitted transactions; leave them for the next run
+SETTLE_SECONDS = 60
+
+# Keep IN (...) lists well below database parameter limits
+CHUNK_SIZE = 500
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _order_baskets(since=None, until=None):
+    """(order_uuid, product_uuid) pairs for purchases placed in (since, until]"""
+    query = db.session.query(OrderItem.order_uuid, OrderItem.product_uuid).join(
+        Order, Order.order_uuid == OrderItem.order_uuid
+    ).filter(Order.status.notin_(EXCLUDED_ORDER_STATUSES))
+    if since is not None:
+        query = query.filter(Order.created_at > since)
+    if until is not None:
+        query = query.filter(Order.created_at <= until)
+    return query.all()
+
+
+def _basket_matrix(pairs, index):
+    """Binary basket x product CSR matrix; index maps product_uuid to column"""
+    baskets = {}
+    rows = [baskets.setdefault(basket, len(baskets)) for basket, _ in pairs]
+    cols = [index[product_uuid] for _, product_uuid in pairs]
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float64), (rows, cols)),
+        shape=(len(baskets), len(index))
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = 1.0
+    return matrix
+
+
+def co_occurrence(sources):
+    """
+    Item-item co-occurrence from weighted basket sources.
+
+    sources is a list of (weight, [(basket_id, product_uuid), ...]). Returns
+    (C, products) where C = sum(weight * X.T @ X) is a symmetric CSR matrix whose
+    diagonal holds each product's own weighted basket count.
+    """
+    index = {}
+    for _, pairs in sources:
+        for _, product_uuid in pairs:
+            index.setdefault(product_uuid, len(index))
+
+    matrix = sparse.csr_matrix((len(index), len(index)), dtype=np.float64)
+    for weight, pairs in sources:
+        if weight and pairs:
+            baskets = _basket_matrix(pairs, index)
+            matrix = matrix + weight * (baskets.T @ baskets)
+    return matrix.tocsr(), list(index)
+
+
+def top_k_neighbours(matrix, products, rows, k):
+    """
+    Best k neighbours for the given row indices, scored by cosine-normalized co-occurrence.
+
+    Normalizing by sqrt(count_i * count_j) keeps best sellers from being every
+    product's top recommendation. Returns rows for product_recommendations.
+    """
+    diagonal = matrix.diagonal()
+    result = []
+    for row in rows:
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        columns = matrix.indices[start:end]
+        weights = matrix.data[start:end]
+        keep = (columns != row) & (weights > 0)
+        columns, weights = columns[keep], weights[keep]
+        if not len(columns):
+            continue
+        scores = weights / np.sqrt(np.maximum(diagonal[row] * diagonal[columns], 1e-12))
+        # Highest score first; raw co-occurrence, then product_uuid, break ties
+        uuids = np.array([products[column] for column in columns])
+        order = np.lexsort((uuids, -weights, -scores))[:k]
+        result.extend({
+            'product_uuid': products[row],
+            'rank': rank,
+            'recommended_uuid': products[columns[i]],
+            'score': float(scores[i])
+        } for rank, i in enumerate(order, start=1))
+    return result
+
+
+def _write_recommendations(product_uuids, rows):
+    for chunk in _chunks(product_uuids):
+        ProductRecommendation.query.filter(ProductRecommendation.product_uuid.in_(chunk)).delete(synchronize_session=False)
+    if rows:
+        db.session.execute(insert(ProductRecommendation), rows)
+
+
+def _set_watermark(value):
+    state = db.session.get(JobWatermark, WATERMARK)
+    if state is None:
+        state = JobWatermark(name=WATERMARK)
+        db.session.add(state)
+    state.watermark = value
+
+
+def rebuild_recommendations():
+    """Recompute co-occurrence and recommendations for the whole catalog"""
+    config = current_app.config
+    weights = config.get('RECOMMENDATION_SOURCE_WEIGHTS', {})
+    cutoff = datetime.utcnow() - timedelta(seconds=SETTLE_SECONDS)
+
+    sources = [(weights.get('orders', 1.0), _order_baskets(until=cutoff))]
+    if weights.get('wishlist'):
+        sources.append((weights['wishlist'], db.session.query(Wishlist.user_uuid, Wishlist.product_uuid).all()))
+    if weights.get('cart'):
+        sources.append((weights['cart'], db.session.query(CartItem.user_id, CartItem.product_uuid).all()))
+
+    matrix, products = co_occurrence(sources)
+    coo = matrix.tocoo()
+    pairs = [
+        {'product_uuid': products[i], 'other_uuid': products[j], 'weight': float(weight)}
+        for i, j, weight in zip(coo.row, coo.col, coo.data) if weight > 0
+    ]
+    recommendations = top_k_neighbours(matrix, products, range(len(products)), config.get('RECOMMENDATIONS_PER_PRODUCT', 12))
+
+    db.session.query(ProductCoOccurrence).delete(synchronize_session=False)
+    db.session.query(ProductRecommendation).delete(synchronize_session=False)
+    for chunk in _chunks(pairs, 5000):
+        db.session.execute(insert(ProductCoOccurrence), chunk)
+    for chunk in _chunks(recommendations, 5000):
+        db.session.execute(insert(ProductRecommendation), chunk)
+    bump_catalog_versions('recommendations')
+    _set_watermark(cutoff)
+    db.session.commit()
+    return len(products)
+
+
+def _load_co_occurrence(product_uuids):
+    """Stored co-occurrence rows for the products plus their neighbours' own counts, as a CSR matrix"""
+    rows = []
+    for chunk in _chunks(product_uuids):
+        rows.extend(db.session.query(
+            ProductCoOccurrence.product_uuid, ProductCoOccurrence.other_uuid, ProductCoOccurrence.weight
+        ).filter(ProductCoOccurrence.product_uuid.in_(chunk)).all())
+
+    neighbours = {other for _, other, _ in rows} - set(product_uuids)
+    for chunk in _chunks(neighbours):
+        rows.extend(db.session.query(
+            ProductCoOccurrence.product_uuid, ProductCoOccurrence.other_uuid, ProductCoOccurrence.weight
+        ).filter(
+            ProductCoOccurrence.product_uuid.in_(chunk),
+            ProductCoOccurrence.other_uuid == ProductCoOccurrence.product_uuid
+        ).all())
+
+    index = {}
+    for product_uuid, other_uuid, _ in rows:
+        index.setdefault(product_uuid, len(index))
+        index.setdefault(other_uuid, len(index))
+    matrix = sparse.csr_matrix(
+        ([weight for _, _, weight in rows],
+         ([index[a] for a, _, _ in rows], [index[b] for _, b, _ in rows])),
+        shape=(len(index), len(index))
+    )
+    return matrix, list(index), index
+
+
+def update_recommendations():
+    """
+    Fold orders placed since the last run into the stored co-occurrence counts.
+
+    Only products in the new orders and their neighbours are re-ranked. Wishlist
+    and cart signals are refreshed by the full rebuild, which also runs when the
+    job has never run.
+    """
+    state = db.session.get(JobWatermark, WATERMARK)
+    if state is None or state.watermark is None:
+        return rebuild_recommendations()
+
+    cutoff = datetime.utcnow() - timedelta(seconds=SETTLE_SECONDS)
+    pairs = _order_baskets(since=state.watermark, until=cutoff)
+    if not pairs:
+        _set_watermark(cutoff)
+        db.session.commit()
+        return 0
+
+    weight = current_app.config.get('RECOMMENDATION_SOURCE_WEIGHTS', {}).get('orders', 1.0)
+    delta, products = co_occurrence([(weight, pairs)])
+
+    # Merge the delta into the stored rows of every product that was bought
+    bought = set(products)
+    stored, stored_products, _ = _load_co_occurrence(products)
+    merged = {}
+    coo = stored.tocoo()
+    for i, j, value in zip(coo.row, coo.col, coo.data):
+        if stored_products[i] in bought:
+            merged[(stored_products[i], stored_products[j])] = float(value)
+    coo = delta.tocoo()
+    for i, j, value in zip(coo.row, coo.col, coo.data):
+        key = (products[i], products[j])
+        merged[key] = merged.get(key, 0.0) + float(value)
+
+    for chunk in _chunks(products):
+        ProductCoOccurrence.query.filter(ProductCoOccurrence.product_uuid.in_(chunk)).delete(synchronize_session=False)
+    db.session.execute(insert(ProductCoOccurrence), [
+        {'product_uuid': a, 'other_uuid': b, 'weight': value} for (a, b), value in merged.items()
+    ])
+
+    # A bought product's own count changes its neighbours' scores too, so re-rank both
+    affected = bought | {b for (_, b) in merged}
+    matrix, matrix_products, index = _load_co_occurrence(affected)
+    recommendations = top_k_neighbours(
+        matrix, matrix_products, [index[p] for p in affected if p in index],
+        current_app.config.get('RECOMMENDATIONS_PER_PRODUCT', 12)
+    )
+    _write_recommendations(affected, recommendations)
+    bump_catalog_versions('recommendations')
+    _set_watermark(cutoff)
+    db.session.commit()
+    return len(affected)
+
+
+def get_recommendations(product_uuid, limit=None):
+    """Ranked, currently purchasable recommendations for a product in one indexed query"""
+    query = Product.query.join(
+        ProductRecommendation, ProductRecommendation.recommended_uuid == Product.product_uuid
+    ).options(
+        db.lazyload(Product.shipping_provider),
+        db.lazyload(Product.shipping_rate)
+    ).filter(
+        ProductRecommendation.product_uuid == product_uuid,
+        Product.status == 'active',
+        Product.visibility == True
+    ).order_by(ProductRecommendation.rank)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
@@ -0,0 +1,215 @@
+import time
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import request, make_response, current_app
+from utils.http_cache import catalog_versions, on_catalog_change
+
+# Headers set per request by conditional_get or the server; never replayed from the cache
+_SKIP_HEADERS = {'content-length', 'etag', 'cache-control', 'set-cookie', 'date'}
+
+
+class MemoryCache:
+    """In-process LRU with a per-entry TTL"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, scopes, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, scopes=()):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, frozenset(scopes), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, scopes):
+        """Drop every entry built from any of the scopes"""
+        with self._lock:
+            for key in [key for key, (_, entry_scopes, _) in self._entries.items() if entry_scopes & scopes]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    """
+    Shared cache on a Redis-protocol server.
+
+    Keys embed the catalog scope versions, so after a write every worker and node
+    looks up new keys. Each entry's key is also added to a set per scope it was
+    built from, so evict() can drop the entries right away instead of waiting
+    for them to expire.
+
+    Entries are stored as a JSON line with the status and headers followed by the
+    raw body; nothing read back from the server is ever unpickled or executed.
+    """
+
+    def __init__(self, url, prefix='flaskify:page:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _scope_key(self, scope):
+        return f"{self.prefix}scope:{scope}"
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        meta, _, body = value.partition(b'\n')
+        meta = json.loads(meta)
+        return body, meta['status'], [tuple(header) for header in meta['headers']]
+
+    def set(self, key, value, ttl, scopes=()):
+        body, status, headers = value
+        ttl = max(int(ttl), 1)
+        meta = json.dumps({'status': status, 'headers': headers}).encode()
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, meta + b'\n' + body, ex=ttl)
+        for scope in scopes:
+            # Entries missed once a set expires are keyed on old versions and never read again
+            pipe.sadd(self._scope_key(scope), key)
+            pipe.expire(self._scope_key(scope), ttl)
+        pipe.execute()
+
+    def evict(self, scopes):
+        """Drop every entry built from any of the scopes, on every worker and node sharing the server"""
+        scope_keys = [self._scope_key(scope) for scope in scopes]
+        if not scope_keys:
+            return
+        keys = self.client.sunion(scope_keys)
+        pipe = self.client.pipeline()
+        if keys:
+            pipe.delete(*[self.prefix.encode() + key for key in keys])
+        pipe.delete(*scope_keys)
+        pipe.execute()
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class NullCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl, scopes=()):
+        pass
+
+    def evict(self, scopes):
+        pass
+
+    def clear(self):
+        pass
+
+
+_backend = NullCache()
+
+
+def get_backend():
+    return _backend
+
+
+def init_response_cache(app):
+    """Pick the backend from RESPONSE_CACHE_BACKEND ('memory', 'redis' or 'none')"""
+    global _backend
+    name = app.config.get('RESPONSE_CACHE_BACKEND', 'memory')
+    try:
+        if name == 'redis':
+            _backend = RedisCache(app.config['RESPONSE_CACHE_URL'])
+            _backend.client.ping()
+        elif name == 'memory':
+            _backend = MemoryCache(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+        else:
+            _backend = NullCache()
+    except Exception as e:
+        print(f"Error initializing {name} response cache, falling back to memory: {str(e)}")
+        _backend = MemoryCache(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+
+    on_catalog_change(evict_scopes)
+
+
+def evict_scopes(scopes):
+    """Drop cached pages built from the changed scopes; runs after every catalog commit"""
+    _backend.evict(set(scopes))
+
+
+def normalized_args():
+    """Query arguments sorted, stripped and without empty values, so equivalent URLs share an entry"""
+    return sorted(
+        (key, value.strip())
+        for key, value in request.args.items(multi=True)
+        if value.strip()
+    )
+
+
+def response_cache_key(scopes, validator=''):
+    key = f"{request.path}|{normalized_args()}|{catalog_versions(scopes)}|{validator}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def cached_response(*scopes, ttl=None, validator=None):
+    """
+    Serve successful GET responses from the response cache.
+
+    The key covers the path, the normalized query arguments, the versions of the
+    scopes the response is built from and the per-entity validator, as with
+    conditional_get, so a write to any of them is a cache miss.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return fn(*args, **kwargs)
+
+            try:
+                entity_version = validator(**kwargs) if validator else ''
+                if entity_version is None:
+                    return fn(*args, **kwargs)
+                key = response_cache_key(scopes, entity_version)
+                cached = _backend.get(key)
+            except Exception as e:
+                print(f"Error reading response cache: {str(e)}")
+                return fn(*args, **kwargs)
+
+            if cached is not None:
+                body, status, headers = cached
+                response = make_response(body, status)
+                response.headers.clear()
+                response.headers.extend(headers)
+                return response
+
+            response = make_response(fn(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                headers = [(name, value) for name, value in response.headers.items()
+                           if name.lower() not in _SKIP_HEADERS]
+                try:
+                    _backend.set(
+                        key,
+                        (response.get_data(), response.status_code, headers),
+                        ttl or current_app.config.get('RESPONSE_CACHE_TTL', 60),
+                        scopes
+                    )
+                except Exception as e:
+                    print(f"Error writing response cache: {str(e)}")
+            return response
+        return wrapper
+    return decorator
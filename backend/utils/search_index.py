@@ -0,0 +1,177 @@
+import re
+from sqlalchemy import text, bindparam, inspect, String, Float
+from sqlalchemy.exc import SQLAlchemyError
+from models import db
+
+# Backend in use for the current database: 'fts5' (SQLite), 'tsvector' (Postgres) or None
+_backend = None
+
+# Column weights used for ranking: name, brand, tags, category, description
+FTS5_WEIGHTS = (10.0, 4.0, 4.0, 3.0, 1.0)
+
+# Index tables by backend, the one listing indexed products first; created by the e8a2f5c3d719 migration
+INDEX_TABLES = {'fts5': ('product_search_docs', 'product_search'), 'tsvector': ('product_search',)}
+
+# Only active, visible products are searchable; everything else is removed from the index
+INDEXABLE_PRODUCTS = """
+    FROM products p
+    LEFT JOIN categories c ON c.category_uuid = p.category_uuid
+    LEFT JOIN categories pc ON pc.category_uuid = c.parent_id
+    {join}
+    WHERE p.status = 'active' AND p.visibility = {true}
+"""
+
+def init_search_index(app):
+    """Use the full-text index the migrations created for the configured database, and build it if it is empty"""
+    global _backend
+    dialect = db.engine.dialect.name
+    backend = {'sqlite': 'fts5', 'postgresql': 'tsvector'}.get(dialect)
+    if backend is None:
+        app.logger.info(f"Full-text search is not supported on {dialect}, using LIKE search")
+        return
+    try:
+        existing = inspect(db.engine)
+        if not all(existing.has_table(table) for table in INDEX_TABLES[backend]):
+            print("Search index tables missing (run flask db upgrade), falling back to LIKE search")
+            return
+        _backend = backend
+        if _index_is_empty():
+            rebuild_search_index()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Error building search index: {str(e)}")
+
+def is_available():
+    """Check whether the full-text index can be used for queries"""
+    return _backend is not None
+
+def _index_is_empty():
+    return db.session.execute(text(f"SELECT 1 FROM {INDEX_TABLES[_backend][0]} LIMIT 1")).first() is None
+
+def _indexable_products(extra_filter='', join=''):
+    true = '1' if _backend == 'fts5' else 'true'
+    return INDEXABLE_PRODUCTS.format(true=true, join=join) + extra_filter
+
+def rebuild_search_index():
+    """Drop and re-insert every searchable product"""
+    if not _backend:
+        return 0
+    if _backend == 'fts5':
+        db.session.execute(text("DELETE FROM product_search"))
+        db.session.execute(text("DELETE FROM product_search_docs"))
+    else:
+        db.session.execute(text("DELETE FROM product_search"))
+    count = _insert_documents()
+    db.session.commit()
+    return count
+
+def refresh_products(product_uuids):
+    """Re-index the given products, dropping the ones that are no longer searchable"""
+    product_uuids = [uuid for uuid in product_uuids if uuid]
+    if not _backend or not product_uuids:
+        return
+    params = {'uuids': product_uuids}
+    if _backend == 'fts5':
+        db.session.execute(text(
+            "DELETE FROM product_search WHERE rowid IN "
+            "(SELECT docid FROM product_search_docs WHERE product_uuid IN :uuids)"
+        ).bindparams(bindparam('uuids', expanding=True)), params)
+        db.session.execute(text(
+            "DELETE FROM product_search_docs WHERE product_uuid IN :uuids"
+        ).bindparams(bindparam('uuids', expanding=True)), params)
+    else:
+        db.session.execute(text(
+            "DELETE FROM product_search WHERE product_uuid IN :uuids"
+        ).bindparams(bindparam('uuids', expanding=True)), params)
+    _insert_documents(product_uuids)
+    db.session.commit()
+
+def refresh_category(category_uuid):
+    """Re-index products filed under a category or any of its descendants after it was renamed"""
+    if not _backend or not category_uuid:
+        return
+    from utils.category_tree import get_tree
+    category_ids = get_tree().descendant_ids(category_uuid, active_only=False) or {category_uuid}
+    product_uuids = db.session.execute(text(
+        "SELECT product_uuid FROM products WHERE category_uuid IN :category_ids"
+    ).bindparams(bindparam('category_ids', expanding=True)), {'category_ids': list(category_ids)}).scalars().all()
+    refresh_products(product_uuids)
+
+def _insert_documents(product_uuids=None):
+    extra_filter = ' AND p.product_uuid IN :uuids' if product_uuids else ''
+    params = {'uuids': product_uuids} if product_uuids else {}
+
+    if _backend == 'fts5':
+        docs = text(
+            "INSERT INTO product_search_docs (product_uuid) SELECT p.product_uuid "
+            + _indexable_products(extra_filter)
+        )
+        fts = text(
+            """
+            INSERT INTO product_search (rowid, name, brand, tags, category, description)
+            SELECT d.docid, p.name, coalesce(p.brand, ''), replace(coalesce(p.tags, ''), ',', ' '),
+                   coalesce(c.name, '') || ' ' || coalesce(pc.name, ''), coalesce(p.description, '')
+            """
+            + _indexable_products(extra_filter, join='JOIN product_search_docs d ON d.product_uuid = p.product_uuid')
+        )
+        if product_uuids:
+            docs = docs.bindparams(bindparam('uuids', expanding=True))
+            fts = fts.bindparams(bindparam('uuids', expanding=True))
+        result = db.session.execute(docs, params)
+        db.session.execute(fts, params)
+        return result.rowcount
+
+    statement = text(
+        """
+        INSERT INTO product_search (product_uuid, document)
+        SELECT p.product_uuid,
+               setweight(to_tsvector('simple', coalesce(p.name, '')), 'A') ||
+               setweight(to_tsvector('simple', coalesce(p.brand, '') || ' ' || replace(coalesce(p.tags, ''), ',', ' ')), 'B') ||
+               setweight(to_tsvector('simple', coalesce(c.name, '') || ' ' || coalesce(pc.name, '')), 'B') ||
+               setweight(to_tsvector('simple', coalesce(p.description, '')), 'C')
+        """
+        + _indexable_products(extra_filter)
+    )
+    if product_uuids:
+        statement = statement.bindparams(bindparam('uuids', expanding=True))
+    return db.session.execute(statement, params).rowcount
+
+def _tokenize(query_text):
+    return re.findall(r'\w+', (query_text or '').lower())
+
+def search_subquery(query_text):
+    """
+    Build a subquery of (product_uuid, rank) for products matching every term of query_text.
+
+    Terms are prefix-matched so partial words typed into the search box still match.
+    Higher rank means a better match. Returns None when the index can't serve the query,
+    in which case callers should fall back to LIKE matching.
+    """
+    tokens = _tokenize(query_text)
+    if not _backend or not tokens:
+        return None
+
+    if _backend == 'fts5':
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        weights = ', '.join(str(weight) for weight in FTS5_WEIGHTS)
+        statement = text(
+            f"""
+            SELECT d.product_uuid AS product_uuid, -bm25(product_search, {weights}) AS rank
+            FROM product_search
+            JOIN product_search_docs d ON d.docid = product_search.rowid
+            WHERE product_search MATCH :match
+            """
+        )
+    else:
+        match = ' & '.join(f'{token}:*' for token in tokens)
+        statement = text(
+            """
+            SELECT product_uuid, ts_rank_cd(document, to_tsquery('simple', :match)) AS rank
+            FROM product_search
+            WHERE document @@ to_tsquery('simple', :match)
+            """
+        )
+
+    return statement.bindparams(match=match).columns(
+        product_uuid=String, rank=Float
+    ).subquery('search_matches')
@@ -0,0 +1,168 @@
+from sqlalchemy import func
+from sqlalchemy.orm import load_only, selectinload, lazyload
+from models import db, Product, ProductVariation, Shop, Category
+from utils.pricing import active_discount
+
+
+def _discount_percentage(price, compare_at_price):
+    if compare_at_price and compare_at_price > price:
+        return round(((compare_at_price - price) / compare_at_price) * 100, 1)
+    return None
+
+
+def load_shops(shop_uuids):
+    """Fetch shops by uuid in one query, keyed by shop_uuid"""
+    shop_uuids = {uuid for uuid in shop_uuids if uuid}
+    if not shop_uuids:
+        return {}
+    return {shop.shop_uuid: shop for shop in Shop.query.filter(Shop.shop_uuid.in_(shop_uuids)).all()}
+
+
+def load_categories(category_uuids):
+    """Fetch categories and their parents in at most two queries, keyed by category_uuid"""
+    category_uuids = {uuid for uuid in category_uuids if uuid}
+    if not category_uuids:
+        return {}
+    categories = {
+        category.category_uuid: category
+        for category in Category.query.filter(Category.category_uuid.in_(category_uuids)).all()
+    }
+    parent_ids = {category.parent_id for category in categories.values() if category.parent_id} - set(categories)
+    if parent_ids:
+        categories.update({
+            category.category_uuid: category
+            for category in Category.query.filter(Category.category_uuid.in_(parent_ids)).all()
+        })
+    return categories
+
+
+def category_ref(category, categories):
+    """Minimal category reference with its parent's name, resolved from preloaded categories"""
+    parent = categories.get(category.parent_id) if category.parent_id else None
+    return {
+        'uuid': category.category_uuid,
+        'name': category.name,
+        'parent_name': parent.name if parent else None
+    }
+
+
+def serialize_category_refs(categories):
+    """Category references for a list of categories, loading missing parents in one query"""
+    loaded = {category.category_uuid: category for category in categories}
+    loaded.update(load_categories(
+        category.parent_id for category in categories if category.parent_id not in loaded
+    ))
+    return [category_ref(category, loaded) for category in categories]
+
+
+def count_active_products(shop_uuids):
+    """Active, visible product counts per shop in one grouped query"""
+    shop_uuids = list(shop_uuids)
+    if not shop_uuids:
+        return {}
+    rows = db.session.query(Product.shop_uuid, func.count(Product.product_uuid)).filter(
+        Product.shop_uuid.in_(shop_uuids),
+        Product.status == 'active',
+        Product.visibility == True
+    ).group_by(Product.shop_uuid).all()
+    return dict(rows)
+
+
+def serialize_product_cards(products, include_category=False):
+    """
+    Serialize products for listing pages.
+
+    Shops, categories and parent categories are loaded in a fixed number of batched
+    queries no matter how many products are on the page.
+    """
+    products = list(products)
+    shops = load_shops(product.shop_uuid for product in products)
+    categories = load_categories(product.category_uuid for product in products) if include_category else {}
+
+    cards = []
+    for product in products:
+        shop = shops.get(product.shop_uuid)
+        # Prices at the discount active now
+        price, compare_at_price = product.shown_prices()
+        discount = active_discount(product.product_uuid)
+        card = {
+            'product_uuid': product.product_uuid,
+            'name': product.name,
+            'price': price,
+            'compare_at_price': compare_at_price,
+            'discount_percentage': _discount_percentage(price, compare_at_price),
+            'discount_name': discount.name if discount else None,
+            'main_image': product.main_image,
+            'rating': round(product.rating or 0, 1),
+            'rating_count': product.rating_count or 0,
+            'total_sales': product.total_sales,
+            'quantity': product.quantity,
+            'shipping_fee': float(product.shipping_fee) if product.shipping_fee else 0,
+            'created_at': product.created_at.isoformat() if product.created_at else None,
+            'updated_at': product.updated_at.isoformat() if product.updated_at else None,
+            'shop': {
+                'shop_uuid': shop.shop_uuid,
+                'business_name': shop.business_name,
+                'business_city': shop.business_city,
+                'business_province': shop.business_province
+            } if shop else None
+        }
+        if include_category:
+            category = categories.get(product.category_uuid)
+            card['category'] = category_ref(category, categories) if category else None
+        cards.append(card)
+    return cards
+
+
+# Columns each derived to_dict key reads besides the column of the same name
+PRODUCT_FIELD_COLUMNS = {
+    'additional_images': ['_additional_images'],
+    'category_name': ['category_uuid'],
+    'compare_at_price': ['compare_at_price', 'price'],
+    'shipping_fee': ['shipping_fee', 'shipping_rate_uuid', 'shipping_weight'],
+}
+
+
+def parse_fieldset(value):
+    """Parse a comma-separated fields=/include= query argument; None when absent"""
+    if value is None:
+        return None
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+def product_load_options(fields=None, include=None):
+    """
+    Loader options matching a Product.to_dict(fields, include) call.
+
+    Only the columns behind the requested keys are loaded and every relationship that
+    will be serialized is fetched with selectinload, so serializing a page costs a fixed
+    number of queries. Relationships that won't be emitted are left unloaded.
+    """
+    include = set(Product.DICT_INCLUDES if include is None else include)
+    wanted = set(Product.DICT_FIELDS if fields is None else fields) & set(Product.DICT_FIELDS)
+
+    options = []
+    if fields is not None:
+        # Foreign keys of embedded relationships are needed to load them
+        columns = {'product_uuid', 'shop_uuid', 'shipping_provider_uuid', 'shipping_rate_uuid'}
+        for key in wanted:
+            columns.update(PRODUCT_FIELD_COLUMNS.get(key, [key]))
+        options.append(load_only(*[getattr(Product, column) for column in columns]))
+
+    if 'shop' in include:
+        options.append(selectinload(Product.shop))
+    if 'category_name' in wanted:
+        options.append(selectinload(Product.category))
+    if 'variations' in include or 'quantity' in wanted:
+        options.append(selectinload(Product.variations).selectinload(ProductVariation.options))
+
+    # The shipping relationships are joined eagerly by default; skip the joins when unused
+    if 'shipping_provider' in include:
+        options.append(selectinload(Product.shipping_provider))
+    else:
+        options.append(lazyload(Product.shipping_provider))
+    if 'shipping_rate' in include or 'shipping_fee' in wanted:
+        options.append(selectinload(Product.shipping_rate))
+    else:
+        options.append(lazyload(Product.shipping_rate))
+    return options
@@ -0,0 +1,116 @@
+import re
+from models import db, ShippingProvider, ShippingRate
+from utils.http_cache import catalog_versions
+
+
+def normalize(name):
+    """Case- and whitespace-insensitive form of a provider or rate name"""
+    return re.sub(r'\s+', ' ', str(name or '')).strip().casefold()
+
+
+class _Index:
+    """Providers, or one provider's rates, by uuid and by normalized name"""
+
+    def __init__(self, items, uuid_of):
+        self.items = sorted(items, key=lambda item: normalize(item.name))
+        self.by_uuid = {uuid_of(item): item for item in self.items}
+        self.by_name = {}
+        for item in self.items:
+            self.by_name.setdefault(normalize(item.name), item)
+
+    def match(self, value):
+        """Item by uuid, then by normalized name, then the first whose normalized name contains the value"""
+        value = str(value or '').strip()
+        if not value:
+            return None
+        if value in self.by_uuid:
+            return self.by_uuid[value]
+        key = normalize(value)
+        if key in self.by_name:
+            return self.by_name[key]
+        return next((item for item in self.items if key in normalize(item.name)), None)
+
+
+class ShippingResolver:
+    """
+    Every shipping provider and rate, indexed to resolve the names given in uploads.
+
+    Providers and rates are detached copies loaded in two queries, so resolving
+    any number of rows costs no further queries; rates can still compute fees.
+    """
+
+    def __init__(self, providers, rates, version):
+        self.version = version
+        self.providers = _Index(providers, lambda provider: provider.provider_uuid)
+        provider_rates = {}
+        for rate in rates:
+            provider_rates.setdefault(rate.provider_uuid, []).append(rate)
+        self.provider_rates = {
+            provider_uuid: _Index(items, lambda rate: rate.rate_uuid)
+            for provider_uuid, items in provider_rates.items()
+        }
+
+    @classmethod
+    def load(cls, version):
+        providers = [
+            ShippingProvider(**row._asdict())
+            for row in db.session.query(ShippingProvider).with_entities(
+                ShippingProvider.provider_uuid,
+                ShippingProvider.name,
+                ShippingProvider.is_active
+            )
+        ]
+        rates = [
+            ShippingRate(**row._asdict())
+            for row in db.session.query(ShippingRate).with_entities(
+                ShippingRate.rate_uuid,
+                ShippingRate.provider_uuid,
+                ShippingRate.name,
+                ShippingRate.base_rate,
+                ShippingRate.weight_rate,
+                ShippingRate.min_weight,
+                ShippingRate.max_weight,
+                ShippingRate.is_active
+            )
+        ]
+        return cls(providers, rates, version)
+
+    def resolve(self, provider_name, rate_name):
+        """
+        (provider_uuid, rate) for a provider and rate given by uuid or name.
+
+        Names match exactly after normalizing case and whitespace, falling back to
+        the first name containing the given one. The rate is looked up among the
+        provider's own rates only; either is None when nothing matches.
+        """
+        provider = self.providers.match(provider_name)
+        if provider is None:
+            return None, None
+        rates = self.provider_rates.get(provider.provider_uuid)
+        return provider.provider_uuid, rates.match(rate_name) if rates else None
+
+    def names(self, provider_uuid, rate_uuid):
+        """(provider name, rate name) for stored uuids, in the form resolve() takes them back"""
+        provider = self.providers.by_uuid.get(provider_uuid)
+        rates = self.provider_rates.get(provider_uuid)
+        rate = rates.by_uuid.get(rate_uuid) if rates else None
+        return provider.name if provider else None, rate.name if rate else None
+
+
+_resolver = None
+
+
+def shipping_resolver():
+    """
+    The cached shipping resolver.
+
+    Reloaded when the 'shipping' catalog version shows a provider or rate was
+    written, in this or another process; the version is read once per request.
+    """
+    global _resolver
+    version = dict(catalog_versions(['shipping'])).get('shipping')
+    resolver = _resolver
+    if resolver is None or resolver.version != version:
+        resolver = ShippingResolver.load(version)
+        _resolver = resolver
+    return resolver
@@ -0,0 +1,218 @@
+import zlib
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from scipy import sparse
+from flask import current_app
+from sqlalchemy import insert
+from models import db, Product, ProductSimilarity, JobWatermark
+from utils.prefix_index import normalize
+from utils.category_tree import get_tree
+from utils.http_cache import bump_catalog_versions
+
+WATERMARK = 'similar_products'
+
+# Hashed feature space; collisions at this size barely move cosine scores
+N_FEATURES = 2 ** 18
+
+# Rows scored per matrix product when computing neighbours
+BATCH_SIZE = 256
+
+# Repeat name and brand tokens so they outweigh long descriptions
+FIELD_WEIGHTS = {'name': 3, 'brand': 2, 'tags': 2, 'category': 2, 'description': 1}
+
+# When more than this share of the catalog changed, re-rank everything instead of the affected lists
+REBUILD_FRACTION = 0.2
+
+# Products updated this recently may still sit in uncommitted transactions; leave them for the next run
+SETTLE_SECONDS = 5
+
+
+def _features(product, category_path):
+    """Hashed unigram and bigram tokens for a product, prefixed by field"""
+    fields = {
+        'name': product.name,
+        'brand': product.brand,
+        'tags': ' '.join((product.tags or '').split(',')),
+        'category': ' '.join(category_path or ()),
+        'description': product.description,
+    }
+    features = []
+    for field, value in fields.items():
+        words = normalize(value).split()
+        tokens = words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+        # Brand and category tokens keep their field so "apple" the brand differs from "apple" in a name
+        prefix = f'{field}:' if field in ('brand', 'category') else ''
+        for token in tokens:
+            features.extend([zlib.crc32(f'{prefix}{token}'.encode()) % N_FEATURES] * FIELD_WEIGHTS[field])
+    return features
+
+
+def _corpus():
+    """Active, visible products and their L2-normalized TF-IDF rows"""
+    products = Product.query.options(
+        db.load_only(Product.product_uuid, Product.name, Product.description, Product.brand,
+                     Product.tags, Product.category_uuid),
+        db.lazyload(Product.shipping_provider),
+        db.lazyload(Product.shipping_rate)
+    ).filter(
+        Product.status == 'active',
+        Product.visibility == True
+    ).order_by(Product.product_uuid).all()
+
+    tree = get_tree()
+    rows, cols = [], []
+    for row, product in enumerate(products):
+        features = _features(product, tree.path(product.category_uuid))
+        rows.extend([row] * len(features))
+        cols.extend(features)
+
+    counts = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float64), (rows, cols)),
+        shape=(len(products), N_FEATURES)
+    )
+    counts.sum_duplicates()
+
+    # Sublinear tf and smoothed idf
+    document_frequency = np.bincount(counts.indices, minlength=N_FEATURES)
+    idf = np.log((1 + len(products)) / (1 + document_frequency)) + 1
+    counts.data = (1 + np.log(counts.data)) * idf[counts.indices]
+
+    norms = np.sqrt(np.asarray(counts.multiply(counts).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = sparse.diags(1 / norms) @ counts
+    return [product.product_uuid for product in products], matrix.tocsr()
+
+
+def _neighbours(matrix, product_uuids, rows, k):
+    """Top-k cosine neighbours for the given rows, scored a batch at a time"""
+    result = []
+    rows = list(rows)
+    transposed = matrix.T.tocsc()
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        scores = (matrix[batch] @ transposed).toarray()
+        scores[np.arange(len(batch)), batch] = 0
+        for offset, row in enumerate(batch):
+            row_scores = scores[offset]
+            candidates = np.flatnonzero(row_scores > 0)
+            if not len(candidates):
+                continue
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-row_scores[candidates], k - 1)[:k]]
+            # Highest score first, product_uuid breaks ties
+            ordered = candidates[np.lexsort((candidates, -row_scores[candidates]))]
+            result.extend({
+                'product_uuid': product_uuids[row],
+                'rank': rank,
+                'similar_uuid': product_uuids[column],
+                'score': float(row_scores[column])
+            } for rank, column in enumerate(ordered, start=1))
+    return result
+
+
+def _best_scores(matrix, columns):
+    """Each row's highest cosine score against any of the given rows, BATCH_SIZE of them per matrix product"""
+    best = np.zeros(matrix.shape[0])
+    for start in range(0, len(columns), BATCH_SIZE):
+        scores = (matrix @ matrix[columns[start:start + BATCH_SIZE]].T).max(axis=1)
+        np.maximum(best, scores.toarray().ravel(), out=best)
+    return best
+
+
+def _set_watermark(value):
+    state = db.session.get(JobWatermark, WATERMARK)
+    if state is None:
+        state = JobWatermark(name=WATERMARK)
+        db.session.add(state)
+    state.watermark = value
+
+
+def rebuild_similar_products():
+    """Recompute similar items for the whole catalog"""
+    cutoff = datetime.utcnow() - timedelta(seconds=SETTLE_SECONDS)
+    product_uuids, matrix = _corpus()
+    rows = _neighbours(matrix, product_uuids, range(len(product_uuids)),
+                       current_app.config.get('SIMILAR_PRODUCTS_PER_PRODUCT', 12))
+
+    db.session.query(ProductSimilarity).delete(synchronize_session=False)
+    for start in range(0, len(rows), 5000):
+        db.session.execute(insert(ProductSimilarity), rows[start:start + 5000])
+    bump_catalog_versions('recommendations')
+    _set_watermark(cutoff)
+    db.session.commit()
+    return len(product_uuids)
+
+
+def update_similar_products():
+    """
+    Re-rank products created or updated since the last run, and the products whose lists they enter or leave.
+
+    The corpus is re-vectorized so IDF stays current, but neighbours are only
+    scored for the affected rows; lists left alone keep scores from the older IDF
+    until the periodic full rebuild. When more than REBUILD_FRACTION of the
+    catalog changed, the whole catalog is rebuilt instead.
+    """
+    state = db.session.get(JobWatermark, WATERMARK)
+    if state is None or state.watermark is None:
+        return rebuild_similar_products()
+
+    cutoff = datetime.utcnow() - timedelta(seconds=SETTLE_SECONDS)
+    # New products have no updated_at until their first edit
+    last_changed = db.func.coalesce(Product.updated_at, Product.created_at)
+    changed = {uuid for (uuid,) in db.session.query(Product.product_uuid).filter(
+        last_changed > state.watermark.replace(tzinfo=timezone.utc),
+        last_changed <= cutoff.replace(tzinfo=timezone.utc)
+    ).all()}
+    if not changed:
+        _set_watermark(cutoff)
+        db.session.commit()
+        return 0
+
+    k = current_app.config.get('SIMILAR_PRODUCTS_PER_PRODUCT', 12)
+    product_uuids, matrix = _corpus()
+    index = {uuid: row for row, uuid in enumerate(product_uuids)}
+    changed_rows = [index[uuid] for uuid in changed if uuid in index]
+    if len(changed_rows) > REBUILD_FRACTION * len(product_uuids):
+        return rebuild_similar_products()
+
+    # Lists that currently hold a changed product, and lists a changed product now beats the tail of
+    affected = changed | {uuid for (uuid,) in db.session.query(ProductSimilarity.product_uuid).filter(
+        ProductSimilarity.similar_uuid.in_(changed)
+    ).distinct().all()}
+    if changed_rows:
+        tails = dict(db.session.query(ProductSimilarity.product_uuid, db.func.min(ProductSimilarity.score)).group_by(
+            ProductSimilarity.product_uuid
+        ).having(db.func.count() >= k).all())
+        threshold = np.array([tails.get(uuid, 0.0) for uuid in product_uuids])
+        scores = _best_scores(matrix, changed_rows)
+        affected |= {product_uuids[row] for row in np.flatnonzero(scores > threshold)}
+
+    rows = _neighbours(matrix, product_uuids, [index[uuid] for uuid in affected if uuid in index], k)
+    affected = list(affected)
+    for start in range(0, len(affected), 500):
+        ProductSimilarity.query.filter(
+            ProductSimilarity.product_uuid.in_(affected[start:start + 500])
+        ).delete(synchronize_session=False)
+    if rows:
+        db.session.execute(insert(ProductSimilarity), rows)
+    bump_catalog_versions('recommendations')
+    _set_watermark(cutoff)
+    db.session.commit()
+    return len(affected)
+
+
+def get_similar_products(product_uuid, limit=None):
+    """Ranked similar items that are still for sale, in one indexed query"""
+    query = Product.query.join(
+        ProductSimilarity, ProductSimilarity.similar_uuid == Product.product_uuid
+    ).options(
+        db.lazyload(Product.shipping_provider),
+        db.lazyload(Product.shipping_rate)
+    ).filter(
+        ProductSimilarity.product_uuid == product_uuid,
+        Product.status == 'active',
+        Product.visibility == True
+    ).order_by(ProductSimilarity.rank)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
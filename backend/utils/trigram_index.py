@@ -0,0 +1,240 @@
+import time
+from sqlalchemy import text, bindparam, inspect, select, literal, union_all, String, Float
+from sqlalchemy.exc import SQLAlchemyError
+from models import db
+from utils.prefix_index import normalize
+
+# Backend in use: 'pg_trgm' (Postgres extension), 'table' (self-maintained trigram tables) or None
+_backend = None
+
+# Minimum similarity for a fuzzy match; a little under pg_trgm's 0.3 default so a swapped
+# pair of letters ("iphnoe" vs "iphone", 0.27) still matches
+THRESHOLD = 0.25
+
+# Fuzzy lookups give up and return nothing after this long
+TIMEOUT_MS = 150
+
+# Only the longest query words are matched, to bound the work per query
+MAX_QUERY_WORDS = 5
+
+# Fallback tables for databases without pg_trgm; created by the a6f3d8b2c915 migration
+TABLE_NAMES = ('search_trigram_terms', 'search_trigrams')
+
+# Text indexed per kind; products follow the full-text index and only cover searchable ones
+SOURCES = {
+    'product': """
+        SELECT product_uuid, name || ' ' || coalesce(brand, '') FROM products
+        WHERE status = 'active' AND visibility = {true}
+    """,
+    'category': "SELECT category_uuid, name FROM categories WHERE 1 = 1",
+    'shop': "SELECT shop_uuid, business_name FROM shops WHERE 1 = 1",
+}
+SOURCE_KEYS = {'product': 'product_uuid', 'category': 'category_uuid', 'shop': 'shop_uuid'}
+
+# pg_trgm word similarity of the query against each kind's text
+POSTGRES_MATCHES = {
+    'product': """
+        SELECT product_uuid, GREATEST(word_similarity(:q, lower(name)), word_similarity(:q, lower(coalesce(brand, '')))) AS score
+        FROM products
+        WHERE status = 'active' AND visibility = true
+          AND (:q <% lower(name) OR :q <% lower(coalesce(brand, '')))
+    """,
+    'category': "SELECT category_uuid, word_similarity(:q, lower(name)) AS score FROM categories WHERE :q <% lower(name)",
+    'shop': "SELECT shop_uuid, word_similarity(:q, lower(business_name)) AS score FROM shops WHERE :q <% lower(business_name)",
+}
+
+
+def trigrams(word):
+    """pg_trgm-style trigrams: the word padded with two spaces in front and one behind"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _words(value):
+    return {word for word in normalize(value).split() if len(word) > 1}
+
+
+def init_trigram_index(app):
+    """Use pg_trgm on Postgres, otherwise the trigram tables the migrations created, filling them if empty"""
+    global _backend
+    _backend = None
+    try:
+        if db.engine.dialect.name == 'postgresql':
+            if db.session.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is None:
+                print("pg_trgm is not installed (run flask db upgrade), fuzzy search disabled")
+                return
+            _backend = 'pg_trgm'
+            return
+
+        existing = inspect(db.engine)
+        if not all(existing.has_table(table) for table in TABLE_NAMES):
+            print("Trigram tables missing (run flask db upgrade), fuzzy search disabled")
+            return
+        _backend = 'table'
+        if db.session.execute(text("SELECT 1 FROM search_trigram_terms LIMIT 1")).first() is None:
+            rebuild_trigram_index()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        _backend = None
+        print(f"Error building trigram index: {str(e)}")
+
+
+def is_available():
+    return _backend is not None
+
+
+def rebuild_trigram_index():
+    """Re-index every product, category and shop (trigram tables only; pg_trgm needs no upkeep)"""
+    if _backend != 'table':
+        return 0
+    db.session.execute(text("DELETE FROM search_trigrams"))
+    db.session.execute(text("DELETE FROM search_trigram_terms"))
+    count = sum(_insert_terms(kind) for kind in SOURCES)
+    db.session.commit()
+    return count
+
+
+def refresh(kind, uuids):
+    """Re-index the given products, categories or shops after they were created, renamed or removed"""
+    uuids = [uuid for uuid in uuids if uuid]
+    if _backend != 'table' or not uuids:
+        return
+    params = {'kind': kind, 'uuids': uuids}
+    db.session.execute(text(
+        "DELETE FROM search_trigrams WHERE kind = :kind AND term_id IN "
+        "(SELECT term_id FROM search_trigram_terms WHERE kind = :kind AND ref_uuid IN :uuids)"
+    ).bindparams(bindparam('uuids', expanding=True)), params)
+    db.session.execute(text(
+        "DELETE FROM search_trigram_terms WHERE kind = :kind AND ref_uuid IN :uuids"
+    ).bindparams(bindparam('uuids', expanding=True)), params)
+    _insert_terms(kind, uuids)
+    db.session.commit()
+
+
+def _insert_terms(kind, uuids=None):
+    true = 'true' if db.engine.dialect.name == 'postgresql' else '1'
+    statement = SOURCES[kind].format(true=true)
+    params = {}
+    if uuids:
+        statement += f" AND {SOURCE_KEYS[kind]} IN :uuids"
+        params['uuids'] = uuids
+    query = text(statement)
+    if uuids:
+        query = query.bindparams(bindparam('uuids', expanding=True))
+    rows = db.session.execute(query, params).all()
+
+    terms = [
+        {'kind': kind, 'ref_uuid': ref_uuid, 'term': word, 'trigram_count': len(trigrams(word))}
+        for ref_uuid, value in rows for word in _words(value)
+    ]
+    if not terms:
+        return 0
+    db.session.execute(text(
+        "INSERT INTO search_trigram_terms (kind, ref_uuid, term, trigram_count) "
+        "VALUES (:kind, :ref_uuid, :term, :trigram_count)"
+    ), terms)
+
+    # Read the new ids back to write the trigram postings
+    ref_uuids = list({term['ref_uuid'] for term in terms})
+    postings = []
+    for start in range(0, len(ref_uuids), 500):
+        for term_id, term in db.session.execute(text(
+            "SELECT term_id, term FROM search_trigram_terms WHERE kind = :kind AND ref_uuid IN :uuids"
+        ).bindparams(bindparam('uuids', expanding=True)), {'kind': kind, 'uuids': ref_uuids[start:start + 500]}):
+            postings.extend({'kind': kind, 'trigram': trigram, 'term_id': term_id} for trigram in trigrams(term))
+    db.session.execute(text(
+        "INSERT INTO search_trigrams (kind, trigram, term_id) VALUES (:kind, :trigram, :term_id)"
+    ), postings)
+    return len(rows)
+
+
+class _Deadline:
+    """Abort the statements run inside the block once TIMEOUT_MS has passed"""
+
+    def __init__(self, timeout_ms):
+        self.timeout_ms = timeout_ms
+
+    def __enter__(self):
+        connection = db.session.connection()
+        if _backend == 'pg_trgm':
+            connection.execute(text(f"SET LOCAL statement_timeout = {max(int(self.timeout_ms), 1)}"))
+        else:
+            self.raw = connection.connection.driver_connection
+            if hasattr(self.raw, 'set_progress_handler'):
+                deadline = time.monotonic() + self.timeout_ms / 1000
+                self.raw.set_progress_handler(lambda: int(time.monotonic() > deadline), 1000)
+        return self
+
+    def __exit__(self, *exc):
+        if _backend == 'pg_trgm':
+            db.session.connection().execute(text("RESET statement_timeout"))
+        elif hasattr(self.raw, 'set_progress_handler'):
+            self.raw.set_progress_handler(None, 1000)
+        return False
+
+
+def fuzzy_matches(query_text, kind, limit=20, threshold=THRESHOLD, timeout_ms=TIMEOUT_MS):
+    """
+    (uuid, score) pairs whose text resembles query_text, best first.
+
+    Scores are the average over query words of the best trigram similarity with
+    any word of the text. Returns an empty list when the index is unavailable or
+    the lookup runs past its time budget.
+    """
+    words = sorted(_words(query_text), key=len, reverse=True)[:MAX_QUERY_WORDS]
+    if not _backend or not words:
+        return []
+
+    try:
+        with db.session.begin_nested():
+            with _Deadline(timeout_ms):
+                if _backend == 'pg_trgm':
+                    db.session.execute(text("SELECT set_config('pg_trgm.word_similarity_threshold', :t, true)"),
+                                       {'t': str(threshold)})
+                    rows = db.session.execute(
+                        text(POSTGRES_MATCHES[kind] + " ORDER BY score DESC LIMIT :limit"),
+                        {'q': ' '.join(words), 'limit': limit}
+                    ).all()
+                    return [(uuid, float(score)) for uuid, score in rows]
+
+                totals = {}
+                for word in words:
+                    grams = trigrams(word)
+                    best = {}
+                    for ref_uuid, shared, count in db.session.execute(text(
+                        """
+                        SELECT t.ref_uuid, COUNT(*) AS shared, t.trigram_count
+                        FROM search_trigrams g
+                        JOIN search_trigram_terms t ON t.term_id = g.term_id
+                        WHERE g.kind = :kind AND g.trigram IN :grams
+                        GROUP BY t.term_id, t.ref_uuid, t.trigram_count
+                        """
+                    ).bindparams(bindparam('grams', expanding=True)), {'kind': kind, 'grams': list(grams)}):
+                        similarity = shared / (count + len(grams) - shared)
+                        if similarity > best.get(ref_uuid, 0):
+                            best[ref_uuid] = similarity
+                    for ref_uuid, similarity in best.items():
+                        totals[ref_uuid] = totals.get(ref_uuid, 0) + similarity
+    except SQLAlchemyError as e:
+        print(f"Fuzzy search gave up: {str(e)}")
+        return []
+
+    scored = [(uuid, total / len(words)) for uuid, total in totals.items() if total / len(words) >= threshold]
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:limit]
+
+
+def fuzzy_subquery(query_text, limit=200):
+    """
+    Subquery of (product_uuid, rank) for products fuzzily matching query_text.
+
+    Same shape as search_index.search_subquery so callers can swap it in when
+    the full-text index finds nothing; None when nothing matches.
+    """
+    matches = fuzzy_matches(query_text, 'product', limit=limit)
+    if not matches:
+        return None
+    return union_all(*[
+        select(literal(uuid, String).label('product_uuid'), literal(score, Float).label('rank'))
+        for uuid, score in matches
+    ]).subquery('search_matches')
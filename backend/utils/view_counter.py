@@ -0,0 +1,196 @@
+import os
+import time
+import atexit
+import hashlib
+import threading
+from collections import Counter
+from functools import wraps
+from flask import request, make_response, current_app
+from flask_login import current_user
+from sqlalchemy import update, bindparam, func
+from models import db, Product
+from utils.catalog_snapshot import log_product_changes
+
+
+class ViewCounter:
+    """
+    Write-behind buffer for product views.
+
+    Views are coalesced per product in memory and written with one batched
+    UPDATE per flush, so hot products don't turn every page view into a row
+    lock. A viewer counts once per product within the dedupe window.
+    """
+
+    def __init__(self, dedupe_seconds=1800):
+        self.dedupe_seconds = dedupe_seconds
+        self._pending = Counter()
+        self._seen = {}
+        self._oldest_pending = None
+        self._flushing = False
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+        self.last_flush_at = None
+        self.last_flush_lag = None
+        self.last_flush_count = 0
+
+    def record(self, product_uuid, viewer):
+        """Count a view unless this viewer already viewed the product within the window"""
+        now = time.monotonic()
+        key = (viewer, product_uuid)
+        with self._lock:
+            seen_at = self._seen.get(key)
+            if seen_at is not None and now - seen_at < self.dedupe_seconds:
+                return False
+            self._seen[key] = now
+            self._pending[product_uuid] += 1
+            if self._oldest_pending is None:
+                self._oldest_pending = now
+            return True
+
+    def claim_flush(self, interval):
+        """True, once, when the oldest buffered view has waited interval seconds; the caller must then flush"""
+        with self._lock:
+            if self._flushing or self._oldest_pending is None or time.monotonic() - self._oldest_pending < interval:
+                return False
+            self._flushing = True
+            return True
+
+    def start_flusher(self, app, interval):
+        """
+        Start this process's flush thread, unless it is already running.
+
+        Called on every recorded view rather than at startup, so each forked
+        worker gets a thread of its own; the thread flushes the buffer once the
+        oldest view has waited interval seconds, whether or not requests come in.
+        """
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            # A buffer inherited through fork was the parent's to flush
+            self._flushing = False
+        threading.Thread(target=self._run_flusher, args=(app, interval), name='view-flusher', daemon=True).start()
+
+    def _run_flusher(self, app, interval):
+        tick = max(min(interval, 5), 0.1)
+        while True:
+            time.sleep(tick)
+            if self.claim_flush(interval):
+                flush_views(app)
+
+    def _take(self):
+        now = time.monotonic()
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            oldest, self._oldest_pending = self._oldest_pending, None
+            self._seen = {key: seen_at for key, seen_at in self._seen.items()
+                          if now - seen_at < self.dedupe_seconds}
+        return pending, oldest
+
+    def _restore(self, pending, oldest):
+        with self._lock:
+            self._pending.update(pending)
+            if oldest is not None and (self._oldest_pending is None or oldest < self._oldest_pending):
+                self._oldest_pending = oldest
+
+    def flush(self):
+        """Write the buffered increments in one batched UPDATE; returns the number of products updated"""
+        try:
+            return self._flush()
+        finally:
+            self._flushing = False
+
+    def _flush(self):
+        pending, oldest = self._take()
+        if not pending:
+            return 0
+
+        statement = update(Product).where(
+            Product.product_uuid == bindparam('b_product_uuid')
+        ).values(
+            view_count=func.coalesce(Product.view_count, 0) + bindparam('b_views'),
+            # A view isn't an edit; keep updated_at's onupdate from firing
+            updated_at=Product.updated_at
+        ).execution_options(synchronize_session=False)
+        try:
+            connection = db.session.connection()
+            connection.execute(statement, [
+                {'b_product_uuid': product_uuid, 'b_views': views}
+                for product_uuid, views in pending.items()
+            ])
+            log_product_changes(list(pending), connection=connection)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self._restore(pending, oldest)
+            raise
+
+        self.last_flush_at = time.time()
+        self.last_flush_lag = time.monotonic() - oldest
+        self.last_flush_count = len(pending)
+        return len(pending)
+
+    def stats(self):
+        """Buffer size and flush lag: how long the oldest buffered view waited (or is waiting)"""
+        with self._lock:
+            pending_products = len(self._pending)
+            pending_views = sum(self._pending.values())
+            waiting = time.monotonic() - self._oldest_pending if self._oldest_pending is not None else 0
+        return {
+            'pending_products': pending_products,
+            'pending_views': pending_views,
+            'pending_age_seconds': round(waiting, 3),
+            'last_flush_at': self.last_flush_at,
+            'last_flush_lag_seconds': round(self.last_flush_lag, 3) if self.last_flush_lag is not None else None,
+            'last_flush_products': self.last_flush_count
+        }
+
+
+view_counter = ViewCounter()
+
+
+def viewer_key():
+    """Logged-in users are deduped by account, anonymous visitors by address and user agent"""
+    if current_user.is_authenticated:
+        return f"user:{current_user.get_id()}"
+    raw = f"{request.remote_addr}|{request.headers.get('User-Agent', '')}"
+    return 'anon:' + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def track_view(fn):
+    """Count a view for the product_uuid route argument when the page is served, including from cache"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        response = make_response(fn(*args, **kwargs))
+        if response.status_code in (200, 304):
+            try:
+                view_counter.record(kwargs['product_uuid'], viewer_key())
+                # Each worker writes its own buffer from its own flush thread
+                view_counter.start_flusher(current_app._get_current_object(),
+                                           current_app.config.get('VIEW_FLUSH_SECONDS', 30))
+            except Exception as e:
+                print(f"Error recording product view: {str(e)}")
+        return response
+    return wrapper
+
+
+def flush_views(app):
+    with app.app_context():
+        try:
+            count = view_counter.flush()
+            if count:
+                current_app.logger.info(
+                    f"Flushed views for {count} products, lag {view_counter.last_flush_lag:.1f}s"
+                )
+            return count
+        except Exception as e:
+            print(f"Error flushing product views: {str(e)}")
+            return 0
+
+
+def init_view_counter(app):
+    """Apply the dedupe window from config and flush whatever is buffered when the process exits"""
+    view_counter.dedupe_seconds = app.config.get('VIEW_DEDUPE_SECONDS', 1800)
+    atexit.register(flush_views, app)
@@ -1,9 +1,14 @@
 from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
 from models import db, Wishlist, Product
+from sqlalchemy.orm import selectinload
+from utils.serializers import parse_fieldset, product_load_options
 
 wishlist_bp = Blueprint('wishlist', __name__)
 
+# What the wishlist view renders; override with ?fields= and ?include=
+WISHLIST_PRODUCT_FIELDS = {'product_uuid', 'name', 'main_image', 'price', 'compare_at_price', 'status'}
+
 @wishlist_bp.route('/api/wishlist/check/<product_uuid>', methods=['GET'])
 @login_required
 def check_wishlist_status(product_uuid):
@@ -22,8 +27,13 @@ def check_wishlist_status(product_uuid):
 def get_wishlist():
     """Get all wishlist items for the current user"""
     try:
-        wishlist_items = Wishlist.query.filter_by(user_uuid=current_user.user_uuid).all()  # Changed from uuid to user_uuid
-        return jsonify([item.to_dict() for item in wishlist_items]), 200
+        fields = parse_fieldset(request.args.get('fields')) or WISHLIST_PRODUCT_FIELDS
+        include = parse_fieldset(request.args.get('include')) or set()
+
+        wishlist_items = Wishlist.query.filter_by(user_uuid=current_user.user_uuid).options(  # Changed from uuid to user_uuid
+            selectinload(Wishlist.product).options(*product_load_options(fields, include))
+        ).all()
+        return jsonify([item.to_dict(fields, include) for item in wishlist_items]), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Request, jsonify, request, current_app
 from flask_mail import Mail
 from flask_migrate import Migrate
 from flask_cors import CORS
@@ -6,7 +6,14 @@ from flask_login import LoginManager
 from models import db, Users, Role
 from config import Config
 from uploads import uploads
-from scheduler import init_scheduler
+from utils.search_index import init_search_index
+from utils.prefix_index import init_prefix_index
+from utils.trigram_index import init_trigram_index
+from utils.category_tree import init_category_tree
+from utils.http_cache import init_catalog_versions
+from utils.response_cache import init_response_cache
+from utils.view_counter import init_view_counter
+from utils.catalog_snapshot import init_catalog_snapshot
 from featured_products import featured_products
 from newsletter import newsletter, init_mail
 from banners import banners
@@ -18,8 +25,19 @@ mail = Mail()
 migrate = Migrate()
 login_manager = LoginManager()
 
+# Endpoints whose uploads are streamed from disk and may exceed MAX_CONTENT_LENGTH
+BULK_IMPORT_ENDPOINTS = {'products.bulk_upload_products'}
+
+class UploadRequest(Request):
+    @property
+    def max_content_length(self):
+        if self.endpoint in BULK_IMPORT_ENDPOINTS:
+            return current_app.config['BULK_IMPORT_MAX_CONTENT_LENGTH']
+        return super().max_content_length
+
 def create_app():
     app = Flask(__name__)
+    app.request_class = UploadRequest
     
     # Load configuration from Config class
     app.config.from_object(Config)
@@ -29,9 +47,17 @@ def create_app():
     mail.init_app(app)
     migrate.init_app(app, db)
     
-    # Initialize the scheduler
+    # Initialize the product search indexes, the category tree, catalog versions, the response cache, the view counter and the catalog snapshot;
+    # periodic jobs run in the separate job runner (manage.py run_jobs)
     with app.app_context():
-        init_scheduler(app)
+        init_search_index(app)
+        init_prefix_index(app)
+        init_trigram_index(app)
+        init_catalog_versions(app)
+        init_category_tree(app)
+        init_response_cache(app)
+        init_view_counter(app)
+        init_catalog_snapshot(app)
     
     # Configure CORS with credentials support
     CORS(app, 
@@ -40,6 +40,33 @@ const ProductView = ({
   const [variationOptions, setVariationOptions] = useState([]);
   const [groupedVariationOptions, setGroupedVariationOptions] = useState({});
   const [isModalOpen, setIsModalOpen] = useState(false);
+  const [moreReviews, setMoreReviews] = useState([]);
+  const [reviewsCursor, setReviewsCursor] = useState(null);
+  const [loadingReviews, setLoadingReviews] = useState(false);
+
+  useEffect(() => {
+    setMoreReviews([]);
+    setReviewsCursor(product?.reviewsNextCursor || null);
+  }, [product]);
+
+  const loadMoreReviews = async () => {
+    if (!reviewsCursor || loadingReviews) return;
+    setLoadingReviews(true);
+    try {
+      const response = await fetch(
+        `http://localhost:5555/api/products/${product.product_uuid}/reviews?cursor=${encodeURIComponent(reviewsCursor)}`
+      );
+      const data = await response.json();
+      if (response.ok) {
+        setMoreReviews((prev) => [...prev, ...(data.reviews || [])]);
+        setReviewsCursor(data.next_cursor || null);
+      }
+    } catch (error) {
+      console.error('Error loading reviews:', error);
+    } finally {
+      setLoadingReviews(false);
+    }
+  };
 
   useEffect(() => {
     const checkWishlistStatus = async () => {
@@ -913,12 +940,12 @@ const ProductView = ({
                 />
               ))}
             </div>
-            <p className="text-gray-500 mt-2">{product.reviews?.length || 0} Reviews</p>
+            <p className="text-gray-500 mt-2">{product.totalReviews ?? product.reviews?.length ?? 0} Reviews</p>
           </div>
 
           {/* Reviews List */}
           <div className="mt-8 space-y-6">
-            {(product.reviews || []).map((review) => {
+            {[...(product.reviews || []), ...moreReviews].map((review) => {
               // Debug logs
               console.log('Review Data:', review);
               console.log('Current User:', user);
@@ -1069,6 +1096,15 @@ const ProductView = ({
                 </div>
               );
             })}
+            {reviewsCursor && (
+              <button
+                onClick={loadMoreReviews}
+                disabled={loadingReviews}
+                className="w-full py-2 text-sm font-medium text-yellow-600 hover:text-yellow-700 disabled:opacity-50"
+              >
+                {loadingReviews ? 'Loading...' : 'Show more reviews'}
+              </button>
+            )}
           </div>
         </div>
       </div>
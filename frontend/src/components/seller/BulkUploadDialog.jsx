@@ -11,6 +11,7 @@ const BulkUploadDialog = ({ isOpen, onClose, shopUuid, onSuccess }) => {
   const [file, setFile] = useState(null)
   const [uploading, setUploading] = useState(false)
   const [validationErrors, setValidationErrors] = useState([])
+  const [progress, setProgress] = useState(null)
   const { user } = useAuth()
 
   const downloadTemplate = () => {
@@ -113,6 +114,22 @@ const BulkUploadDialog = ({ isOpen, onClose, shopUuid, onSuccess }) => {
     setValidationErrors([])
   }
 
+  // Imports run in the background; poll the job until it has finished
+  const waitForImport = async (statusUrl) => {
+    while (true) {
+      await new Promise((resolve) => setTimeout(resolve, 1000))
+      const response = await fetch(`http://localhost:5555${statusUrl}`, { credentials: 'include' })
+      const job = await response.json()
+      if (!response.ok) {
+        throw new Error(job.message || 'Failed to get import status')
+      }
+      setProgress(job)
+      if (job.status === 'completed' || job.status === 'failed') {
+        return job
+      }
+    }
+  }
+
   const handleUpload = async () => {
     if (!file) {
       toast.error('Please select a file to upload')
@@ -126,6 +143,7 @@ const BulkUploadDialog = ({ isOpen, onClose, shopUuid, onSuccess }) => {
 
     setUploading(true)
     setValidationErrors([])
+    setProgress(null)
 
     const formData = new FormData()
     formData.append('file', file)
@@ -162,9 +180,19 @@ const BulkUploadDialog = ({ isOpen, onClose, shopUuid, onSuccess }) => {
         return
       }
 
-      toast.success(`Successfully uploaded ${data.products_created} products`)
-      onSuccess(data)
-      onClose()
+      const job = await waitForImport(data.status_url)
+      if (job.errors?.length) {
+        setValidationErrors(job.errors)
+      }
+      if (job.products_created > 0) {
+        toast.success(`Successfully uploaded ${job.products_created} products`)
+        onSuccess(job)
+        if (!job.errors?.length) {
+          onClose()
+        }
+      } else {
+        toast.error(job.message || 'No products were imported')
+      }
     } catch (error) {
       console.error('Error uploading products:', error)
       if (error.message.includes('Failed to fetch')) {
@@ -174,6 +202,7 @@ const BulkUploadDialog = ({ isOpen, onClose, shopUuid, onSuccess }) => {
       }
     } finally {
       setUploading(false)
+      setProgress(null)
     }
   }
 
@@ -258,7 +287,9 @@ const BulkUploadDialog = ({ isOpen, onClose, shopUuid, onSuccess }) => {
             className="flex items-center gap-2"
           >
             <Upload className="w-4 h-4" />
-            {uploading ? 'Uploading...' : 'Upload Products'}
+            {uploading
+              ? (progress ? `Importing... ${progress.rows_processed} rows` : 'Uploading...')
+              : 'Upload Products'}
           </Button>
         </DialogFooter>
       </DialogContent>